@@ -3,6 +3,8 @@ pragma solidity ^0.8.13;
 
 import {Script, console2} from "forge-std/Script.sol";
 import {TelepayRouter} from "../src/TelepayRouter.sol";
+import {TelepayDeployer} from "../src/TelepayDeployer.sol";
+import {Telepay} from "../src/Telepay.sol";
 
 contract TelepayRouterScript is Script {
     // Chain IDs
@@ -18,6 +20,22 @@ contract TelepayRouterScript is Script {
     address constant ARBITRUM_SEPOLIA_USDC =
         0x75faf114eafb1BDbe2F0316DF893fd58CE46AA4d;
 
+    // Salt of TelepayDeployer itself, deployed through CREATE2_FACTORY
+    bytes32 constant DEPLOYER_SALT = bytes32(0);
+
+    /// @notice TelepayDeployer at its deterministic address, deployed if missing
+    function telepayDeployer() internal returns (TelepayDeployer) {
+        address predicted = vm.computeCreate2Address(
+            DEPLOYER_SALT,
+            keccak256(type(TelepayDeployer).creationCode)
+        );
+        if (predicted.code.length == 0) {
+            new TelepayDeployer{salt: DEPLOYER_SALT}();
+            console2.log("TelepayDeployer deployed at:", predicted);
+        }
+        return TelepayDeployer(predicted);
+    }
+
     function deployRouter(
         address _usdc,
         address _telepayAddress,
@@ -25,16 +43,48 @@ contract TelepayRouterScript is Script {
         address _tokenMessenger,
         address _messageTransmitter
     ) internal returns (TelepayRouter) {
+        // Mined with script/mine_salt.py, the address is the same on every
+        // chain as long as the salt is
+        address owner = vm.addr(vm.envUint("PRIVATE_KEY"));
+        bytes32 salt = vm.envOr(
+            "ROUTER_SALT",
+            bytes32(uint256(uint160(owner)) << 96)
+        );
+        TelepayDeployer factory = telepayDeployer();
+        address predicted = factory.routerAddress(salt);
+        if (predicted.code.length > 0) {
+            console2.log("Router already deployed with this salt");
+            return TelepayRouter(predicted);
+        }
         return
-            new TelepayRouter(
-                _usdc,
-                _telepayAddress,
-                _vaultAddress,
-                _tokenMessenger,
-                _messageTransmitter
+            TelepayRouter(
+                factory.deployRouter(
+                    salt,
+                    TelepayDeployer.Parameters({
+                        token: _usdc,
+                        telepay: _telepayAddress,
+                        vault: _vaultAddress,
+                        tokenMessenger: _tokenMessenger,
+                        messageTransmitter: _messageTransmitter
+                    })
+                )
             );
     }
 
+    /// @notice Lets Telepay take local credits from the router on its chain,
+    /// other routes need no configuration
+    function configureRoute(TelepayRouter router) internal {
+        console2.log("Router local domain:", uint256(router.LOCAL_DOMAIN()));
+        if (router.ROUTE() != TelepayRouter.Route.Telepay) {
+            return;
+        }
+        Telepay telepay = router.TELEPAY();
+        if (telepay.localRouter() != address(router)) {
+            telepay.setLocalRouter(address(router));
+            console2.log("Registered as Telepay local router");
+        }
+    }
+
     function run() public {
         uint256 deployerPrivateKey = vm.envUint("PRIVATE_KEY");
         address deployer = vm.addr(deployerPrivateKey);
@@ -43,11 +93,12 @@ contract TelepayRouterScript is Script {
 
         vm.startBroadcast(deployerPrivateKey);
 
+        TelepayRouter router;
         if (block.chainid == BASE_SEPOLIA_CHAIN_ID) {
             uint256 gasPrice = 2000000000; // 2 gwei
             vm.txGasPrice(gasPrice);
 
-            TelepayRouter router = deployRouter(
+            router = deployRouter(
                 BASE_SEPOLIA_USDC,
                 vm.envAddress("BASE_TELEPAY_ADDRESS"),
                 vm.envAddress("ETH_VAULT_ADDRESS"),
@@ -56,7 +107,7 @@ contract TelepayRouterScript is Script {
             );
             console2.log("Base Router deployed at:", address(router));
         } else if (block.chainid == ETH_SEPOLIA_CHAIN_ID) {
-            TelepayRouter router = deployRouter(
+            router = deployRouter(
                 ETH_SEPOLIA_USDC,
                 vm.envAddress("BASE_TELEPAY_ADDRESS"),
                 vm.envAddress("ETH_VAULT_ADDRESS"),
@@ -65,7 +116,7 @@ contract TelepayRouterScript is Script {
             );
             console2.log("Ethereum Router deployed at:", address(router));
         } else if (block.chainid == ARBITRUM_SEPOLIA_CHAIN_ID) {
-            TelepayRouter router = deployRouter(
+            router = deployRouter(
                 ARBITRUM_SEPOLIA_USDC,
                 vm.envAddress("BASE_TELEPAY_ADDRESS"),
                 vm.envAddress("ETH_VAULT_ADDRESS"),
@@ -76,6 +127,7 @@ contract TelepayRouterScript is Script {
         } else {
             revert("Unsupported chain");
         }
+        configureRoute(router);
 
         vm.stopBroadcast();
     }
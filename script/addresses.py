@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_utils import decode_hex, keccak, to_checksum_address
+
+from contracts import load_artifact
+from keccak import keccak256_batch
+from rpc import make_web3
+
+load_dotenv()
+
+# Contracts each network's forge scripts create with CREATE, in deploy.py order.
+# Routers go through TelepayDeployer and don't depend on nonces.
+DEPLOYMENT_PLAN = {
+    "eth_sepolia": [
+        ("EulerVaultMock", "ETH_EULER_VAULT_ADDRESS"),
+        ("TelepayVault", "ETH_VAULT_ADDRESS"),
+    ],
+    "base_sepolia": [("Telepay", "BASE_TELEPAY_ADDRESS")],
+}
+
+# Deterministic deployment proxy, at the same address on every chain
+CREATE2_FACTORY = "0x4e59b44847b379578588920cA78FbF26c0B4956C"
+
+# Salt TelepayDeployer is deployed with, see Router.s.sol
+DEPLOYER_SALT = bytes(32)
+
+RPC_ENV = {
+    "eth_sepolia": "ETH_SEPOLIA_RPC",
+    "base_sepolia": "BASE_SEPOLIA_RPC",
+    "arbitrum_sepolia": "ARBITRUM_SEPOLIA_RPC",
+}
+
+
+def _address_bytes(address: str) -> np.ndarray:
+    return np.frombuffer(bytes.fromhex(address[2:]), dtype=np.uint8)
+
+
+def _nonce_bytes(nonces: np.ndarray, width: int) -> np.ndarray:
+    """Big-endian encoding of each nonce on exactly width bytes"""
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64) * np.uint64(8)
+    return ((nonces[:, None] >> shifts) & np.uint64(0xFF)).astype(np.uint8)
+
+
+def create_addresses(deployer: str, nonces) -> np.ndarray:
+    """CREATE addresses keccak(rlp([deployer, nonce]))[12:] for every nonce
+
+    Returns an (N, 20) uint8 array. Nonces are grouped by RLP length so each
+    group is hashed in a single batch.
+    """
+    nonces = np.asarray(nonces, dtype=np.uint64)
+    sender = _address_bytes(deployer)
+    result = np.empty((len(nonces), 20), dtype=np.uint8)
+
+    # RLP: 0 is the empty string, 1..127 encode as themselves, larger values
+    # as 0x80 + length followed by big-endian bytes
+    widths = np.zeros(len(nonces), dtype=np.int64)
+    for width in range(1, 9):
+        widths[nonces >= np.uint64(1) << np.uint64(8 * (width - 1))] = width
+    widths[(nonces > 0) & (nonces < 0x80)] = 0
+
+    for width in np.unique(widths):
+        index = np.nonzero(widths == width)[0]
+        group = nonces[index]
+        if width == 0:
+            encoded = np.where(group == 0, 0x80, group).astype(np.uint8)[:, None]
+        else:
+            prefix = np.full((len(group), 1), 0x80 + width, dtype=np.uint8)
+            encoded = np.hstack([prefix, _nonce_bytes(group, width)])
+
+        payload = 21 + encoded.shape[1]
+        header = np.array([0xC0 + payload, 0x94], dtype=np.uint8)
+        messages = np.hstack(
+            [
+                np.tile(header, (len(group), 1)),
+                np.tile(sender, (len(group), 1)),
+                encoded,
+            ]
+        )
+        result[index] = keccak256_batch(messages)[:, 12:]
+    return result
+
+
+def create2_addresses(factory: str, salts: np.ndarray, init_code_hash: bytes) -> np.ndarray:
+    """CREATE2 addresses keccak(0xff ++ factory ++ salt ++ keccak(init_code))[12:]
+
+    salts is an (N, 32) uint8 array, the result an (N, 20) uint8 array.
+    """
+    n = len(salts)
+    messages = np.empty((n, 85), dtype=np.uint8)
+    messages[:, 0] = 0xFF
+    messages[:, 1:21] = _address_bytes(factory)
+    messages[:, 21:53] = salts
+    messages[:, 53:] = np.frombuffer(init_code_hash, dtype=np.uint8)
+    return keccak256_batch(messages)[:, 12:]
+
+
+def salts_from_range(start: int, count: int) -> np.ndarray:
+    """uint256 salts start..start+count-1 as big-endian (N, 32) bytes"""
+    salts = np.zeros((count, 32), dtype=np.uint8)
+    values = np.arange(start, start + count, dtype=np.uint64)
+    salts[:, 24:] = _nonce_bytes(values, 8)
+    return salts
+
+
+def init_code_hash(contract_name: str) -> bytes:
+    """keccak256 of a contract's creation code from its forge artifact"""
+    return keccak(hexstr=load_artifact(contract_name)["bytecode"]["object"])
+
+
+def telepay_deployer_address() -> str:
+    salt = np.frombuffer(DEPLOYER_SALT, dtype=np.uint8)[None, :]
+    factory = create2_addresses(CREATE2_FACTORY, salt, init_code_hash("TelepayDeployer"))
+    return to_hex(factory)[0]
+
+
+def default_router_salt(deployer: str) -> bytes:
+    """Salt Router.s.sol uses when ROUTER_SALT is not set"""
+    return bytes.fromhex(deployer[2:]) + bytes(12)
+
+
+def router_address(salt: bytes) -> str:
+    """TelepayRouter address for salt, the same on every chain"""
+    salts = np.frombuffer(salt, dtype=np.uint8)[None, :]
+    router = create2_addresses(
+        telepay_deployer_address(), salts, init_code_hash("TelepayRouter")
+    )
+    return to_hex(router)[0]
+
+
+def to_hex(addresses: np.ndarray) -> list:
+    return [to_checksum_address(row.tobytes()) for row in addresses]
+
+
+def fetch_nonces(deployer: str, networks: list) -> dict:
+    """Current nonce of deployer on every network, queried concurrently"""
+
+    def nonce(network):
+        w3 = make_web3(os.getenv(RPC_ENV[network]))
+        return network, w3.eth.get_transaction_count(deployer, "pending")
+
+    with ThreadPoolExecutor(max_workers=len(networks)) as pool:
+        return dict(pool.map(nonce, networks))
+
+
+def plan_addresses(deployer: str, nonces: dict, router_salt: bytes) -> dict:
+    """Address of every Telepay contract, keyed by env variable"""
+    addresses = {}
+    for network, contracts in DEPLOYMENT_PLAN.items():
+        start = nonces[network]
+        computed = to_hex(create_addresses(deployer, range(start, start + len(contracts))))
+        for (_, env_name), address in zip(contracts, computed):
+            addresses[env_name] = address
+    router = router_address(router_salt)
+    for network in RPC_ENV:
+        addresses[f"{network.split('_')[0].upper()}_ROUTER_ADDRESS"] = router
+    return addresses
+
+
+def parse_nonces(values: list) -> dict:
+    """network=nonce pairs from the command line"""
+    return {network: int(n) for network, n in (v.split("=") for v in values)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute CREATE and CREATE2 addresses")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="Print JSON instead of text")
+
+    plan = sub.add_parser("plan", parents=[common], help="Addresses of the whole Telepay deployment")
+    plan.add_argument("--deployer", help="Defaults to the PRIVATE_KEY address")
+    plan.add_argument(
+        "--nonce",
+        action="append",
+        default=[],
+        metavar="NETWORK=NONCE",
+        help="Skip the RPC lookup for a network",
+    )
+
+    create = sub.add_parser("create", parents=[common], help="CREATE addresses over a nonce range")
+    create.add_argument("--deployer", required=True)
+    create.add_argument("--start", type=int, default=0)
+    create.add_argument("--count", type=int, default=1000)
+
+    create2 = sub.add_parser("create2", parents=[common], help="CREATE2 addresses over a salt range")
+    create2.add_argument("--factory", required=True)
+    create2.add_argument("--init-code-hash", help="keccak256 of the init code")
+    create2.add_argument("--init-code", help="Hex init code, hashed for you")
+    create2.add_argument("--start", type=int, default=0)
+    create2.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.mode == "plan":
+        deployer = args.deployer or Account.from_key(os.getenv("PRIVATE_KEY")).address
+        nonces = parse_nonces(args.nonce)
+        missing = [n for n in DEPLOYMENT_PLAN if n not in nonces]
+        if missing:
+            nonces.update(fetch_nonces(deployer, missing))
+        salt = os.getenv("ROUTER_SALT")
+        salt = bytes.fromhex(salt[2:]) if salt else default_router_salt(deployer)
+        result = plan_addresses(deployer, nonces, salt)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print(f"# Deployer {deployer}, nonces {nonces}")
+            for env_name, address in result.items():
+                print(f"{env_name}={address}")
+    elif args.mode == "create":
+        nonces = range(args.start, args.start + args.count)
+        result = dict(zip(nonces, to_hex(create_addresses(args.deployer, nonces))))
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            for nonce, address in result.items():
+                print(f"{nonce}\t{address}")
+    else:
+        if args.init_code_hash:
+            init_code_hash = decode_hex(args.init_code_hash)
+        else:
+            init_code_hash = keccak(hexstr=args.init_code)
+        salts = salts_from_range(args.start, args.count)
+        addresses = to_hex(create2_addresses(args.factory, salts, init_code_hash))
+        result = {"0x" + salt.tobytes().hex(): a for salt, a in zip(salts, addresses)}
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            for salt, address in result.items():
+                print(f"{salt}\t{address}")
@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from eth_abi import encode
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import Web3
+
+load_dotenv()
+
+ZERO_ADDRESS = "0x" + "00" * 20
+SETTLE_BATCH = "settleBatch((uint256,uint256,bytes,bytes,bytes32)[],bytes)"
+TRANSFER = "transfer(uint256,uint256,bytes,bytes,bytes)"
+
+# Intrinsic gas of a transaction and of each calldata byte
+TX_BASE_GAS = 21_000
+ZERO_BYTE_GAS = 4
+NONZERO_BYTE_GAS = 16
+
+# Where forge writes vm.snapshotGasLastCall / vm.snapshotValue results
+SNAPSHOTS = Path(__file__).resolve().parent.parent / "snapshots" / "TelepayBatch.json"
+
+
+def leaf(transfer: dict) -> bytes:
+    """Telepay.batchLeaf, committing to the user's signature"""
+    encoded = encode(["uint256", "uint256", "bytes", "bytes", "bytes32"], list(_as_tuple(transfer)))
+    return bytes(Web3.keccak(Web3.keccak(encoded)))
+
+
+def hash_pair(a: bytes, b: bytes) -> bytes:
+    """OpenZeppelin Hashes.commutativeKeccak256"""
+    return bytes(Web3.keccak(min(a, b) + max(a, b)))
+
+
+class MerkleTree:
+    """Tree Telepay.batchRoot builds: leaves in order, hashed pairwise, the
+    last node of an odd level moved up unchanged"""
+
+    def __init__(self, leaves: list):
+        if not leaves:
+            raise ValueError("Empty batch, Telepay.batchRoot rejects it")
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            nodes = self.levels[-1]
+            parents = [hash_pair(nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+            if len(nodes) % 2 == 1:
+                parents.append(nodes[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    def proof(self, index: int) -> list:
+        """Siblings from leaf `index` up, as MerkleProof.verify expects"""
+        proof = []
+        for nodes in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                proof.append(nodes[sibling])
+            index //= 2
+        return proof
+
+    @staticmethod
+    def verify(proof: list, root: bytes, node: bytes) -> bool:
+        for sibling in proof:
+            node = hash_pair(node, sibling)
+        return node == root
+
+
+def transfer_message(transfer: dict, telepay: str):
+    """What a user signs for a transfer, Telepay.transferDigest"""
+    inner = Web3.solidity_keccak(
+        ["uint256", "uint256", "bytes", "bytes32", "address"],
+        [
+            transfer["amount"],
+            transfer["nonce"],
+            transfer["sourcePubKey"],
+            Web3.keccak(transfer["targetPubKey"]),
+            telepay,
+        ],
+    )
+    return encode_defunct(primitive=inner)
+
+
+def check_user_signature(transfer: dict, telepay: str) -> bool:
+    """Whether the transfer is signed by the key behind sourcePubKey"""
+    owner = Web3.to_checksum_address(Web3.keccak(transfer["sourcePubKey"])[12:])
+    signer = Account.recover_message(
+        transfer_message(transfer, telepay), signature=transfer["signature"]
+    )
+    return signer == owner
+
+
+def batch_digest(root: bytes, chain_id: int, telepay: str):
+    """Telepay.batchDigest, before the eth_sign prefix"""
+    inner = Web3.solidity_keccak(["bytes32", "uint256", "address"], [root, chain_id, telepay])
+    return encode_defunct(primitive=inner)
+
+
+def sign_batch(operator_key: str, root: bytes, chain_id: int, telepay: str) -> bytes:
+    return bytes(Account.sign_message(batch_digest(root, chain_id, telepay), operator_key).signature)
+
+
+def _as_tuple(transfer: dict) -> tuple:
+    """Telepay.BatchTransfer"""
+    return (
+        transfer["amount"],
+        transfer["nonce"],
+        transfer["sourcePubKey"],
+        transfer["targetPubKey"],
+        Web3.keccak(transfer["signature"]),
+    )
+
+
+def settle_calldata(transfers: list, signature: bytes) -> bytes:
+    args = encode(
+        ["(uint256,uint256,bytes,bytes,bytes32)[]", "bytes"],
+        [[_as_tuple(t) for t in transfers], signature],
+    )
+    return Web3.keccak(text=SETTLE_BATCH)[:4] + args
+
+
+def transfer_calldata(transfer: dict) -> bytes:
+    args = encode(
+        ["uint256", "uint256", "bytes", "bytes", "bytes"],
+        [*_as_tuple(transfer)[:4], transfer["signature"]],
+    )
+    return Web3.keccak(text=TRANSFER)[:4] + args
+
+
+def calldata_gas(data: bytes) -> int:
+    zeros = data.count(0)
+    return zeros * ZERO_BYTE_GAS + (len(data) - zeros) * NONZERO_BYTE_GAS
+
+
+def load_transfers(path: str) -> list:
+    """Transfers as saved by a client, byte fields hex encoded"""
+    transfers = json.loads(Path(path).read_text())
+    for t in transfers:
+        for key in ("sourcePubKey", "targetPubKey", "signature"):
+            if key in t:
+                t[key] = bytes.fromhex(t[key][2:] if t[key].startswith("0x") else t[key])
+    return transfers
+
+
+def build(transfers: list, operator_key: str, chain_id: int, telepay: str) -> dict:
+    """Root, operator signature, calldata and every user's inclusion proof
+
+    Every proof carries the user signature its leaf commits to: publishing
+    them is what lets anyone check a settled transfer with
+    Telepay.isAuthorized, or challenge it.
+    """
+    tree = MerkleTree([leaf(t) for t in transfers])
+    signature = sign_batch(operator_key, tree.root, chain_id, telepay)
+    return {
+        "root": "0x" + tree.root.hex(),
+        "signature": "0x" + signature.hex(),
+        "calldata": "0x" + settle_calldata(transfers, signature).hex(),
+        "proofs": [
+            {
+                "index": i,
+                "sourcePubKey": "0x" + t["sourcePubKey"].hex(),
+                "targetPubKey": "0x" + t["targetPubKey"].hex(),
+                "amount": t["amount"],
+                "nonce": t["nonce"],
+                "signature": "0x" + t["signature"].hex(),
+                "leaf": "0x" + tree.levels[0][i].hex(),
+                "proof": ["0x" + p.hex() for p in tree.proof(i)],
+            }
+            for i, t in enumerate(transfers)
+        ],
+    }
+
+
+def synthetic_transfers(count: int, users: int = 20) -> list:
+    """Same shape as TelepayBatchTest._batch"""
+
+    def pub_key(user: int) -> bytes:
+        return Web3.keccak(encode(["uint256"], [user])) + user.to_bytes(32, "big")
+
+    return [
+        {
+            "amount": 1,
+            "nonce": i // users,
+            "sourcePubKey": pub_key(i % users),
+            "targetPubKey": pub_key((i + 1) % users),
+            "signature": bytes(65),
+        }
+        for i in range(count)
+    ]
+
+
+def benchmark(sizes: list):
+    """Gas per transfer of settleBatch against one transfer call each
+
+    Intrinsic gas (base cost and calldata) is computed here. Execution gas
+    comes from the last `forge test --match-contract TelepayBatchTest` run,
+    when its snapshots exist.
+    """
+    snapshots = json.loads(SNAPSHOTS.read_text()) if SNAPSHOTS.exists() else {}
+    operator = Account.create()
+
+    single = transfer_calldata(synthetic_transfers(1)[0])
+    single_execution = int(snapshots.get("transfer_perTransfer", 0))
+    single_total = TX_BASE_GAS + calldata_gas(single) + single_execution
+    print(f"{'mode':<16}{'calldata B/tx':>14}{'intrinsic/tx':>14}{'execution/tx':>14}{'total/tx':>12}")
+    print(
+        f"{'transfer':<16}{len(single):>14,}{TX_BASE_GAS + calldata_gas(single):>14,}"
+        f"{single_execution:>14,}{single_total:>12,}"
+    )
+    for size in sizes:
+        transfers = synthetic_transfers(size)
+        tree = MerkleTree([leaf(t) for t in transfers])
+        signature = sign_batch(operator.key, tree.root, 1, ZERO_ADDRESS)
+        data = settle_calldata(transfers, signature)
+        intrinsic = (TX_BASE_GAS + calldata_gas(data)) / size
+        execution = int(snapshots.get(f"settleBatch_{size}_perTransfer", 0))
+        print(
+            f"{f'settleBatch {size}':<16}{len(data) / size:>14,.0f}{intrinsic:>14,.0f}"
+            f"{execution:>14,}{intrinsic + execution:>12,.0f}"
+        )
+    if not snapshots:
+        print("\nRun `forge test --match-contract TelepayBatchTest` for execution gas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build Telepay settlement batches")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    build_parser = sub.add_parser("build", help="Tree, operator signature and calldata of a batch")
+    build_parser.add_argument("--input", required=True, help="JSON list of signed transfers")
+    build_parser.add_argument("--output", required=True)
+    build_parser.add_argument("--telepay", default=os.getenv("BASE_TELEPAY_ADDRESS"))
+    build_parser.add_argument("--chain-id", type=int, default=84532)
+
+    prove_parser = sub.add_parser("prove", help="Inclusion proof of one transfer of a built batch")
+    prove_parser.add_argument("--batch", required=True, help="Output of build")
+    prove_parser.add_argument("--index", type=int, required=True)
+
+    bench_parser = sub.add_parser("bench", help="Gas per transfer at several batch sizes")
+    bench_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    if args.mode == "build":
+        if not args.telepay:
+            raise EnvironmentError("--telepay or BASE_TELEPAY_ADDRESS must be set")
+        operator_key = os.getenv("OPERATOR_PRIVATE_KEY") or os.getenv("PRIVATE_KEY")
+        if not operator_key:
+            raise EnvironmentError("OPERATOR_PRIVATE_KEY or PRIVATE_KEY must be set")
+
+        transfers = load_transfers(args.input)
+        # settleBatch only checks the operator signature: a transfer with a
+        # bad user signature would settle, then be challenged and halt batches
+        bad = [i for i, t in enumerate(transfers) if not check_user_signature(t, args.telepay)]
+        if bad:
+            raise ValueError(f"Transfers {bad} are not signed by their source key")
+        batch = build(transfers, operator_key, args.chain_id, args.telepay)
+        Path(args.output).write_text(json.dumps(batch, indent=2))
+        print(f"🌳 {len(transfers)} transfers, root {batch['root']}")
+        print(f"📦 Calldata: {(len(batch['calldata']) - 2) // 2:,} bytes -> {args.output}")
+    elif args.mode == "prove":
+        batch = json.loads(Path(args.batch).read_text())
+        entry = batch["proofs"][args.index]
+        proof = [bytes.fromhex(p[2:]) for p in entry["proof"]]
+        root = bytes.fromhex(batch["root"][2:])
+        if not MerkleTree.verify(proof, root, bytes.fromhex(entry["leaf"][2:])):
+            raise ValueError(f"Proof of transfer {args.index} does not verify against {batch['root']}")
+        print(json.dumps({"root": batch["root"], **entry}, indent=2))
+    else:
+        benchmark(args.sizes)
@@ -0,0 +1,537 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DB = ROOT / "cache" / "bench.sqlite"
+SNAPSHOTS = ROOT / "snapshots"
+
+# Gas snapshot groups written by `vm.snapshotGasLastCall`, and the test
+# contracts that write them
+GAS_GROUPS = {
+    "Telepay": "TelepayTest",
+    "TelepayRouter": "TelepayRouterTest",
+    "TelepayVault": "TelepayVaultTest",
+    "TelepayBatch": "TelepayBatchTest",
+}
+
+# Timed runs per benchmark, after one untimed warmup
+REPEATS = 7
+
+# A timing regresses only past the larger of this fraction of its baseline
+# and MAD_SIGMAS standard deviations of the noise measured on both sides
+MIN_CHANGE = 0.05
+MAD_SIGMAS = 3.0
+# Median absolute deviation to standard deviation, for normal noise
+MAD_SCALE = 1.4826
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    commit_hash TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    dirty INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    higher_is_better INTEGER NOT NULL,
+    samples TEXT NOT NULL,
+    median REAL NOT NULL,
+    PRIMARY KEY (run, name)
+);
+"""
+
+
+def git(*args) -> str:
+    return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def machine() -> str:
+    """Timings are only compared between runs on the same machine"""
+    return f"{platform.node()} {platform.machine()} {platform.python_version()}"
+
+
+def mad(samples: list) -> float:
+    median = statistics.median(samples)
+    return statistics.median(abs(s - median) for s in samples)
+
+
+def timed(work: int, fn, repeats: int) -> list:
+    """work / second of each of repeats calls of fn, without GC pauses"""
+    fn()
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append(work / (time.perf_counter() - start))
+    finally:
+        gc.enable()
+    return samples
+
+
+def quiet(fn):
+    """fn with its progress prints swallowed"""
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+
+    return run
+
+
+def random_bytes(rng: random.Random, n: int) -> bytes:
+    """Random.randbytes, which needs Python 3.9"""
+    return rng.getrandbits(8 * n).to_bytes(n, "big")
+
+
+def bench_keccak(scale: float):
+    from keccak import keccak256_batch
+
+    messages = np.random.default_rng(0).integers(0, 256, (int(65536 * scale), 64), dtype=np.uint8)
+    return "hashes/s", len(messages), lambda: keccak256_batch(messages)
+
+
+def bench_reserves_leaves(scale: float):
+    from reserves import balance_leaves, key_hashes
+
+    rng = random.Random(0)
+    keys = [random_bytes(rng, 64) for _ in range(int(20000 * scale))]
+    balances = [rng.randrange(10**12) for _ in keys]
+    return "keys/s", len(keys), lambda: balance_leaves(key_hashes(keys), balances)
+
+
+def bench_reserves_tree(scale: float):
+    from reserves import BalanceTree
+
+    leaves = np.random.default_rng(0).integers(0, 256, (int(65536 * scale), 32), dtype=np.uint8)
+    return "leaves/s", len(leaves), lambda: BalanceTree(leaves)
+
+
+def bench_reserves_indexer(scale: float):
+    from reserves import BalanceIndexer
+
+    rng = random.Random(0)
+    keys = [random_bytes(rng, 64) for _ in range(1000)]
+    events = []
+    for _ in range(int(100_000 * scale)):
+        if rng.random() < 0.2:
+            events.append({"event": "Credit", "pubKey": rng.choice(keys), "amount": 10**6})
+        else:
+            source, target = rng.sample(keys, 2)
+            events.append({"event": "NativeTransfer", "fromPubKey": source, "toPubKey": target, "amount": 1})
+
+    def replay():
+        indexer = BalanceIndexer()
+        for event in events:
+            indexer.apply(event)
+
+    return "events/s", len(events), replay
+
+
+def bench_reconcile_ranges(scale: float):
+    from reconcile import NonceRanges
+
+    # Relayed mostly in order, with some relayed late
+    nonces = list(range(int(200_000 * scale)))
+    rng = random.Random(0)
+    for i in range(0, len(nonces) - 64, 97):
+        j = i + rng.randrange(64)
+        nonces[i], nonces[j] = nonces[j], nonces[i]
+
+    def index():
+        ranges = NonceRanges()
+        for nonce in nonces:
+            ranges.add(nonce)
+
+    return "nonces/s", len(nonces), index
+
+
+def bench_reconcile_messages(scale: float):
+    from reconcile import burn_sender, parse_message
+
+    rng = random.Random(0)
+    messages = [
+        (0).to_bytes(4, "big")
+        + (3).to_bytes(4, "big")
+        + (0).to_bytes(4, "big")
+        + i.to_bytes(8, "big")
+        + random_bytes(rng, 96)
+        + random_bytes(rng, 132)
+        for i in range(int(50_000 * scale))
+    ]
+
+    def decode():
+        for message in messages:
+            burn_sender(parse_message(message)["body"])
+
+    return "messages/s", len(messages), decode
+
+
+def bench_batch_merkle(scale: float):
+    from batch import MerkleTree, leaf, synthetic_transfers
+
+    transfers = synthetic_transfers(int(2000 * scale))
+    return "transfers/s", len(transfers), lambda: MerkleTree([leaf(t) for t in transfers])
+
+
+def bench_batch_calldata(scale: float):
+    from batch import settle_calldata, synthetic_transfers
+
+    transfers = synthetic_transfers(int(2000 * scale))
+    return "transfers/s", len(transfers), lambda: settle_calldata(transfers, bytes(65))
+
+
+def bench_deploy_output(scale: float):
+    from deploy import ForgeRun
+
+    lines = []
+    for i in range(int(20_000 * scale)):
+        if i % 100 == 0:
+            lines.append(json.dumps({"tx_hash": "0x" + f"{i:064x}", "gas_used": "0x5208", "status": "success"}))
+        elif i % 10 == 0:
+            lines.append(json.dumps({"logs": [f"  step {i}"] * 4}))
+        else:
+            lines.append(f"  [{i}] TelepayRouter::deposit(0x{i:040x}, 1000000)")
+
+    def parse():
+        run = ForgeRun()
+        for line in lines:
+            run.feed(line)
+
+    return "lines/s", len(lines), quiet(parse)
+
+
+def bench_latency(scale: float):
+    from latency import CHAINS, LatencySimulator, Parameters
+
+    hours = 24 * scale
+    params = Parameters(relay_batch=10, relay_wait=30)
+    deposits = len(LatencySimulator(CHAINS, params).run(hours).credit)
+    return "deposits/s", deposits, lambda: LatencySimulator(CHAINS, params).run(hours)
+
+
+def bench_simulator(scale: float):
+    from simulator import ParameterGrid, Simulation
+
+    grid = ParameterGrid(
+        buffer=[250 * 10**6, 1000 * 10**6, 5000 * 10**6],
+        band=[0.1, 0.25, 0.5],
+        min_action=[50 * 10**6, 200 * 10**6],
+        yield_ppm=[1, 5],
+        inflow_rate=[0.2, 0.5],
+        outflow_rate=[0.2, 0.5],
+        deposit_mean=[500e6],
+        withdrawal_mean=[400e6],
+        replica=[0],
+    )
+    steps = int(24 * 30 * scale)
+    return "lane steps/s", grid.lanes * steps, lambda: Simulation(grid, 24, 2).run(steps)
+
+
+def bench_vm_gen(scale: float):
+    """forge-std's Vm.sol generation, from the cheatcodes json last downloaded"""
+    import vm_gen
+
+    cached = vm_gen.JsonCache(vm_gen.CACHE_DIR).path(vm_gen.vm.CHEATCODES_JSON_URL)
+    if not cached.exists():
+        return None
+    json_str = cached.read_text()
+
+    def generate():
+        vm_gen.generate(vm_gen.load_cheatcodes(json.loads(json_str), vm_gen.HIDDEN_STATUSES))
+
+    return "runs/s", 1, generate
+
+
+BENCHMARKS = {
+    "keccak.keccak256_batch": bench_keccak,
+    "reserves.balance_leaves": bench_reserves_leaves,
+    "reserves.BalanceTree": bench_reserves_tree,
+    "reserves.BalanceIndexer": bench_reserves_indexer,
+    "reconcile.NonceRanges": bench_reconcile_ranges,
+    "reconcile.parse_message": bench_reconcile_messages,
+    "batch.MerkleTree": bench_batch_merkle,
+    "batch.settle_calldata": bench_batch_calldata,
+    "deploy.ForgeRun": bench_deploy_output,
+    "latency.LatencySimulator": bench_latency,
+    "simulator.Simulation": bench_simulator,
+    "vm_gen.generate": bench_vm_gen,
+}
+
+
+def run_forge() -> bool:
+    """Refresh the gas snapshots, False when forge is not available"""
+    if not shutil.which("forge"):
+        return False
+    result = subprocess.run(
+        ["forge", "test", "--match-contract", "^(" + "|".join(GAS_GROUPS.values()) + ")$"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stdout[-4000:])
+        raise RuntimeError("forge test failed, gas snapshots were not refreshed")
+    return True
+
+
+def gas_results() -> dict:
+    """name -> (unit, higher is better, samples) of every gas snapshot
+
+    Gas is deterministic, so each snapshot is a single sample.
+    """
+    results = {}
+    for group in GAS_GROUPS:
+        path = SNAPSHOTS / f"{group}.json"
+        if not path.exists():
+            continue
+        for name, gas in json.loads(path.read_text()).items():
+            results[f"gas.{group}.{name}"] = ("gas", False, [int(gas)])
+    return results
+
+
+def python_results(names: list, scale: float, repeats: int) -> dict:
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name](scale)
+        if benchmark is None:
+            print(f"   ⏭️  {name}: skipped, nothing to run it on")
+            continue
+        unit, work, fn = benchmark
+        samples = timed(work, fn, repeats)
+        results[name] = (unit, True, samples)
+        print(f"   ⏱️  {name}: {statistics.median(samples):,.0f} {unit} (±{mad(samples):,.0f})")
+    return results
+
+
+class History:
+    """Benchmark results of every run, by commit"""
+
+    def __init__(self, path: Path = BENCH_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def record(self, results: dict) -> int:
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+        with self.db:
+            run = self.db.execute(
+                "INSERT INTO runs (commit_hash, subject, dirty, machine, started) VALUES (?, ?, ?, ?, ?)",
+                (git("rev-parse", "HEAD"), git("log", "-1", "--format=%s"), dirty, machine(), time.time()),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (run, name, unit, higher, json.dumps(samples), statistics.median(samples))
+                    for name, (unit, higher, samples) in results.items()
+                ],
+            )
+        return run
+
+    def run_commit(self, run: int) -> str:
+        return self.db.execute("SELECT commit_hash FROM runs WHERE id = ?", (run,)).fetchone()[0]
+
+    def latest_run(self, commit: str = None) -> int:
+        row = self.db.execute(
+            "SELECT MAX(id) FROM runs WHERE ? IS NULL OR commit_hash = ?", (commit, commit)
+        ).fetchone()
+        if row[0] is None:
+            raise LookupError(f"No benchmark runs of {commit or 'any commit'} yet")
+        return row[0]
+
+    def baseline_commit(self, run: int) -> str:
+        """Latest clean commit benchmarked on this machine before run's commit"""
+        row = self.db.execute(
+            """SELECT commit_hash FROM runs
+               WHERE id < ? AND dirty = 0 AND machine = ? AND commit_hash != ?
+               ORDER BY id DESC LIMIT 1""",
+            (run, machine(), self.run_commit(run)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def samples(self, commit: str = None, run: int = None) -> dict:
+        """name -> (unit, higher is better, samples) of one run, or pooled
+        over every clean run of commit on this machine"""
+        if run is not None:
+            rows = self.db.execute(
+                "SELECT name, unit, higher_is_better, samples FROM results WHERE run = ?", (run,)
+            )
+        else:
+            rows = self.db.execute(
+                """SELECT name, unit, higher_is_better, samples FROM results
+                   JOIN runs ON runs.id = results.run
+                   WHERE commit_hash = ? AND dirty = 0 AND machine = ?""",
+                (commit, machine()),
+            )
+        pooled = {}
+        for name, unit, higher, samples in rows:
+            pooled.setdefault(name, (unit, bool(higher), []))[2].extend(json.loads(samples))
+        return pooled
+
+    def trend(self, last: int) -> tuple:
+        """Last clean commits benchmarked on this machine, oldest first, and
+        name -> unit, median per commit (None where it was not run)"""
+        commits = self.db.execute(
+            """SELECT commit_hash, subject FROM runs WHERE dirty = 0 AND machine = ?
+               GROUP BY commit_hash ORDER BY MAX(id) DESC LIMIT ?""",
+            (machine(), last),
+        ).fetchall()[::-1]
+        series = {}
+        for i, (commit, _) in enumerate(commits):
+            for name, (unit, _, samples) in self.samples(commit).items():
+                series.setdefault(name, (unit, [None] * len(commits)))[1][i] = statistics.median(samples)
+        return commits, series
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """(name, unit, baseline median, current median, change, verdict) of every
+    benchmark in both
+
+    Gas regresses on any increase. Timings are compared by median, against a
+    threshold of MIN_CHANGE of the baseline or MAD_SIGMAS times the combined
+    noise of both sides, whichever is larger, so a noisy benchmark needs a
+    larger move to be flagged.
+    """
+    rows = []
+    for name, (unit, higher, samples) in sorted(current.items()):
+        if name not in baseline:
+            rows.append((name, unit, None, statistics.median(samples), None, "new"))
+            continue
+        before = baseline[name][2]
+        old, new = statistics.median(before), statistics.median(samples)
+        if unit == "gas":
+            threshold = 0
+        else:
+            noise = MAD_SCALE * (mad(before) ** 2 + mad(samples) ** 2) ** 0.5
+            threshold = max(MIN_CHANGE * old, MAD_SIGMAS * noise)
+        gain = (new - old) if higher else (old - new)
+        verdict = "regressed" if gain < -threshold else "improved" if gain > threshold else "same"
+        rows.append((name, unit, old, new, (new - old) / old if old else 0.0, verdict))
+    return rows
+
+
+def print_comparison(rows: list, baseline: str):
+    print(f"\n📊 Against {baseline[:10]}:")
+    print(f"{'benchmark':<48}{'baseline':>14}{'current':>14}{'change':>9}  unit")
+    icons = {"regressed": "❌", "improved": "🚀", "same": "  ", "new": "🆕"}
+    for name, unit, old, new, change, verdict in rows:
+        old_text = f"{old:,.0f}" if old is not None else "-"
+        change_text = f"{change:+.2%}" if change is not None else "-"
+        print(f"{icons[verdict]}{name:<46}{old_text:>14}{new:>14,.0f}{change_text:>9}  {unit}")
+    regressions = sum(row[5] == "regressed" for row in rows)
+    print(f"{'❌' if regressions else '✅'} {regressions} regressions in {len(rows)} benchmarks")
+
+
+def sparkline(values: list) -> str:
+    present = [v for v in values if v is not None]
+    if not present:
+        return ""
+    low, high = min(present), max(present)
+    span = (high - low) or 1
+    return "".join(
+        " " if v is None else SPARKS[int((v - low) / span * (len(SPARKS) - 1))] for v in values
+    )
+
+
+def trend_report(commits: list, series: dict) -> str:
+    """Markdown table of every benchmark's median over the commits"""
+    lines = [
+        f"Benchmarks over {len(commits)} commits, {commits[0][0][:10]} to {commits[-1][0][:10]}",
+        "",
+        "| benchmark | unit | first | last | change | trend |",
+        "|---|---|---:|---:|---:|---|",
+    ]
+    for name, (unit, medians) in sorted(series.items()):
+        present = [m for m in medians if m is not None]
+        first, last = present[0], present[-1]
+        change = f"{(last - first) / first:+.1%}" if first else "-"
+        lines.append(f"| {name} | {unit} | {first:,.0f} | {last:,.0f} | {change} | `{sparkline(medians)}` |")
+    lines += ["", "Commits, oldest first:"]
+    lines += [f"- `{commit[:10]}` {subject}" for commit, subject in commits]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark history of gas and Python tooling, per commit")
+    parser.add_argument("--db", type=Path, default=BENCH_DB)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    run_parser = sub.add_parser("run", help="Benchmark this checkout, record it and compare to the baseline")
+    run_parser.add_argument("--repeats", type=int, default=REPEATS)
+    run_parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of every benchmark's size")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Python benchmarks to run")
+    run_parser.add_argument("--skip-forge", action="store_true", help="Record the gas snapshots as they are")
+    run_parser.add_argument("--baseline", help="Commit to compare against, the last one benchmarked by default")
+    run_parser.add_argument("--check", action="store_true", help="Exit 1 on a regression")
+
+    compare_parser = sub.add_parser("compare", help="Compare the last run, or --commit, to a baseline")
+    compare_parser.add_argument("--commit")
+    compare_parser.add_argument("--baseline")
+    compare_parser.add_argument("--check", action="store_true", help="Exit 1 on a regression")
+
+    report_parser = sub.add_parser("report", help="Trend of every benchmark over the last commits")
+    report_parser.add_argument("--last", type=int, default=20)
+    report_parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    history = History(args.db)
+    if args.mode == "report":
+        commits, series = history.trend(args.last)
+        if not commits:
+            raise SystemExit("No clean runs on this machine yet")
+        report = trend_report(commits, series)
+        print(report)
+        if args.output:
+            Path(args.output).write_text(report + "\n")
+        raise SystemExit(0)
+
+    if args.mode == "run":
+        results = {}
+        print("⛽ Gas snapshots...")
+        if not args.skip_forge and not run_forge():
+            print("   ⚠️  forge not found, recording the snapshots from the last `forge test`")
+        results.update(gas_results())
+        if not results:
+            print("   ⚠️  No gas snapshots, run `forge test` first")
+        print(f"🐍 Python benchmarks, {args.repeats} runs each...")
+        results.update(python_results(args.only or list(BENCHMARKS), args.scale, args.repeats))
+        run = history.record(results)
+        current = history.samples(run=run)
+        print(f"💾 Recorded run {run} of {history.run_commit(run)[:10]} in {args.db}")
+    else:
+        commit = git("rev-parse", args.commit) if args.commit else None
+        run = history.latest_run(commit)
+        # Every clean run of an explicit commit, or just the last run
+        current = history.samples(commit) if commit else history.samples(run=run)
+        if not current:
+            raise SystemExit(f"No clean runs of {args.commit} on this machine")
+
+    baseline = git("rev-parse", args.baseline) if args.baseline else history.baseline_commit(run)
+    if baseline is None:
+        print("\nNo earlier commit benchmarked on this machine to compare against")
+        raise SystemExit(0)
+    rows = compare(history.samples(baseline), current)
+    print_comparison(rows, baseline)
+    if args.check and any(row[5] == "regressed" for row in rows):
+        raise SystemExit(1)
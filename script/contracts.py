@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_DIR = ROOT / "out"
+
+
+def load_artifact(contract_name: str, source_name: str = None) -> dict:
+    """Load a forge build artifact from out/ (run `forge build` first)"""
+    source_name = source_name or f"{contract_name}.sol"
+    path = OUT_DIR / source_name / f"{contract_name}.json"
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Artifact {path} not found, run `forge build` before using this script"
+        )
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_abi(contract_name: str, source_name: str = None) -> list:
+    """Load the ABI of a compiled contract"""
+    return load_artifact(contract_name, source_name)["abi"]
+
+
+def get_contract(w3, contract_name: str, address: str, source_name: str = None):
+    """Bind a compiled contract's ABI to a deployed address"""
+    return w3.eth.contract(
+        address=w3.to_checksum_address(address),
+        abi=load_abi(contract_name, source_name),
+    )
@@ -1,22 +1,164 @@
+import argparse
+import json
 import os
+import re
 import subprocess
 import time
+from collections import deque
 from dotenv import load_dotenv
+from eth_account import Account
 from pathlib import Path
 
+from dryrun import REHEARSAL_SOURCES, rehearse_deposit, start_forks, stop_forks
+from fees import FeeOracle
+from invariants import check_deployment
+from rpc import get_multi_client, make_web3, print_metrics
+
 load_dotenv()
 
+# Forge output kept for error reports, and the longest text line kept whole:
+# traces of failing transactions can run to megabytes. `--json` records are
+# always read whole, the script result carries every console log.
+TAIL_LINES = 200
+MAX_LINE_CHARS = 64 * 1024
+
+# Output after which the run cannot succeed, forge is stopped on the spot.
+# Anchored so console logs and traces that mention errors don't match.
+FATAL_PATTERNS = [
+    re.compile(r"^Error\b"),  # forge errors, and solc's "Error (2314): ..."
+    re.compile(r"^error(\[\w+\])?:"),  # bad arguments
+    re.compile(r"^Compiler run failed"),
+    # JSON-RPC rejections quoted in a broadcast error
+    re.compile(r"error code -?\d+: (insufficient funds|nonce too low)"),
+]
+
+DEPLOYED_AT = re.compile(r"^\s*(.+?) deployed at:\s*(0x[0-9a-fA-F]{40})")
+TX_HASH = re.compile(r"Hash:\s*(0x[0-9a-fA-F]{64})")
+
+
+class ForgeRun:
+    """A forge script run, parsed line by line as its output streams in
+
+    Takes the place of the CompletedProcess of a captured run: addresses,
+    transaction hashes and errors are picked out as they appear and only the
+    last TAIL_LINES lines are kept.
+    """
 
-class DeploymentManager:
     def __init__(self):
+        self.returncode = None
+        self.addresses = {}
+        self.transactions = []
+        self.gas_used = 0
+        self.errors = []
+        self.tail = deque(maxlen=TAIL_LINES)
+        self.aborted = None
+
+    @property
+    def stdout(self) -> str:
+        return "\n".join(self.tail)
+
+    @property
+    def stderr(self) -> str:
+        """Errors seen, or the end of the output when forge gave none"""
+        return "\n".join(self.errors) if self.errors else self.stdout
+
+    def feed(self, line: str) -> str:
+        """Parse one line of output, returning it if it is fatal"""
+        self.tail.append(line[:MAX_LINE_CHARS])
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if isinstance(record, dict):
+                return self._feed_json(record)
+        return self._feed_text(line)
+
+    def _feed_json(self, record: dict) -> str:
+        """`forge script --json`: script results with their console logs, then
+        one record per broadcast transaction"""
+        for log in record.get("logs", []):
+            self._feed_text(log)
+        if record.get("tx_hash"):
+            self._transaction(record["tx_hash"])
+            gas = record.get("gas_used") or 0
+            self.gas_used += int(gas, 0) if isinstance(gas, str) else gas
+        status = record.get("status")
+        if status not in (None, "success"):
+            return self._error(f"{status}: {json.dumps(record)[:500]}")
+        return None
+
+    def _feed_text(self, line: str) -> str:
+        deployed = DEPLOYED_AT.match(line)
+        if deployed:
+            label, address = deployed.groups()
+            self.addresses[label] = address
+            print(f"   📄 {label}: {address}")
+        tx_hash = TX_HASH.search(line)
+        if tx_hash:
+            self._transaction(tx_hash.group(1))
+        stripped = line.strip()
+        if any(pattern.search(stripped) for pattern in FATAL_PATTERNS):
+            return self._error(stripped)
+        return None
+
+    def _transaction(self, tx_hash: str):
+        if tx_hash not in self.transactions:
+            self.transactions.append(tx_hash)
+            print(f"   📤 Transaction {tx_hash}")
+
+    def _error(self, message: str) -> str:
+        self.errors.append(message)
+        print(f"   ❌ {message}")
+        return message
+
+
+def stream_forge(cmd: list, env: dict) -> ForgeRun:
+    """Run forge, parsing its output as it comes and stopping it on a fatal error"""
+    run = ForgeRun()
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env, bufsize=1
+    )
+    try:
+        while True:
+            line = process.stdout.readline(MAX_LINE_CHARS)
+            if not line:
+                break
+            if not line.endswith("\n"):
+                # Keep the rest of an oversized JSON record, drop the rest of
+                # an oversized text line
+                parts = [line]
+                while True:
+                    rest = process.stdout.readline(MAX_LINE_CHARS)
+                    if line.startswith("{"):
+                        parts.append(rest)
+                    if not rest or rest.endswith("\n"):
+                        break
+                line = "".join(parts)
+            fatal = run.feed(line.rstrip("\n"))
+            if fatal:
+                run.aborted = fatal
+                process.terminate()
+                break
+    finally:
+        process.stdout.close()
+        run.returncode = process.wait()
+    return run
+
+
+class DeploymentManager:
+    def __init__(self, dry_run: bool = False):
         # Check required environment variables
+        explorer_vars = [] if dry_run else [
+            "BASE_EXPLORER_API_KEY",
+            "ETHERSCAN_API_KEY",
+            "ARBISCAN_API_KEY",
+        ]
         required_vars = [
             "BASE_SEPOLIA_RPC",
             "ETH_SEPOLIA_RPC",
             "ARBITRUM_SEPOLIA_RPC",
-            "BASE_EXPLORER_API_KEY",
-            "ETHERSCAN_API_KEY",
-            "ARBISCAN_API_KEY",
+            *explorer_vars,
             "PRIVATE_KEY",
             "BASE_TOKEN_MESSENGER",
             "BASE_MESSAGE_TRANSMITTER",
@@ -75,9 +217,34 @@ class DeploymentManager:
             "arbitrum_sepolia": {},
         }
 
+        # (script, network, seconds, gas) of every forge run
+        self.runs = []
+
+        # A dry run deploys to local forks of every network, without verifying
+        self.dry_run = dry_run
+        self.forks = {}
+        if dry_run:
+            started = time.monotonic()
+            deployer = Account.from_key(os.getenv("PRIVATE_KEY")).address
+            self.forks = start_forks(
+                {network: config["rpc_url"] for network, config in self.networks.items()},
+                deployer,
+            )
+            for network, (_, url) in self.forks.items():
+                self.networks[network]["rpc_url"] = url
+                self.networks[network]["explorer_api_key"] = None
+            print(f"🍴 Forked {len(self.forks)} networks in {time.monotonic() - started:.1f}s")
+
+        # Blocks we are willing to wait for each deployment transaction
+        self.target_blocks = int(os.getenv("DEPLOY_TARGET_BLOCKS", "3"))
+        self.fee_oracles = {
+            network: FeeOracle(make_web3(config["rpc_url"]))
+            for network, config in self.networks.items()
+        }
+
     def run_forge_command(
         self, script_path: str, network: str, verify: bool = True
-    ) -> subprocess.CompletedProcess:
+    ) -> ForgeRun:
         """Run forge script command for a specific network"""
         print(f"\n🚀 Deploying {script_path} to {self.networks[network]['name']}...")
 
@@ -93,12 +260,27 @@ class DeploymentManager:
             "script",
             script_path,
             "--rpc-url",
-            self.networks[network]["rpc_url"],
+            # forge takes a single endpoint, give it the healthiest one
+            get_multi_client(self.networks[network]["rpc_url"]).best_url(),
             "--broadcast",
-            "-vvv",
+            "--json",
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        # Price for the target inclusion latency instead of forge's defaults
+        fees = self.fee_oracles[network].suggest(self.target_blocks)
+        if "gasPrice" in fees:
+            cmd += ["--legacy", "--with-gas-price", str(fees["gasPrice"])]
+        else:
+            cmd += [
+                "--with-gas-price",
+                str(fees["maxFeePerGas"]),
+                "--priority-gas-price",
+                str(fees["maxPriorityFeePerGas"]),
+            ]
+
+        started = time.monotonic()
+        result = stream_forge(cmd, env)
+        self.runs.append((script_path, network, time.monotonic() - started, result.gas_used))
 
         if result.returncode != 0:
             return result
@@ -113,9 +295,7 @@ class DeploymentManager:
                 "--etherscan-api-key",
                 self.networks[network]["explorer_api_key"],
             ]
-            verify_result = subprocess.run(
-                verify_cmd, capture_output=True, text=True, env=env
-            )
+            verify_result = stream_forge(verify_cmd, env)
 
             if verify_result.returncode != 0:
                 print(
@@ -125,24 +305,25 @@ class DeploymentManager:
 
         return result
 
-    def extract_address(self, output: str, contract_type: str) -> str:
-        """Extract deployed contract address from forge output"""
-        search_texts = {
-            "Telepay": "Base Telepay deployed at:",
-            "TelepayVault": "TelepayVault deployed at:",
-            "Router": "Router deployed at:",
-            "BaseRouter": "Base Router deployed at:",
-            "EthereumRouter": "Ethereum Router deployed at:",
-            "ArbitrumRouter": "Arbitrum Router deployed at:",
-            "EulerVaultMock": "EulerVaultMock deployed at:",
+    def extract_address(self, result: ForgeRun, contract_type: str) -> str:
+        """Deployed contract address, as logged by the forge script
+
+        Raises if the script never logged it: later steps would otherwise run
+        without the address they depend on.
+        """
+        labels = {
+            "Telepay": "Base Telepay",
+            "BaseRouter": "Base Router",
+            "EthereumRouter": "Ethereum Router",
+            "ArbitrumRouter": "Arbitrum Router",
         }
-
-        search_text = search_texts.get(contract_type, f"{contract_type} deployed at:")
-
-        for line in output.split("\n"):
-            if search_text in line:
-                return line.split(":", 1)[1].strip()
-        return None
+        label = labels.get(contract_type, contract_type)
+        if label not in result.addresses:
+            raise Exception(
+                f"No '{label} deployed at:' line in the forge output, "
+                f"found {sorted(result.addresses) or 'none'}"
+            )
+        return result.addresses[label]
 
     def deploy(self):
         """Run the complete deployment sequence"""
@@ -153,13 +334,10 @@ class DeploymentManager:
             if result.returncode != 0:
                 raise Exception(f"EulerVaultMock deployment failed: {result.stderr}")
 
-            euler_vault_address = self.extract_address(result.stdout, "EulerVaultMock")
-            if euler_vault_address:
-                self.deployed_addresses["ETH_EULER_VAULT_ADDRESS"] = euler_vault_address
-                self.deployed_contracts["eth_sepolia"][
-                    "EulerVaultMock"
-                ] = euler_vault_address
-                print(f"✅ EulerVaultMock deployed at: {euler_vault_address}")
+            euler_vault_address = self.extract_address(result, "EulerVaultMock")
+            self.deployed_addresses["ETH_EULER_VAULT_ADDRESS"] = euler_vault_address
+            self.deployed_contracts["eth_sepolia"]["EulerVaultMock"] = euler_vault_address
+            print(f"✅ EulerVaultMock deployed at: {euler_vault_address}")
 
             # 2. Deploy Vault on Ethereum Sepolia
             print("\n📝 Step 2: Deploying Vault on Ethereum Sepolia")
@@ -167,11 +345,10 @@ class DeploymentManager:
             if result.returncode != 0:
                 raise Exception(f"Vault deployment failed: {result.stderr}")
 
-            vault_address = self.extract_address(result.stdout, "TelepayVault")
-            if vault_address:
-                self.deployed_addresses["ETH_VAULT_ADDRESS"] = vault_address
-                self.deployed_contracts["eth_sepolia"]["TelepayVault"] = vault_address
-                print(f"✅ Vault deployed at: {vault_address}")
+            vault_address = self.extract_address(result, "TelepayVault")
+            self.deployed_addresses["ETH_VAULT_ADDRESS"] = vault_address
+            self.deployed_contracts["eth_sepolia"]["TelepayVault"] = vault_address
+            print(f"✅ Vault deployed at: {vault_address}")
 
             # 3. Deploy Telepay on Base Sepolia
             print("\n📝 Step 3: Deploying Telepay on Base Sepolia")
@@ -179,37 +356,33 @@ class DeploymentManager:
             if result.returncode != 0:
                 raise Exception(f"Telepay deployment failed: {result.stderr}")
 
-            telepay_address = self.extract_address(result.stdout, "Telepay")
-            if telepay_address:
-                self.deployed_addresses["BASE_TELEPAY_ADDRESS"] = telepay_address
-                self.deployed_contracts["base_sepolia"]["Telepay"] = telepay_address
-                print(f"✅ Telepay deployed at: {telepay_address}")
-
-            # 4. Deploy Router only on Arbitrum
-            print(f"\n📝 Deploying Router on Arbitrum Sepolia")
-            result = self.run_forge_command("script/Router.s.sol", "arbitrum_sepolia")
-            if result.returncode != 0:
-                raise Exception(
-                    f"Router deployment on arbitrum_sepolia failed: {result.stderr}"
-                )
-
-            router_address = self.extract_address(result.stdout, "Router")
-            if router_address:
-                self.deployed_addresses["ARBITRUM_ROUTER_ADDRESS"] = router_address
-                self.deployed_contracts["arbitrum_sepolia"][
-                    "TelepayRouter"
-                ] = router_address
+            telepay_address = self.extract_address(result, "Telepay")
+            self.deployed_addresses["BASE_TELEPAY_ADDRESS"] = telepay_address
+            self.deployed_contracts["base_sepolia"]["Telepay"] = telepay_address
+            print(f"✅ Telepay deployed at: {telepay_address}")
+
+            # 4. Deploy the Router on every chain. It reads its role from
+            # the chain's CCTP domain: on Base it credits Telepay directly and
+            # registers itself, on Ethereum it pays the vault directly, other
+            # chains go through CCTP both ways
+            routers = {
+                "base_sepolia": ("BaseRouter", "BASE_ROUTER_ADDRESS"),
+                "eth_sepolia": ("EthereumRouter", "ETH_ROUTER_ADDRESS"),
+                "arbitrum_sepolia": ("ArbitrumRouter", "ARBITRUM_ROUTER_ADDRESS"),
+            }
+            for network, (contract_type, env_name) in routers.items():
+                print(f"\n📝 Step 4: Deploying Router on {self.networks[network]['name']}")
+                result = self.run_forge_command("script/Router.s.sol", network)
+                if result.returncode != 0:
+                    raise Exception(
+                        f"Router deployment on {network} failed: {result.stderr}"
+                    )
+
+                router_address = self.extract_address(result, contract_type)
+                self.deployed_addresses[env_name] = router_address
+                self.deployed_contracts[network]["TelepayRouter"] = router_address
                 print(f"✅ Router deployed at: {router_address}")
 
-            # Comment out Base and Ethereum router deployments for now
-            # for network in ["base_sepolia", "eth_sepolia", "arbitrum_sepolia"]:
-            #     print(f"\n📝 Deploying Router on {self.networks[network]['name']}")
-            #     result = self.run_forge_command("script/Router.s.sol", network)
-            #     if result.returncode != 0:
-            #         raise Exception(
-            #             f"Router deployment on {network} failed: {result.stderr}"
-            #         )
-
             # Print deployment summary
             print("\n" + "=" * 50)
             print("📋 DEPLOYMENT SUMMARY")
@@ -222,13 +395,66 @@ class DeploymentManager:
                     for contract_name, address in contracts.items():
                         print(f"📄 {contract_name}: {address}")
 
+            self.print_runs()
+
+            # Every router, the vault and Telepay must point at each other
+            print("\n📝 Checking the deployment")
+            failures = check_deployment(
+                {network: config["rpc_url"] for network, config in self.networks.items()},
+                self.deployed_addresses,
+            )
+            if failures:
+                raise Exception(f"{len(failures)} post-deploy checks failed")
+
+            if self.dry_run:
+                self.rehearse()
+            print_metrics()
             print("\n✅ Deployment sequence completed successfully!")
 
         except Exception as e:
             print(f"\n❌ Deployment failed with error: {str(e)}")
             raise
+        finally:
+            if self.forks:
+                stop_forks(self.forks)
+
+    def print_runs(self):
+        print(f"\n{'script':<28}{'network':<18}{'time':>8}{'gas':>14}")
+        for script_path, network, seconds, gas in self.runs:
+            print(f"{Path(script_path).name:<28}{network:<18}{seconds:>7.1f}s{gas:>14,}")
+        total = sum(seconds for _, _, seconds, _ in self.runs)
+        gas = sum(gas for _, _, _, gas in self.runs)
+        print(f"{'total':<46}{total:>7.1f}s{gas:>14,}")
+
+    def rehearse(self):
+        """Relay a first deposit through every router on the forks
+
+        Ethereum's router pays the vault and sends the credit, Base's burns
+        to the vault and credits Telepay locally, Arbitrum's goes through
+        CCTP both ways.
+        """
+        deployer = Account.from_key(os.getenv("PRIVATE_KEY")).address
+        for source in REHEARSAL_SOURCES:
+            print(f"\n📝 Dry run: relaying a router deposit from {self.networks[source]['name']}")
+            started = time.monotonic()
+            gas = rehearse_deposit(self.forks, deployer, source, self.deployed_addresses)
+            for network, used in gas.items():
+                if used:
+                    print(f"   ⛽ {self.networks[network]['name']}: {used:,} gas")
+            print(
+                f"✅ Deposit credited on Telepay and funded the vault in "
+                f"{time.monotonic() - started:.1f}s"
+            )
 
 
 if __name__ == "__main__":
-    deployer = DeploymentManager()
+    parser = argparse.ArgumentParser(description="Deploy Telepay on every network")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Deploy to local forks and relay a test deposit, nothing is broadcast",
+    )
+    args = parser.parse_args()
+
+    deployer = DeploymentManager(dry_run=args.dry_run)
     deployer.deploy()
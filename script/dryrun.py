@@ -0,0 +1,198 @@
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_keys import keys
+from web3 import Web3
+
+from reconcile import DOMAINS, MESSAGE_SENT, env_prefix, parse_message
+from rpc import RpcClient, RpcError, get_multi_client
+
+# First local port of the forks, one per network after it
+FORK_PORT = 18545
+
+# ETH given to every account the rehearsal sends from
+FORK_BALANCE = 1000 * 10**18
+
+# Deposit relayed through the forks, 1 USDC
+REHEARSAL_AMOUNT = 10**6
+
+# A deposit from every router's chain, one per route: Vault, Telepay, CCTP
+REHEARSAL_SOURCES = ["eth_sepolia", "base_sepolia", "arbitrum_sepolia"]
+
+# Stand-in attester enabled on the destination transmitters, anvil's last key
+ATTESTER_KEY = "0x2a871d0798f97d79848a013d4936a73bf4cc922c825d33c1cf7073dff6d409c6"
+
+NETWORK_OF_DOMAIN = {domain: network for network, domain in DOMAINS.items()}
+
+
+class RehearsalError(Exception):
+    """A dry run step that would have failed on the real network"""
+
+
+def start_fork(fork_url: str, port: int) -> subprocess.Popen:
+    """anvil forking fork_url at its latest block, ready to serve on port"""
+    if not shutil.which("anvil"):
+        raise EnvironmentError("anvil not found, install Foundry to use --dry-run")
+    process = subprocess.Popen(
+        ["anvil", "--fork-url", fork_url, "--port", str(port), "--silent"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    client = RpcClient(f"http://127.0.0.1:{port}", retries=0, timeout=1)
+    for _ in range(300):
+        try:
+            client.call("eth_chainId")
+            return process
+        except RpcError:
+            time.sleep(0.1)
+    process.kill()
+    raise RehearsalError(f"anvil fork of {fork_url} did not start on port {port}")
+
+
+def start_forks(rpc_urls: dict, deployer: str) -> dict:
+    """Fork every network at once, network -> (process, local url)
+
+    The deployer is funded on every fork, so a rehearsal does not depend on
+    its testnet balance.
+    """
+    ports = {network: FORK_PORT + i for i, network in enumerate(rpc_urls)}
+    with ThreadPoolExecutor(max_workers=len(rpc_urls)) as pool:
+        futures = {
+            network: pool.submit(start_fork, get_multi_client(url).best_url(), ports[network])
+            for network, url in rpc_urls.items()
+        }
+        forks = {}
+        for network, future in futures.items():
+            url = f"http://127.0.0.1:{ports[network]}"
+            forks[network] = (future.result(), url)
+            RpcClient(url).call("anvil_setBalance", [deployer, hex(FORK_BALANCE)])
+    return forks
+
+
+def stop_forks(forks: dict):
+    for process, _ in forks.values():
+        process.terminate()
+    for process, _ in forks.values():
+        process.wait()
+
+
+class Fork:
+    """Calls and unlocked transactions on one anvil fork"""
+
+    def __init__(self, network: str, url: str):
+        self.network = network
+        self.client = RpcClient(url)
+        self.gas_used = 0
+
+    def call(self, to: str, signature: str, types: list = (), args: list = (), returns: str = "uint256"):
+        data = Web3.keccak(text=signature)[:4] + encode(list(types), list(args))
+        result = self.client.call("eth_call", [{"to": to, "data": "0x" + data.hex()}, "latest"])
+        (value,) = decode([returns], bytes.fromhex(result[2:]))
+        return value
+
+    def send(self, sender: str, to: str, signature: str, types: list = (), args: list = ()) -> dict:
+        """Transaction from any account, impersonated, mined at once"""
+        self.client.call("anvil_impersonateAccount", [sender])
+        self.client.call("anvil_setBalance", [sender, hex(FORK_BALANCE)])
+        data = Web3.keccak(text=signature)[:4] + encode(list(types), list(args))
+        tx_hash = self.client.call(
+            "eth_sendTransaction", [{"from": sender, "to": to, "data": "0x" + data.hex()}]
+        )
+        receipt = self.client.call("eth_getTransactionReceipt", [tx_hash])
+        self.gas_used += int(receipt["gasUsed"], 16)
+        if int(receipt["status"], 16) != 1:
+            raise RehearsalError(f"{signature} reverted on the {self.network} fork ({tx_hash})")
+        return receipt
+
+
+def attest(message: bytes) -> bytes:
+    """Signature of the stand-in attester, as Circle's attestation service gives it"""
+    signature = keys.PrivateKey(bytes.fromhex(ATTESTER_KEY[2:])).sign_msg_hash(
+        Web3.keccak(message)
+    )
+    v, r, s = signature.vrs
+    return r.to_bytes(32, "big") + s.to_bytes(32, "big") + bytes([v + 27])
+
+
+def trust_attester(fork: Fork, transmitter: str):
+    """Make the stand-in attester's signature alone enough on a transmitter"""
+    attester = Account.from_key(ATTESTER_KEY).address
+    manager = fork.call(transmitter, "attesterManager()", returns="address")
+    if not fork.call(transmitter, "isEnabledAttester(address)", ["address"], [attester], "bool"):
+        fork.send(manager, transmitter, "enableAttester(address)", ["address"], [attester])
+    if fork.call(transmitter, "signatureThreshold()") != 1:
+        fork.send(manager, transmitter, "setSignatureThreshold(uint256)", ["uint256"], [1])
+
+
+def rehearse_deposit(forks: dict, deployer: str, source: str, addresses: dict) -> dict:
+    """A router deposit on source, relayed through CCTP on the forks
+
+    USDC is minted to the deployer through the token's master minter, the
+    deposit's messages are signed by a stand-in attester the destination
+    transmitters are made to trust, and relayed like a relayer would. Each
+    source credits its own public key, so rehearsals can follow each other
+    on the same forks. Returns the gas used per network.
+    """
+    chains = {network: Fork(network, url) for network, (_, url) in forks.items()}
+    prefix = env_prefix(source)
+    usdc = os.getenv(f"{source.upper()}_USDC")
+    router = addresses[f"{prefix}_ROUTER_ADDRESS"]
+    telepay = addresses["BASE_TELEPAY_ADDRESS"]
+    vault = addresses["ETH_VAULT_ADDRESS"]
+    transmitter = os.getenv(f"{prefix}_MESSAGE_TRANSMITTER")
+    fork = chains[source]
+    pub_key = Web3.keccak(text=f"telepay dry run from {source}") * 2
+    eth = chains[NETWORK_OF_DOMAIN[0]]
+    eth_usdc = os.getenv("ETH_SEPOLIA_USDC")
+    # Before the deposit: from Ethereum it pays the vault directly
+    vault_before = eth.call(eth_usdc, "balanceOf(address)", ["address"], [vault])
+    credited_before = chains["base_sepolia"].call(telepay, "balances(bytes)", ["bytes"], [pub_key])
+
+    master_minter = fork.call(usdc, "masterMinter()", returns="address")
+    fork.send(
+        master_minter,
+        usdc,
+        "configureMinter(address,uint256)",
+        ["address", "uint256"],
+        [deployer, REHEARSAL_AMOUNT],
+    )
+    fork.send(deployer, usdc, "mint(address,uint256)", ["address", "uint256"], [deployer, REHEARSAL_AMOUNT])
+    fork.send(deployer, usdc, "approve(address,uint256)", ["address", "uint256"], [router, REHEARSAL_AMOUNT])
+    receipt = fork.send(
+        deployer, router, "deposit(bytes,uint256)", ["bytes", "uint256"], [pub_key, REHEARSAL_AMOUNT]
+    )
+
+    messages = [
+        decode(["bytes"], bytes.fromhex(log["data"][2:]))[0]
+        for log in receipt["logs"]
+        if log["address"].lower() == transmitter.lower() and log["topics"][0] == MESSAGE_SENT.hex()
+    ]
+    if not messages:
+        raise RehearsalError(f"Deposit on {source} sent no CCTP message")
+
+    for message in messages:
+        destination = NETWORK_OF_DOMAIN[parse_message(message)["destinationDomain"]]
+        target = chains[destination]
+        target_transmitter = os.getenv(f"{env_prefix(destination)}_MESSAGE_TRANSMITTER")
+        trust_attester(target, target_transmitter)
+        target.send(
+            deployer,
+            target_transmitter,
+            "receiveMessage(bytes,bytes)",
+            ["bytes", "bytes"],
+            [message, attest(message)],
+        )
+        print(f"   📨 Relayed {source} -> {destination}")
+
+    credited = chains["base_sepolia"].call(telepay, "balances(bytes)", ["bytes"], [pub_key]) - credited_before
+    if credited != REHEARSAL_AMOUNT:
+        raise RehearsalError(f"Telepay credited {credited} instead of {REHEARSAL_AMOUNT}")
+    funded = eth.call(eth_usdc, "balanceOf(address)", ["address"], [vault]) - vault_before
+    if funded != REHEARSAL_AMOUNT:
+        raise RehearsalError(f"Vault received {funded} instead of {REHEARSAL_AMOUNT}")
+    return {network: chain.gas_used for network, chain in chains.items()}
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+from eth_abi import decode
+from web3 import Web3
+
+from rpc import make_web3
+
+load_dotenv()
+
+# Blocks per eth_getLogs request, below common provider limits
+LOG_CHUNK_SIZE = 2000
+
+# name -> (signature, indexed topic fields, data fields)
+EVENTS = {
+    "NativeTransfer": (
+        "NativeTransfer(bytes32,bytes32,bytes,bytes,uint256,uint256)",
+        [("fromPubKeyHash", "bytes32"), ("toPubKeyHash", "bytes32")],
+        [("fromPubKey", "bytes"), ("toPubKey", "bytes"), ("amount", "uint256"), ("nonce", "uint256")],
+    ),
+    "Credit": (
+        "Credit(bytes32,uint32,bytes,uint256,uint64)",
+        [("pubKeyHash", "bytes32"), ("sourceDomain", "uint32")],
+        [("pubKey", "bytes"), ("amount", "uint256"), ("burnNonce", "uint64")],
+    ),
+    "BatchSettled": (
+        "BatchSettled(bytes32,uint256)",
+        [("root", "bytes32")],
+        [("count", "uint256")],
+    ),
+    "Deposit": (
+        "Deposit(bytes32,bytes,uint256,uint64)",
+        [("pubKeyHash", "bytes32")],
+        [("pubKey", "bytes"), ("amount", "uint256"), ("burnNonce", "uint64")],
+    ),
+}
+
+TOPICS = {Web3.keccak(text=signature): name for name, (signature, _, _) in EVENTS.items()}
+TOPIC_OF = {name: topic for topic, name in TOPICS.items()}
+
+
+def pubkey_topic(pub_key: bytes) -> str:
+    """Topic a public key is indexed under"""
+    return Web3.keccak(pub_key).hex()
+
+
+def decode_log(log) -> dict:
+    """Telepay or TelepayRouter log as a flat dict, None for other events"""
+    name = TOPICS.get(bytes(log["topics"][0]))
+    if name is None:
+        return None
+    _, indexed, data = EVENTS[name]
+
+    event = {
+        "event": name,
+        "address": log["address"],
+        "blockNumber": log["blockNumber"],
+        "transactionHash": log["transactionHash"].hex(),
+        "logIndex": log["logIndex"],
+    }
+    for (field, abi_type), topic in zip(indexed, log["topics"][1:]):
+        (event[field],) = decode([abi_type], bytes(topic))
+    values = decode([abi_type for _, abi_type in data], bytes(log["data"]))
+    event.update(zip((field for field, _ in data), values))
+    return event
+
+
+def iter_logs(w3: Web3, address: str, topics: list, from_block: int, to_block: int):
+    """Logs one chunk of blocks at a time, so a long range is never held at once"""
+    for start in range(from_block, to_block + 1, LOG_CHUNK_SIZE):
+        end = min(start + LOG_CHUNK_SIZE - 1, to_block)
+        yield from w3.eth.get_logs(
+            {"fromBlock": start, "toBlock": end, "address": address, "topics": topics}
+        )
+
+
+def get_logs(w3: Web3, address: str, topics: list, from_block: int, to_block: int) -> list:
+    return list(iter_logs(w3, address, topics, from_block, to_block))
+
+
+def history(w3: Web3, telepay: str, pub_key: bytes, from_block: int, to_block: int) -> list:
+    """Credits and transfers of one public key, decoded and in chain order
+
+    Only logs indexed under the key are fetched: transfers sent or received
+    and credits, matched by topic on the node.
+    """
+    key = pubkey_topic(pub_key)
+    transfer = TOPIC_OF["NativeTransfer"].hex()
+    credit = TOPIC_OF["Credit"].hex()
+    telepay = Web3.to_checksum_address(telepay)
+
+    logs = get_logs(w3, telepay, [[transfer, credit], key], from_block, to_block)
+    logs += get_logs(w3, telepay, [transfer, None, key], from_block, to_block)
+
+    # A transfer to oneself matches both queries
+    unique = {(log["blockNumber"], log["logIndex"]): log for log in logs}
+    return [decode_log(unique[k]) for k in sorted(unique)]
+
+
+def deposits(w3: Web3, router: str, pub_key: bytes, from_block: int, to_block: int) -> list:
+    """Deposits crediting one public key through a router"""
+    topics = [TOPIC_OF["Deposit"].hex(), pubkey_topic(pub_key)]
+    logs = get_logs(w3, Web3.to_checksum_address(router), topics, from_block, to_block)
+    return [decode_log(log) for log in logs]
+
+
+def _printable(event: dict) -> dict:
+    return {k: "0x" + v.hex() if isinstance(v, bytes) else v for k, v in event.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telepay activity of one public key")
+    parser.add_argument("--pubkey", required=True, help="64-byte public key, hex")
+    parser.add_argument("--rpc-url", default=os.getenv("BASE_SEPOLIA_RPC"))
+    parser.add_argument("--telepay", default=os.getenv("BASE_TELEPAY_ADDRESS"))
+    parser.add_argument("--router", help="Also list deposits through this router")
+    parser.add_argument("--router-rpc-url", default=os.getenv("ARBITRUM_SEPOLIA_RPC"))
+    parser.add_argument("--from-block", type=int, default=0)
+    parser.add_argument("--to-block", type=int)
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    args = parser.parse_args()
+
+    if not args.telepay:
+        raise EnvironmentError("--telepay or BASE_TELEPAY_ADDRESS must be set")
+
+    pub_key = Web3.to_bytes(hexstr=args.pubkey)
+    w3 = make_web3(args.rpc_url)
+    to_block = args.to_block if args.to_block is not None else w3.eth.block_number
+    events = history(w3, args.telepay, pub_key, args.from_block, to_block)
+    if args.router:
+        router_w3 = make_web3(args.router_rpc_url)
+        events += deposits(
+            router_w3, args.router, pub_key, args.from_block, router_w3.eth.block_number
+        )
+
+    for event in events:
+        event = _printable(event)
+        if args.json:
+            print(json.dumps(event))
+        elif event["event"] == "NativeTransfer":
+            direction = "out" if event["fromPubKey"] == "0x" + pub_key.hex() else "in"
+            print(
+                f"🔁 #{event['blockNumber']} transfer {direction} {event['amount']} "
+                f"(nonce {event['nonce']})"
+            )
+        elif event["event"] == "Credit":
+            print(
+                f"💰 #{event['blockNumber']} credit {event['amount']} from domain "
+                f"{event['sourceDomain']} (burn nonce {event['burnNonce']})"
+            )
+        else:
+            print(
+                f"📥 #{event['blockNumber']} deposit {event['amount']} on {event['address']} "
+                f"(burn nonce {event['burnNonce']})"
+            )
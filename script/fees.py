@@ -0,0 +1,204 @@
+import time
+from typing import Dict
+
+from web3 import Web3
+from web3.exceptions import MethodUnavailable
+
+from preflight import Reverted
+
+# Reward percentiles sampled from eth_feeHistory
+REWARD_PERCENTILES = [10, 25, 50, 75, 90]
+
+# Base fee can rise at most 12.5% per block under EIP-1559
+BASE_FEE_MAX_CHANGE = 1.125
+
+# Cap the headroom at ~2x the current base fee, like most wallets do
+MAX_HEADROOM_BLOCKS = 6
+
+# Nodes only accept a replacement that raises both fees by at least 10%
+REPLACEMENT_BUMP = 1.125
+
+# How nodes without eth_feeHistory answer it: JSON-RPC "method not found",
+# or a message saying so
+METHOD_NOT_FOUND = -32601
+UNSUPPORTED_HINTS = ("not supported", "does not exist", "not available", "method not found")
+
+
+def is_unsupported(error: Exception) -> bool:
+    """Whether a JSON-RPC error says the node doesn't have the method"""
+    if isinstance(error, MethodUnavailable):
+        return True
+    details = error.args[0] if error.args else None
+    if isinstance(details, dict):
+        if details.get("code") == METHOD_NOT_FOUND:
+            return True
+        details = details.get("message", "")
+    return any(hint in str(details).lower() for hint in UNSUPPORTED_HINTS)
+
+
+class FeeOracle:
+    """EIP-1559 fee suggestions for one chain, from a briefly cached eth_feeHistory
+
+    On a chain whose node has no eth_feeHistory, suggestions are a legacy
+    gasPrice instead.
+    """
+
+    def __init__(self, w3: Web3, history_blocks: int = 20, ttl: float = 6.0):
+        self.w3 = w3
+        self.history_blocks = history_blocks
+        self.ttl = ttl
+        self.legacy = False
+        self._history = None
+        self._fetched_at = 0.0
+
+    def history(self) -> dict:
+        if self._history is None or time.monotonic() - self._fetched_at > self.ttl:
+            self._history = self.w3.eth.fee_history(
+                self.history_blocks, "latest", REWARD_PERCENTILES
+            )
+            self._fetched_at = time.monotonic()
+        return self._history
+
+    @staticmethod
+    def percentile_for(target_blocks: int) -> int:
+        """Tip percentile to pay for inclusion within target_blocks"""
+        if target_blocks <= 1:
+            return 90
+        if target_blocks <= 3:
+            return 75
+        if target_blocks <= 6:
+            return 50
+        if target_blocks <= 20:
+            return 25
+        return 10
+
+    def suggest(self, target_blocks: int = 3) -> Dict[str, int]:
+        """maxFeePerGas and maxPriorityFeePerGas for inclusion within target_blocks
+
+        The tip is the median over recent blocks of the reward percentile that
+        got included, and maxFee covers the tip plus the next base fee rising
+        at the maximum rate for every block we are willing to wait (up to
+        MAX_HEADROOM_BLOCKS). Only gasPrice on a legacy chain. Any other
+        eth_feeHistory failure is raised, not taken for a legacy chain.
+        """
+        if not self.legacy:
+            try:
+                history = self.history()
+            except (ValueError, MethodUnavailable) as e:
+                if not is_unsupported(e):
+                    raise
+                self.legacy = True
+        if self.legacy:
+            return {"gasPrice": self.w3.eth.gas_price}
+
+        column = REWARD_PERCENTILES.index(self.percentile_for(target_blocks))
+        rewards = sorted(
+            block[column] for block in history["reward"] if block[column] > 0
+        )
+        tip = rewards[len(rewards) // 2] if rewards else 1
+
+        next_base_fee = history["baseFeePerGas"][-1]
+        headroom = min(max(target_blocks, 1), MAX_HEADROOM_BLOCKS)
+        max_base_fee = int(next_base_fee * BASE_FEE_MAX_CHANGE**headroom) + 1
+        return {"maxFeePerGas": max_base_fee + tip, "maxPriorityFeePerGas": tip}
+
+    def bump(self, fees: Dict[str, int], target_blocks: int = 1) -> Dict[str, int]:
+        """Fees for a replacement of a transaction sent with `fees`
+
+        Raises every field by the replacement minimum, or to the current
+        suggestion if the market has moved further than that.
+        """
+        fresh = self.suggest(target_blocks)
+        return {key: max(int(fees[key] * REPLACEMENT_BUMP) + 1, fresh[key]) for key in fresh}
+
+
+def send_with_replacement(
+    w3: Web3,
+    oracle: FeeOracle,
+    account,
+    tx: dict,
+    target_blocks: int = 3,
+    wait_blocks: int = None,
+    max_attempts: int = 5,
+    preflight=None,
+):
+    """Sign and send tx, speeding it up with the same nonce while it is stuck
+
+    A transaction not mined within wait_blocks (twice the target by default)
+    is replaced with bumped fees. Returns the receipt of whichever
+    replacement gets mined. With a preflight.Preflight, tx is simulated
+    before it is first sent and before every replacement, and raises
+    preflight.Reverted instead of paying for a revert. A replacement is
+    only simulated once no earlier attempt has a receipt, and takes the gas
+    of that simulation unless tx came with its own.
+    """
+    wait_blocks = wait_blocks or 2 * target_blocks
+    tx = {
+        **tx,
+        "from": account.address,
+        "nonce": tx.get("nonce", w3.eth.get_transaction_count(account.address)),
+        "chainId": tx.get("chainId", w3.eth.chain_id),
+    }
+    # Priced by the oracle, with gasPrice on a legacy chain
+    for key in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+        tx.pop(key, None)
+    estimated = "gas" not in tx
+    if preflight is not None:
+        tx = preflight.check(tx)
+    elif "gas" not in tx:
+        tx["gas"] = w3.eth.estimate_gas(tx)
+
+    fees = oracle.suggest(target_blocks)
+    sent = []
+    for attempt in range(max_attempts):
+        if attempt > 0:
+            # An attempt mined since the last poll changed the state the
+            # replacement would be simulated on, and may make it revert
+            receipt = _first_receipt(w3, sent)
+            if receipt is not None:
+                return receipt
+            if preflight is not None:
+                try:
+                    tx = preflight.check({k: v for k, v in tx.items() if not (estimated and k == "gas")})
+                except Reverted:
+                    receipt = _first_receipt(w3, sent)
+                    if receipt is None:
+                        raise
+                    return receipt
+            fees = oracle.bump(fees)
+            priced = ", ".join(f"{key}={value}" for key, value in fees.items())
+            print(f"⏫ Transaction stuck after {wait_blocks} blocks, replacing with {priced}")
+
+        signed = account.sign_transaction({**tx, **fees})
+        try:
+            sent.append(w3.eth.send_raw_transaction(signed.rawTransaction))
+        except ValueError as e:
+            # An earlier attempt got mined between our checks. Without one,
+            # the nonce was already used and no attempt can ever be mined.
+            if not sent or "nonce too low" not in str(e).lower():
+                raise
+
+        deadline = w3.eth.block_number + wait_blocks
+        while w3.eth.block_number < deadline:
+            receipt = _first_receipt(w3, sent)
+            if receipt is not None:
+                return receipt
+            time.sleep(1)
+
+    raise TimeoutError(f"Transaction not mined after {max_attempts} attempts")
+
+
+def _first_receipt(w3: Web3, sent: list):
+    """Receipt of whichever attempt was mined, latest first, or None"""
+    for tx_hash in reversed(sent):
+        receipt = _receipt_or_none(w3, tx_hash)
+        if receipt is not None:
+            return receipt
+    return None
+
+
+def _receipt_or_none(w3: Web3, tx_hash):
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except Exception:
+        return None
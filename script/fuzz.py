@@ -0,0 +1,915 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+
+from batch import MerkleTree, leaf, settle_calldata, sign_batch
+from contracts import load_artifact
+from loadgen import ANVIL_MNEMONIC
+from rpc import RpcClient, RpcError
+
+load_dotenv()
+
+UINT256_MAX = 2**256 - 1
+
+# Telepay public keys, token holding accounts and nonce words exercised
+KEYS = 4
+USERS = 2
+NONCE_WORDS = 2
+
+# MockUSDC minted to its deployer
+INITIAL_SUPPLY = 1_000_000 * 10**6
+
+# Every fuzzed transaction gets the same gas, so reverting ones are mined
+# instead of failing gas estimation
+OP_GAS = 3_000_000
+DEPLOY_GAS = 10_000_000
+BLOCK_GAS_LIMIT = 10**10
+
+TELEPAY_DOMAIN = 6
+SOURCE_DOMAIN = 3
+
+# Signs batches the contract must reject
+WRONG_OPERATOR_KEY = "0x" + "77" * 32
+
+MESSAGE_SENT = Web3.keccak(text="MessageSent(uint64,uint32,bytes32,bytes)")
+
+# Position of the amount in each operation, for shrinking
+AMOUNT_FIELD = {
+    "debug_set": 2,
+    "transfer": 3,
+    "credit": 2,
+    "mint": 2,
+    "approve": 2,
+    "deposit": 3,
+    "fund_vault": 1,
+    "invest": 1,
+    "uninvest": 1,
+    "ensure": 1,
+    "withdraw": 1,
+    "donor_deposit": 1,
+    "donor_withdraw": 1,
+    "yield": 1,
+}
+
+
+class HarnessError(Exception):
+    """The node did not run a sequence as planned, not a contract bug"""
+
+
+def pub_key(key: int) -> bytes:
+    """Same synthetic keys as batch.synthetic_transfers"""
+    return Web3.keccak(encode(["uint256"], [key])) + key.to_bytes(32, "big")
+
+
+def user(index: int) -> str:
+    return f"user{index}"
+
+
+class TokenModel:
+    """MockUSDC balances and allowances, OpenZeppelin ERC20 semantics"""
+
+    def __init__(self):
+        self.balances = defaultdict(int, deployer=INITIAL_SUPPLY)
+        self.allowances = defaultdict(int)
+
+    def transfer(self, source: str, target: str, amount: int) -> bool:
+        if self.balances[source] < amount:
+            return False
+        self.balances[source] -= amount
+        self.balances[target] += amount
+        return True
+
+    def transfer_from(self, spender: str, source: str, target: str, amount: int) -> bool:
+        allowance = self.allowances[source, spender]
+        if allowance < amount or self.balances[source] < amount:
+            return False
+        if allowance != UINT256_MAX:
+            self.allowances[source, spender] = allowance - amount
+        return self.transfer(source, target, amount)
+
+
+class TelepayModel:
+    """Telepay balances, unordered nonces and settled batch roots"""
+
+    def __init__(self):
+        self.balances = defaultdict(int)
+        self.used = set()  # (key, nonce)
+        self.settled = set()
+
+    def credit(self, key: int, amount: int) -> bool:
+        if self.balances[key] + amount > UINT256_MAX:
+            return False
+        self.balances[key] += amount
+        return True
+
+    @staticmethod
+    def _apply(balances: dict, used: set, source: int, target: int, amount: int, nonce: int) -> bool:
+        """Telepay._applyTransfer on the given state, False where it reverts"""
+        if balances[source] < amount or (source, nonce) in used:
+            return False
+        if balances[target] + amount - (amount if source == target else 0) > UINT256_MAX:
+            return False
+        used.add((source, nonce))
+        balances[source] -= amount
+        balances[target] += amount
+        return True
+
+    def transfer(self, source: int, target: int, amount: int, nonce: int, signed: bool) -> bool:
+        return signed and self._apply(self.balances, self.used, source, target, amount, nonce)
+
+    def settle(self, transfers: list, root: bytes, operator_signed: bool) -> bool:
+        if root in self.settled or not operator_signed:
+            return False
+        # One failing transfer reverts the whole batch
+        balances, used = self.balances.copy(), set(self.used)
+        for transfer in transfers:
+            if not self._apply(balances, used, *transfer):
+                return False
+        self.balances, self.used = balances, used
+        self.settled.add(root)
+        return True
+
+    def nonce_word(self, key: int, word: int) -> int:
+        return sum(1 << (n & 0xFF) for k, n in self.used if k == key and n >> 8 == word)
+
+
+class VaultModel:
+    """TelepayVault holding EulerVaultMock shares, with the mock's integer share math"""
+
+    def __init__(self, token: TokenModel, messenger: "MessengerModel"):
+        self.token = token
+        self.messenger = messenger
+        self.shares = defaultdict(int)
+        self.total_shares = 0
+
+    @property
+    def assets(self) -> int:
+        return self.token.balances["euler"]
+
+    def invested(self) -> int:
+        if not self.total_shares:
+            return 0
+        return self.shares["vault"] * self.assets // self.total_shares
+
+    def euler_deposit(self, holder: str, amount: int) -> bool:
+        """EulerVaultMock.deposit, shares priced on the balance before the transfer"""
+        if amount == 0 or self.token.balances[holder] < amount:
+            return False
+        if self.total_shares == 0:
+            minted = amount
+        elif self.assets == 0 or amount * self.total_shares > UINT256_MAX:
+            return False
+        else:
+            minted = amount * self.total_shares // self.assets
+        self.token.transfer(holder, "euler", amount)
+        self.shares[holder] += minted
+        self.total_shares += minted
+        return True
+
+    def euler_withdraw(self, holder: str, amount: int) -> bool:
+        if amount == 0 or self.assets == 0 or amount * self.total_shares > UINT256_MAX:
+            return False
+        burned = amount * self.total_shares // self.assets
+        if self.shares[holder] < burned or self.assets < amount:
+            return False
+        self.shares[holder] -= burned
+        self.total_shares -= burned
+        self.token.transfer("euler", holder, amount)
+        return True
+
+    def invest(self, amount: int) -> bool:
+        return self.token.balances["vault"] >= amount and self.euler_deposit("vault", amount)
+
+    def ensure_liquidity(self, amount: int) -> bool:
+        idle = self.token.balances["vault"]
+        return idle >= amount or self.euler_withdraw("vault", amount - idle)
+
+    def withdraw(self, amount: int) -> bool:
+        """handleReceiveMessage: uninvest the shortfall, then burn to the target"""
+        if not self.ensure_liquidity(amount):
+            return False
+        self.token.transfer("vault", "messenger", amount)
+        self.messenger.burn_nonce += 1
+        return True
+
+
+class MessengerModel:
+    """Nonces of MockTokenMessenger and MockMessageTransmitter"""
+
+    def __init__(self):
+        self.burn_nonce = 0
+        self.message_nonce = 0
+
+
+class Model:
+    """Reference model of the Telepay contracts deployed on one chain
+
+    step applies one operation and returns (expected success, detail),
+    detail being what the transaction needs beyond the operation itself:
+    the message a deposit must send or a relay delivers, a batch's root.
+    A None expectation means the operation has nothing to send.
+    """
+
+    def __init__(self):
+        self.token = TokenModel()
+        self.telepay = TelepayModel()
+        self.messenger = MessengerModel()
+        self.vault = VaultModel(self.token, self.messenger)
+        self.pending = []  # deposit messages not relayed yet
+        self.batches = []  # batches sent so far, for replays
+
+    def step(self, op: tuple):
+        kind, args = op[0], op[1:]
+        if kind == "debug_set":
+            key, amount = args
+            self.telepay.balances[key] = amount
+            return True, None
+        if kind == "transfer":
+            return self.telepay.transfer(*args), None
+        if kind == "settle":
+            transfers, operator_signed = args
+            root = batch_root(transfers)
+            self.batches.append(transfers)
+            return self.telepay.settle(transfers, root, operator_signed), root
+        if kind == "credit":
+            key, amount, burn_nonce = args
+            return self.telepay.credit(key, amount), None
+        if kind == "mint":
+            holder, amount = args
+            self.token.balances[holder] += amount
+            return True, None
+        if kind == "approve":
+            index, amount = args
+            self.token.allowances[user(index), "router"] = amount
+            return True, None
+        if kind == "deposit":
+            return self.deposit(*args)
+        if kind == "relay":
+            if not self.pending:
+                return None, None
+            amount, key, burn_nonce = self.pending.pop(0)
+            return self.telepay.credit(key, amount), deposit_message(amount, key, burn_nonce)
+        if kind == "fund_vault":
+            (amount,) = args
+            self.token.balances["vault"] += amount
+            return True, None
+        if kind == "yield":
+            (amount,) = args
+            self.token.balances["euler"] += amount
+            return True, None
+        if kind == "invest":
+            return self.vault.invest(*args), None
+        if kind == "uninvest":
+            return self.vault.euler_withdraw("vault", *args), None
+        if kind == "ensure":
+            return self.vault.ensure_liquidity(*args), None
+        if kind == "withdraw":
+            return self.vault.withdraw(*args), None
+        if kind == "donor_deposit":
+            return self.vault.euler_deposit("donor", *args), None
+        if kind == "donor_withdraw":
+            return self.vault.euler_withdraw("donor", *args), None
+        raise ValueError(f"Unknown operation {kind}")
+
+    def deposit(self, index: int, key: int, amount: int):
+        """TelepayRouter.deposit: pull, burn to the vault, message Telepay"""
+        holder = user(index)
+        if amount == 0:
+            return False, None
+        if not self.token.transfer_from("router", holder, "router", amount):
+            return False, None
+        # The router approved the messenger for everything at deployment
+        self.token.transfer("router", "messenger", amount)
+        burn_nonce = self.messenger.burn_nonce
+        self.messenger.burn_nonce += 1
+        self.messenger.message_nonce += 1
+        self.pending.append((amount, key, burn_nonce))
+        return True, deposit_message(amount, key, burn_nonce)
+
+    def state(self) -> dict:
+        """Everything compared with the contracts after a sequence"""
+        state = {}
+        for key in range(KEYS):
+            state["balances", key] = self.telepay.balances[key]
+            for word in range(NONCE_WORDS):
+                state["nonceBitmap", key, word] = self.telepay.nonce_word(key, word)
+        for holder in HOLDERS:
+            state["balanceOf", holder] = self.token.balances[holder]
+        for index in range(USERS):
+            state["allowance", user(index)] = self.token.allowances[user(index), "router"]
+        for holder in ("vault", "donor"):
+            state["shares", holder] = self.vault.shares[holder]
+        state["totalShares"] = self.vault.total_shares
+        state["burnNonce"] = self.messenger.burn_nonce
+        state["messageNonce"] = self.messenger.message_nonce
+        for transfers in self.batches:
+            root = batch_root(transfers)
+            state["settled", root] = int(root in self.telepay.settled)
+        return state
+
+
+HOLDERS = ["deployer", "donor", "router", "messenger", "vault", "euler"] + [
+    user(i) for i in range(USERS)
+]
+
+
+def deposit_message(amount: int, key: int, burn_nonce: int) -> bytes:
+    """Body TelepayRouter.deposit sends to Telepay"""
+    return encode(["uint256", "bytes", "uint64"], [amount, pub_key(key), burn_nonce])
+
+
+def _batch_items(transfers) -> list:
+    return [
+        {
+            "amount": amount,
+            "nonce": nonce,
+            "sourcePubKey": pub_key(source),
+            "targetPubKey": pub_key(target),
+            # Telepay's transfer signature check is a stub, any bytes do
+            "signature": bytes(65),
+        }
+        for source, target, amount, nonce in transfers
+    ]
+
+
+def batch_root(transfers) -> bytes:
+    return MerkleTree([leaf(t) for t in _batch_items(transfers)]).root
+
+
+class Generator:
+    """Random operation sequences, steered by a model run alongside
+
+    Amounts are biased towards the boundaries the contracts check: zero,
+    exactly the available balance, and one more than that.
+    """
+
+    WEIGHTS = {
+        "debug_set": 1,
+        "transfer": 6,
+        "settle": 2,
+        "credit": 2,
+        "mint": 4,
+        "approve": 3,
+        "deposit": 4,
+        "relay": 3,
+        "fund_vault": 2,
+        "invest": 3,
+        "uninvest": 2,
+        "ensure": 2,
+        "withdraw": 3,
+        "donor_deposit": 2,
+        "donor_withdraw": 1,
+        "yield": 1,
+    }
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.model = Model()
+        self.kinds = list(self.WEIGHTS)
+        self.weights = list(self.WEIGHTS.values())
+
+    def amount(self, available: int = 0) -> int:
+        r = self.rng.random()
+        if r < 0.1:
+            return 0
+        if available and r < 0.3:
+            return available
+        if available and r < 0.4:
+            return available + 1
+        if available and r < 0.6:
+            return self.rng.randint(1, available)
+        return self.rng.choice([1, self.rng.randint(1, 10**6), self.rng.randint(1, 10**12)])
+
+    def nonce(self, key: int) -> int:
+        used = sorted(n for k, n in self.model.telepay.used if k == key)
+        r = self.rng.random()
+        if used and r < 0.2:
+            return self.rng.choice(used)
+        if r < 0.3:
+            return 256 + self.rng.randrange(4)
+        return self.rng.randrange(8)
+
+    def transfer(self) -> tuple:
+        source, target = self.rng.randrange(KEYS), self.rng.randrange(KEYS)
+        amount = self.amount(self.model.telepay.balances[source])
+        return source, target, amount, self.nonce(source)
+
+    def op(self) -> tuple:
+        model, rng = self.model, self.rng
+        kind = rng.choices(self.kinds, self.weights)[0]
+        if kind == "debug_set":
+            return kind, rng.randrange(KEYS), self.amount(10**12)
+        if kind == "transfer":
+            return (kind, *self.transfer(), rng.random() < 0.95)
+        if kind == "settle":
+            if model.batches and rng.random() < 0.1:
+                transfers = rng.choice(model.batches)
+            else:
+                transfers = tuple(self.transfer() for _ in range(rng.randint(1, 4)))
+            return kind, transfers, rng.random() < 0.9
+        if kind == "credit":
+            return kind, rng.randrange(KEYS), self.amount(), rng.randrange(2**64)
+        if kind == "mint":
+            return kind, rng.choice(["donor"] + [user(i) for i in range(USERS)]), self.amount()
+        if kind == "approve":
+            index = rng.randrange(USERS)
+            if rng.random() < 0.5:
+                return kind, index, UINT256_MAX
+            return kind, index, self.amount(model.token.balances[user(index)])
+        if kind == "deposit":
+            index = rng.randrange(USERS)
+            available = min(
+                model.token.balances[user(index)],
+                model.token.allowances[user(index), "router"],
+            )
+            return kind, index, rng.randrange(KEYS), self.amount(available)
+        if kind == "relay":
+            return (kind,)
+        if kind in ("invest", "ensure"):
+            return kind, self.amount(model.token.balances["vault"])
+        if kind == "uninvest":
+            return kind, self.amount(model.vault.invested())
+        if kind == "withdraw":
+            return kind, self.amount(model.token.balances["vault"] + model.vault.invested())
+        if kind == "donor_deposit":
+            return kind, self.amount(model.token.balances["donor"])
+        if kind == "donor_withdraw":
+            return kind, self.amount(model.token.balances["euler"])
+        return kind, self.amount()
+
+    def sequence(self, length: int) -> list:
+        ops = []
+        for _ in range(length):
+            op = self.op()
+            self.model.step(op)
+            ops.append(op)
+        return ops
+
+
+def _arg_types(signature: str) -> list:
+    """Argument types of a function signature, tuples kept whole"""
+    inner = signature[signature.index("(") + 1 : -1]
+    types, depth, start = [], 0, 0
+    for i, char in enumerate(inner):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            types.append(inner[start:i])
+            start = i + 1
+    return types + [inner[start:]] if inner else types
+
+
+def calldata(signature: str, *args) -> str:
+    return "0x" + (Web3.keccak(text=signature)[:4] + encode(_arg_types(signature), args)).hex()
+
+
+def format_op(op: tuple) -> str:
+    return f"{op[0]}{op[1:]}"
+
+
+class Harness:
+    """Runs operation sequences on anvil and diffs them against the model
+
+    The contracts are deployed once. Every sequence is sent as one JSON-RPC
+    batch with automine off, mined into a single block, read back with one
+    batch of receipts and eth_calls, then rolled back with evm_revert. The
+    node must keep the batch order (anvil --order fifo), which is checked on
+    every block.
+    """
+
+    def __init__(self, url: str):
+        self.client = RpcClient(url, retries=0)
+        self.accounts = self.client.call("eth_accounts")
+        self.address = {
+            "deployer": self.accounts[0],
+            "donor": self.accounts[USERS + 1],
+            **{user(i): self.accounts[i + 1] for i in range(USERS)},
+        }
+        Account.enable_unaudited_hdwallet_features()
+        self.operator = Account.from_mnemonic(ANVIL_MNEMONIC, account_path="m/44'/60'/0'/0/0")
+        if self.operator.address.lower() != self.accounts[0].lower():
+            raise HarnessError("The node must use anvil's default mnemonic")
+        self.chain_id = int(self.client.call("eth_chainId"), 16)
+        self.signatures = {}
+
+        self.client.call("evm_setAutomine", [True])
+        self.deploy()
+        self.client.call("evm_setAutomine", [False])
+        self.nonces = {
+            account: int(self.client.call("eth_getTransactionCount", [account, "latest"]), 16)
+            for account in self.accounts[: USERS + 2]
+        }
+        self.snapshot = self.client.call("evm_snapshot")
+
+    def _send(self, sender: str, to: str, data: str, gas: int = OP_GAS) -> dict:
+        tx = {"from": self.address[sender], "data": data, "gas": hex(gas)}
+        if to is not None:
+            tx["to"] = self.address[to]
+        receipt = self.client.call(
+            "eth_getTransactionReceipt", [self.client.call("eth_sendTransaction", [tx])]
+        )
+        if int(receipt["status"], 16) != 1:
+            raise HarnessError(f"Setup transaction to {to} reverted")
+        return receipt
+
+    def _create(self, name: str, signature: str = "constructor()", *args) -> str:
+        code = load_artifact(name)["bytecode"]["object"]
+        data = code + encode(_arg_types(signature), args).hex()
+        return self._send("deployer", None, data, DEPLOY_GAS)["contractAddress"]
+
+    def deploy(self):
+        """The contracts on one chain, router through TelepayDeployer"""
+        address = self.address
+        address["token"] = self._create("MockUSDC")
+        address["telepay"] = self._create("Telepay")
+        address["messenger"] = self._create("MockTokenMessenger")
+        # A cross-chain router, neither on the vault's nor Telepay's domain
+        address["transmitter"] = self._create("MockMessageTransmitter", "(uint32)", SOURCE_DOMAIN)
+        address["euler"] = self._create("EulerVaultMock", "(address)", address["token"])
+        address["vault"] = self._create(
+            "TelepayVault",
+            "(address,address,address)",
+            address["token"],
+            address["messenger"],
+            address["euler"],
+        )
+        address["factory"] = self._create("TelepayDeployer")
+
+        salt = bytes.fromhex(address["deployer"][2:]) + bytes(12)
+        parameters = tuple(
+            address[name] for name in ("token", "telepay", "vault", "messenger", "transmitter")
+        )
+        self._send(
+            "deployer",
+            "factory",
+            calldata("deployRouter(bytes32,(address,address,address,address,address))", salt, parameters),
+            DEPLOY_GAS,
+        )
+        router = self.client.call(
+            "eth_call",
+            [{"to": address["factory"], "data": calldata("routerAddress(bytes32)", salt)}, "latest"],
+        )
+        address["router"] = Web3.to_checksum_address(router[-40:])
+
+        # The donor deposits into Euler directly
+        self._send("donor", "token", calldata("approve(address,uint256)", address["euler"], UINT256_MAX))
+
+    def _settle_signature(self, root: bytes, operator_signed: bool) -> bytes:
+        key = self.operator.key if operator_signed else WRONG_OPERATOR_KEY
+        if (root, key) not in self.signatures:
+            self.signatures[root, key] = sign_batch(key, root, self.chain_id, self.address["telepay"])
+        return self.signatures[root, key]
+
+    def transaction(self, op: tuple, detail) -> tuple:
+        """(sender, contract, calldata) of an operation"""
+        kind, args = op[0], op[1:]
+        if kind == "debug_set":
+            key, amount = args
+            return "deployer", "telepay", calldata("debugSetValue(bytes,uint256)", pub_key(key), amount)
+        if kind == "transfer":
+            source, target, amount, nonce, signed = args
+            return "deployer", "telepay", calldata(
+                "transfer(uint256,uint256,bytes,bytes,bytes)",
+                amount,
+                nonce,
+                pub_key(source),
+                pub_key(target),
+                bytes(65) if signed else b"",
+            )
+        if kind == "settle":
+            transfers, operator_signed = args
+            signature = self._settle_signature(detail, operator_signed)
+            data = settle_calldata(_batch_items(transfers), signature)
+            return "deployer", "telepay", "0x" + data.hex()
+        if kind in ("credit", "relay"):
+            if kind == "credit":
+                key, amount, burn_nonce = args
+                detail = deposit_message(amount, key, burn_nonce)
+            sender = bytes(12) + bytes.fromhex(self.address["router"][2:])
+            return "deployer", "telepay", calldata(
+                "handleReceiveMessage(uint32,bytes32,bytes)", SOURCE_DOMAIN, sender, detail
+            )
+        if kind == "mint":
+            holder, amount = args
+            return "deployer", "token", calldata("mint(address,uint256)", self.address[holder], amount)
+        if kind == "approve":
+            index, amount = args
+            return user(index), "token", calldata("approve(address,uint256)", self.address["router"], amount)
+        if kind == "deposit":
+            index, key, amount = args
+            return user(index), "router", calldata("deposit(bytes,uint256)", pub_key(key), amount)
+        if kind in ("fund_vault", "yield"):
+            (amount,) = args
+            holder = "vault" if kind == "fund_vault" else "euler"
+            return "deployer", "token", calldata("mint(address,uint256)", self.address[holder], amount)
+        if kind == "invest":
+            return "deployer", "vault", calldata("invest(uint256)", *args)
+        if kind == "uninvest":
+            return "deployer", "vault", calldata("uninvest(uint256)", *args)
+        if kind == "ensure":
+            return "deployer", "vault", calldata("ensureLiquidity(uint256)", *args)
+        if kind == "withdraw":
+            (amount,) = args
+            message = encode(
+                ["uint256", "uint32", "address"], [amount, TELEPAY_DOMAIN, self.address[user(0)]]
+            )
+            return "deployer", "vault", calldata(
+                "handleReceiveMessage(uint32,bytes32,bytes)", TELEPAY_DOMAIN, bytes(32), message
+            )
+        if kind == "donor_deposit":
+            return "donor", "euler", calldata("deposit(uint256,address)", *args, self.address["donor"])
+        if kind == "donor_withdraw":
+            donor = self.address["donor"]
+            return "donor", "euler", calldata("withdraw(uint256,address,address)", *args, donor, donor)
+        raise ValueError(f"Unknown operation {kind}")
+
+    def state_call(self, label: tuple) -> str:
+        name, args = label[0], label[1:]
+        if name == "balances":
+            return "telepay", calldata("balances(bytes)", pub_key(*args))
+        if name == "nonceBitmap":
+            key, word = args
+            return "telepay", calldata("nonceBitmap(bytes32,uint256)", Web3.keccak(pub_key(key)), word)
+        if name == "settled":
+            return "telepay", calldata("settledBatches(bytes32)", *args)
+        if name == "balanceOf":
+            return "token", calldata("balanceOf(address)", self.address[args[0]])
+        if name == "allowance":
+            owner = self.address[args[0]]
+            return "token", calldata("allowance(address,address)", owner, self.address["router"])
+        if name == "shares":
+            return "euler", calldata("shares(address)", self.address[args[0]])
+        if name == "totalShares":
+            return "euler", calldata("totalShares()")
+        if name == "burnNonce":
+            return "messenger", calldata("nextNonce()")
+        return "transmitter", calldata("nextAvailableNonce()")
+
+    def _sent_message(self, receipt: dict) -> bytes:
+        for log in receipt["logs"]:
+            if log["address"].lower() == self.address["transmitter"].lower() and bytes.fromhex(
+                log["topics"][0][2:]
+            ) == MESSAGE_SENT:
+                domain, recipient, body = decode(
+                    ["uint32", "bytes32", "bytes"], bytes.fromhex(log["data"][2:])
+                )
+                if domain == TELEPAY_DOMAIN and recipient[12:].hex() == self.address["telepay"][2:].lower():
+                    return body
+        return None
+
+    def run(self, ops: list) -> list:
+        """Differences between contracts and model, empty if none"""
+        model = Model()
+        planned = []
+        for index, op in enumerate(ops):
+            expected, detail = model.step(op)
+            if expected is not None:
+                planned.append((index, op, expected, detail, self.transaction(op, detail)))
+
+        nonces = dict(self.nonces)
+        sends = []
+        for _, _, _, _, (sender, to, data) in planned:
+            account = self.address[sender]
+            tx = {
+                "from": account,
+                "to": self.address[to],
+                "data": data,
+                "gas": hex(OP_GAS),
+                "nonce": hex(nonces[account]),
+            }
+            nonces[account] += 1
+            sends.append(("eth_sendTransaction", [tx]))
+
+        try:
+            hashes = [self._result(r) for r in self.client.batch(sends)] if sends else []
+            self.client.call("evm_mine")
+
+            state = model.state()
+            labels = list(state)
+            reads = [("eth_getTransactionReceipt", [h]) for h in hashes]
+            for label in labels:
+                to, data = self.state_call(label)
+                reads.append(("eth_call", [{"to": self.address[to], "data": data}, "latest"]))
+            results = [self._result(r) for r in self.client.batch(reads)]
+        finally:
+            self.client.call("evm_revert", [self.snapshot])
+            self.snapshot = self.client.call("evm_snapshot")
+
+        receipts, values = results[: len(hashes)], results[len(hashes) :]
+        differences = []
+        for position, ((index, op, expected, detail, _), receipt) in enumerate(zip(planned, receipts)):
+            if receipt is None or int(receipt["transactionIndex"], 16) != position:
+                raise HarnessError(
+                    "Transactions were not mined in the order sent, run anvil with "
+                    f"--order fifo and --gas-limit {BLOCK_GAS_LIMIT}"
+                )
+            succeeded = int(receipt["status"], 16) == 1
+            if succeeded != expected and not differences:
+                # Later operations diverge as a consequence, only the first is reported
+                differences.append(
+                    f"op {index} {format_op(op)}: contract "
+                    f"{'succeeded' if succeeded else 'reverted'}, model expected "
+                    f"{'success' if expected else 'revert'}"
+                )
+            if op[0] == "deposit" and expected and succeeded:
+                body = self._sent_message(receipt)
+                if body != detail:
+                    differences.append(
+                        f"op {index} {format_op(op)}: message to Telepay "
+                        f"{body.hex() if body else None}, model expected {detail.hex()}"
+                    )
+
+        for label, value in zip(labels, values):
+            actual = int(value, 16)
+            if label[0] == "settled":
+                actual = int(actual != 0)
+            if actual != state[label]:
+                differences.append(f"{label}: contract {actual}, model {state[label]}")
+        return differences
+
+    @staticmethod
+    def _result(response: dict):
+        if "error" in response:
+            raise HarnessError(response["error"])
+        return response["result"]
+
+    def shrink(self, ops: list) -> list:
+        """Smaller sequence that still diverges
+
+        Chunks of operations are removed, halving the chunk size down to
+        single operations, then the remaining amounts are made smaller.
+        """
+        chunk = len(ops) // 2
+        while chunk >= 1:
+            start = 0
+            while start < len(ops):
+                candidate = ops[:start] + ops[start + chunk :]
+                if candidate and self.run(candidate):
+                    ops = candidate
+                else:
+                    start += chunk
+            chunk //= 2
+
+        for index, op in enumerate(ops):
+            field = AMOUNT_FIELD.get(op[0])
+            if field is None:
+                continue
+            for smaller in (0, 1, op[field] // 2):
+                if smaller >= op[field]:
+                    continue
+                candidate = list(ops)
+                candidate[index] = op[:field] + (smaller,) + op[field + 1 :]
+                if self.run(candidate):
+                    ops = candidate
+                    break
+        return ops
+
+
+def start_anvil(port: int) -> subprocess.Popen:
+    if not shutil.which("anvil"):
+        raise EnvironmentError("anvil not found, install Foundry or pass --rpc-url")
+    process = subprocess.Popen(
+        [
+            "anvil",
+            "--port",
+            str(port),
+            "--order",
+            "fifo",
+            "--gas-limit",
+            str(BLOCK_GAS_LIMIT),
+            "--silent",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    client = RpcClient(f"http://127.0.0.1:{port}", retries=0, timeout=1)
+    for _ in range(100):
+        try:
+            client.call("eth_chainId")
+            return process
+        except RpcError:
+            time.sleep(0.1)
+    process.kill()
+    raise HarnessError(f"anvil did not start on port {port}")
+
+
+def fuzz_worker(worker: int, seeds: list, length: int, port: int, rpc_url: str = None) -> dict:
+    """Run one seed after another on one node, stop at the first divergence"""
+    process = None if rpc_url else start_anvil(port + worker)
+    try:
+        harness = Harness(rpc_url or f"http://127.0.0.1:{port + worker}")
+        result = {"sequences": 0, "ops": 0, "failure": None}
+        for seed in seeds:
+            ops = Generator(seed).sequence(length)
+            differences = harness.run(ops)
+            result["sequences"] += 1
+            result["ops"] += len(ops)
+            if differences:
+                shrunk = harness.shrink(ops)
+                result["failure"] = {
+                    "seed": seed,
+                    "ops": shrunk,
+                    "differences": harness.run(shrunk),
+                }
+                break
+        return result
+    finally:
+        if process:
+            process.terminate()
+
+
+def fuzz(sequences: int, length: int, seed: int, workers: int, port: int, rpc_url: str = None):
+    """Seeds seed..seed+sequences-1 spread over one anvil per worker"""
+    if rpc_url:
+        workers = 1
+    print(f"🎲 {sequences:,} sequences of {length} operations, {workers} workers, seed {seed}")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                fuzz_worker,
+                worker,
+                list(range(seed + worker, seed + sequences, workers)),
+                length,
+                port,
+                rpc_url,
+            )
+            for worker in range(workers)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    total = sum(r["sequences"] for r in results)
+    ops = sum(r["ops"] for r in results)
+    print(
+        f"⚡ {total:,} sequences in {elapsed:.1f}s: {total / elapsed * 60:,.0f} sequences/min, "
+        f"{ops / elapsed:,.0f} ops/s"
+    )
+    return [r["failure"] for r in results if r["failure"]]
+
+
+def _as_tuples(value):
+    return tuple(_as_tuples(v) for v in value) if isinstance(value, list) else value
+
+
+def load_ops(path: str) -> list:
+    with open(path) as f:
+        return [_as_tuples(op) for op in json.load(f)["ops"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Differential fuzzing of the Telepay contracts against a Python model"
+    )
+    parser.add_argument("--sequences", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=50, help="Operations per sequence")
+    parser.add_argument("--seed", type=int, default=int(os.getenv("FUZZ_SEED", "0")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="anvil nodes")
+    parser.add_argument("--port", type=int, default=8600, help="Port of the first anvil")
+    parser.add_argument("--rpc-url", help="Use this anvil instead of starting one per worker")
+    parser.add_argument("--output", default="fuzz-failure.json", help="Where a failure is saved")
+    parser.add_argument("--replay", help="Run a saved failing sequence")
+    args = parser.parse_args()
+
+    if args.replay:
+        process = None if args.rpc_url else start_anvil(args.port)
+        try:
+            harness = Harness(args.rpc_url or f"http://127.0.0.1:{args.port}")
+            ops = load_ops(args.replay)
+            for op in ops:
+                print(f"  {format_op(op)}")
+            differences = harness.run(ops)
+        finally:
+            if process:
+                process.terminate()
+        for difference in differences:
+            print(f"❌ {difference}")
+        if not differences:
+            print("✅ Contracts match the model")
+        raise SystemExit(1 if differences else 0)
+
+    failures = fuzz(args.sequences, args.length, args.seed, args.workers, args.port, args.rpc_url)
+    if not failures:
+        print("✅ Contracts match the model")
+        raise SystemExit(0)
+
+    failure = min(failures, key=lambda f: len(f["ops"]))
+    print(f"❌ Seed {failure['seed']} diverges, shrunk to {len(failure['ops'])} operations:")
+    for op in failure["ops"]:
+        print(f"  {format_op(op)}")
+    for difference in failure["differences"]:
+        print(f"  {difference}")
+    with open(args.output, "w") as f:
+        json.dump(failure, f, indent=2)
+    print(f"💾 Saved to {args.output}, rerun with --replay {args.output}")
+    raise SystemExit(1)
@@ -0,0 +1,172 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List
+
+from dotenv import load_dotenv
+from eth_abi import decode, encode
+from web3 import Web3
+
+from addresses import RPC_ENV
+from reconcile import DOMAINS, env_prefix
+from rpc import get_multi_client
+
+load_dotenv()
+
+# Multicall3, at the same address on every chain
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3 = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+# What is left of a max approval, however much has been spent since (USDC
+# decrements even infinite allowances)
+APPROVED = 2**255
+
+# TelepayRouter.Route of each CCTP domain, anything else is CrossChain
+ROUTES = {DOMAINS["base_sepolia"]: 2, DOMAINS["eth_sepolia"]: 1}
+
+ADDRESS_ENV = [
+    "BASE_TELEPAY_ADDRESS",
+    "ETH_VAULT_ADDRESS",
+    "ETH_EULER_VAULT_ADDRESS",
+    "BASE_ROUTER_ADDRESS",
+    "ETH_ROUTER_ADDRESS",
+    "ARBITRUM_ROUTER_ADDRESS",
+]
+
+
+@dataclass
+class Check:
+    name: str
+    target: str
+    signature: str
+    returns: str
+    expected: Any
+    args: tuple = ()
+    at_least: bool = False
+
+    def calldata(self) -> bytes:
+        selector = Web3.keccak(text=self.signature)[:4]
+        types = self.signature[self.signature.index("(") + 1 : -1]
+        return selector + encode([t for t in types.split(",") if t], list(self.args))
+
+    def holds(self, value) -> bool:
+        if self.expected is None:
+            return False
+        if self.returns == "address":
+            return Web3.to_checksum_address(value) == Web3.to_checksum_address(self.expected)
+        return value >= self.expected if self.at_least else value == self.expected
+
+
+def checks_for(network: str, addresses: dict) -> List[Check]:
+    """What a deployment on network must hold, against the other deployments"""
+    prefix = env_prefix(network)
+    router = addresses[f"{prefix}_ROUTER_ADDRESS"]
+    usdc = os.getenv(f"{network.upper()}_USDC")
+    messenger = os.getenv(f"{prefix}_TOKEN_MESSENGER")
+    checks = [
+        Check("TelepayRouter.TOKEN", router, "TOKEN()", "address", usdc),
+        Check("TelepayRouter.TELEPAY", router, "TELEPAY()", "address", addresses["BASE_TELEPAY_ADDRESS"]),
+        Check("TelepayRouter.VAULT", router, "VAULT()", "address", addresses["ETH_VAULT_ADDRESS"]),
+        Check("TelepayRouter.TOKEN_MESSENGER", router, "TOKEN_MESSENGER()", "address", messenger),
+        Check(
+            "TelepayRouter.MESSAGE_TRANSMITTER",
+            router,
+            "MESSAGE_TRANSMITTER()",
+            "address",
+            os.getenv(f"{prefix}_MESSAGE_TRANSMITTER"),
+        ),
+        Check("TelepayRouter.LOCAL_DOMAIN", router, "LOCAL_DOMAIN()", "uint32", DOMAINS[network]),
+        Check("TelepayRouter.ROUTE", router, "ROUTE()", "uint8", ROUTES.get(DOMAINS[network], 0)),
+        Check(
+            "USDC allowance router -> TokenMessenger",
+            usdc,
+            "allowance(address,address)",
+            "uint256",
+            APPROVED,
+            (router, messenger),
+            at_least=True,
+        ),
+    ]
+    if network == "base_sepolia":
+        telepay = addresses["BASE_TELEPAY_ADDRESS"]
+        checks.append(Check("Telepay.localRouter", telepay, "localRouter()", "address", router))
+    if network == "eth_sepolia":
+        vault = addresses["ETH_VAULT_ADDRESS"]
+        euler = addresses["ETH_EULER_VAULT_ADDRESS"]
+        checks += [
+            Check("TelepayVault.token", vault, "token()", "address", usdc),
+            Check("TelepayVault.tokenMessenger", vault, "tokenMessenger()", "address", messenger),
+            Check("TelepayVault.eulerVault", vault, "eulerVault()", "address", euler),
+            Check(
+                "USDC allowance vault -> EulerVault",
+                usdc,
+                "allowance(address,address)",
+                "uint256",
+                APPROVED,
+                (vault, euler),
+                at_least=True,
+            ),
+        ]
+    return checks
+
+
+def run_checks(rpc_url: str, checks: List[Check]) -> List[tuple]:
+    """(check, value, holds) of every check, all read in one aggregate3 call"""
+    calls = [(Web3.to_checksum_address(c.target), True, c.calldata()) for c in checks]
+    data = AGGREGATE3 + encode(["(address,bool,bytes)[]"], [calls])
+    result = get_multi_client(rpc_url).call(
+        "eth_call", [{"to": MULTICALL3, "data": "0x" + data.hex()}, "latest"]
+    )
+    (returned,) = decode(["(bool,bytes)[]"], bytes.fromhex(result[2:]))
+
+    outcomes = []
+    for check, (success, output) in zip(checks, returned):
+        if not success or not output:
+            outcomes.append((check, "call failed", False))
+            continue
+        (value,) = decode([check.returns], output)
+        outcomes.append((check, value, check.holds(value)))
+    return outcomes
+
+
+def check_deployment(rpc_urls: dict, addresses: dict) -> List[tuple]:
+    """Check every network at once, returning the (network, check, value) that fail"""
+    missing = [name for name in ADDRESS_ENV if not addresses.get(name)]
+    if missing:
+        raise ValueError(f"No address for {', '.join(missing)}, cannot check the deployment")
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(rpc_urls)) as pool:
+        futures = {
+            network: pool.submit(run_checks, url, checks_for(network, addresses))
+            for network, url in rpc_urls.items()
+        }
+        outcomes = {network: future.result() for network, future in futures.items()}
+
+    failures = []
+    for network, results in outcomes.items():
+        for check, value, holds in results:
+            if not holds:
+                failures.append((network, check, value))
+                print(f"❌ {network} {check.name}: {value}, expected {check.expected}")
+    total = sum(len(results) for results in outcomes.values())
+    print(
+        f"🔎 {total - len(failures)}/{total} invariants hold on {len(outcomes)} networks "
+        f"({time.monotonic() - started:.2f}s)"
+    )
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a Telepay deployment against .env")
+    parser.add_argument("--networks", nargs="+", default=list(DOMAINS))
+    args = parser.parse_args()
+
+    failures = check_deployment(
+        {network: os.getenv(RPC_ENV[network]) for network in args.networks},
+        {name: os.getenv(name) for name in ADDRESS_ENV},
+    )
+    if failures:
+        raise SystemExit(1)
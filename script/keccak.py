@@ -0,0 +1,102 @@
+import numpy as np
+
+RATE = 136  # bytes absorbed per permutation for keccak256
+
+ROUND_CONSTANTS = np.array(
+    [
+        0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+        0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+        0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+        0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+        0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+        0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+    ],
+    dtype=np.uint64,
+)
+
+# Rotation offsets indexed [x][y]
+ROTATIONS = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14],
+]
+
+
+def _lane_tables():
+    """Source lane and rotation of every destination lane for rho + pi
+
+    Lanes are flattened as i = x + 5 * y.
+    """
+    source = np.empty(25, dtype=np.intp)
+    rotation = np.empty(25, dtype=np.uint64)
+    for x in range(5):
+        for y in range(5):
+            dest = y + 5 * ((2 * x + 3 * y) % 5)
+            source[dest] = x + 5 * y
+            rotation[dest] = ROTATIONS[x][y]
+    return source, rotation[:, None]
+
+
+PI_SOURCE, RHO_ROTATION = _lane_tables()
+ONE = np.uint64(1)
+SIXTY_THREE = np.uint64(63)
+
+
+def _rotl(v: np.ndarray, n) -> np.ndarray:
+    # (v >> 1) >> (63 - n) instead of v >> (64 - n), so n = 0 needs no special case
+    return (v << n) | ((v >> ONE) >> (SIXTY_THREE - n))
+
+
+def keccak_f(state: np.ndarray) -> np.ndarray:
+    """Keccak-f[1600] on a (25, N) state of uint64 lanes, lane i = x + 5 * y"""
+    a = state
+    for rc in ROUND_CONSTANTS:
+        # theta
+        grid = a.reshape(5, 5, -1)
+        c = np.bitwise_xor.reduce(grid, axis=0)
+        d = c[[4, 0, 1, 2, 3]] ^ _rotl(c[[1, 2, 3, 4, 0]], ONE)
+        grid ^= d[None]
+        # rho and pi
+        b = _rotl(a[PI_SOURCE], RHO_ROTATION).reshape(5, 5, -1)
+        # chi
+        a = (b ^ (~b[:, [1, 2, 3, 4, 0]] & b[:, [2, 3, 4, 0, 1]])).reshape(25, -1)
+        # iota
+        a[0] ^= rc
+    return a
+
+
+# Hashes per keccak_f call, keeps the working state inside the CPU cache
+CHUNK = 1024
+
+
+def keccak256_batch(messages: np.ndarray) -> np.ndarray:
+    """keccak256 of N equal-length messages at once
+
+    messages is an (N, L) uint8 array, the result an (N, 32) uint8 array.
+    Hashes advance through the permutation together in chunks, so
+    throughput comes from NumPy working on whole columns of lanes.
+    """
+    messages = np.ascontiguousarray(messages, dtype=np.uint8)
+    n, length = messages.shape
+    blocks = length // RATE + 1
+    padded = np.zeros((n, blocks * RATE), dtype=np.uint8)
+    padded[:, :length] = messages
+    padded[:, length] ^= 0x01
+    padded[:, -1] ^= 0x80
+
+    lanes = padded.view("<u8").reshape(n, blocks, RATE // 8)
+    digest = np.empty((n, 4), dtype="<u8")
+    for start in range(0, n, CHUNK):
+        chunk = lanes[start : start + CHUNK]
+        state = np.zeros((25, len(chunk)), dtype=np.uint64)
+        for block in range(blocks):
+            state[: RATE // 8] ^= chunk[:, block].T
+            state = keccak_f(state)
+        digest[start : start + CHUNK] = state[:4].T
+    return digest.view(np.uint8).reshape(n, 32)
+
+
+def keccak256(data: bytes) -> bytes:
+    return keccak256_batch(np.frombuffer(data, dtype=np.uint8)[None, :])[0].tobytes()
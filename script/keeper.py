@@ -0,0 +1,302 @@
+import argparse
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from web3 import Web3
+
+from contracts import get_contract
+from fees import FeeOracle, send_with_replacement
+from preflight import Preflight, Reverted
+from rpc import make_web3
+
+load_dotenv()
+
+# Max block range per eth_getLogs request, public RPCs reject larger ranges
+LOG_CHUNK_SIZE = 2000
+
+
+@dataclass
+class LiquidityConfig:
+    buffer: int  # idle tokens always kept on hand, in token base units
+    horizon_blocks: int  # how far ahead withdrawals are predicted
+    lookback_blocks: int  # withdrawal history used for the prediction
+    band: float  # relative tolerance around the target before acting
+    min_action: int  # smallest invest/uninvest worth a transaction
+    target_blocks: int = 3  # inclusion target for keeper transactions
+
+
+class LiquidityModel:
+    """Idle and invested balances of a TelepayVault, rebuilt from events"""
+
+    def __init__(self, lookback_blocks: int):
+        self.idle = 0
+        self.invested = 0
+        self.lookback_blocks = lookback_blocks
+        self.withdrawals = deque()  # (block, amount) of recent CCTP burns
+
+    def on_inflow(self, amount: int):
+        """CCTP mint (or any other transfer) into the vault"""
+        self.idle += amount
+
+    def on_withdrawal(self, block: int, amount: int):
+        """Tokens leaving the vault through depositForBurn"""
+        self.idle -= amount
+        self.record_withdrawal(block, amount)
+
+    def record_withdrawal(self, block: int, amount: int):
+        self.withdrawals.append((block, amount))
+
+    def on_invested(self, amount: int):
+        self.idle -= amount
+        self.invested += amount
+
+    def on_uninvested(self, amount: int):
+        self.idle += amount
+        self.invested -= amount
+
+    def predicted_outflow(self, block: int, horizon_blocks: int) -> int:
+        """Withdrawals expected over the next horizon_blocks
+
+        Uses the average outflow rate over the lookback window, but never less
+        than the largest single withdrawal seen in it.
+        """
+        while self.withdrawals and self.withdrawals[0][0] <= block - self.lookback_blocks:
+            self.withdrawals.popleft()
+        if not self.withdrawals:
+            return 0
+        total = sum(amount for _, amount in self.withdrawals)
+        largest = max(amount for _, amount in self.withdrawals)
+        return max(total * horizon_blocks // self.lookback_blocks, largest)
+
+
+def plan(
+    idle: int, invested: int, predicted_outflow: int, config: LiquidityConfig
+) -> Optional[Tuple[str, int]]:
+    """Pick the single invest/uninvest call that brings idle back to target
+
+    Returns ("invest", amount), ("uninvest", amount) or None when idle is
+    within the band around the target, so the keeper only sends a transaction
+    when the buffer is actually at risk or enough capital sits idle.
+    """
+    target = config.buffer + predicted_outflow
+    tolerance = int(target * config.band)
+
+    if idle < target - tolerance or idle < predicted_outflow:
+        amount = min(target - idle, invested)
+    elif idle > target + tolerance:
+        amount = -(idle - target)
+    else:
+        return None
+
+    if abs(amount) < config.min_action:
+        return None
+    return ("uninvest", amount) if amount > 0 else ("invest", -amount)
+
+
+class LiquidityKeeper:
+    def __init__(self, w3: Web3, vault_address: str, private_key: str, config: LiquidityConfig):
+        self.w3 = w3
+        self.config = config
+        self.account = w3.eth.account.from_key(private_key)
+        self.fees = FeeOracle(w3)
+        self.preflight = Preflight(w3)
+
+        self.vault = get_contract(w3, "TelepayVault", vault_address)
+        self.token = get_contract(w3, "IERC20", self.vault.functions.token().call())
+        self.euler = get_contract(
+            w3, "EulerVaultMock", self.vault.functions.eulerVault().call()
+        )
+
+        self.topics = {
+            name: w3.keccak(text=signature)
+            for name, signature in [
+                ("Invested", "Invested(uint256)"),
+                ("Uninvested", "Uninvested(uint256)"),
+                ("Transfer", "Transfer(address,address,uint256)"),
+            ]
+        }
+
+        self.model = LiquidityModel(config.lookback_blocks)
+        self.last_block = None
+
+    def invested_assets(self, block: int) -> int:
+        """Value of the vault's Euler shares in underlying tokens"""
+        shares = self.euler.functions.shares(self.vault.address).call(
+            block_identifier=block
+        )
+        if shares == 0:
+            return 0
+        total_shares = self.euler.functions.totalShares().call(block_identifier=block)
+        total_assets = self.token.functions.balanceOf(self.euler.address).call(
+            block_identifier=block
+        )
+        return shares * total_assets // total_shares
+
+    def sync(self, block: int):
+        """Reset the model to on-chain balances at block"""
+        self.model.idle = self.token.functions.balanceOf(self.vault.address).call(
+            block_identifier=block
+        )
+        self.model.invested = self.invested_assets(block)
+
+    def fetch_logs(self, from_block: int, to_block: int) -> list:
+        """Vault events and token transfers touching the vault, in chain order"""
+        vault_topic = "0x" + "00" * 12 + self.vault.address[2:].lower()
+        transfer_topic = self.topics["Transfer"].hex()
+
+        logs = []
+        for start in range(from_block, to_block + 1, LOG_CHUNK_SIZE):
+            end = min(start + LOG_CHUNK_SIZE - 1, to_block)
+            span = {"fromBlock": start, "toBlock": end}
+            logs += self.w3.eth.get_logs({**span, "address": self.vault.address})
+            logs += self.w3.eth.get_logs(
+                {
+                    **span,
+                    "address": self.token.address,
+                    "topics": [transfer_topic, vault_topic],
+                }
+            )
+            logs += self.w3.eth.get_logs(
+                {
+                    **span,
+                    "address": self.token.address,
+                    "topics": [transfer_topic, None, vault_topic],
+                }
+            )
+        return sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+    def apply_log(self, log, balances: bool = True):
+        """Fold one log into the model
+
+        Transfers to or from the Euler vault are skipped, they are already
+        accounted for by the matching Invested/Uninvested events.
+        """
+        if log["address"] == self.vault.address:
+            if log["topics"][0] == self.topics["Invested"]:
+                event = self.vault.events.Invested().process_log(log)
+                if balances:
+                    self.model.on_invested(event["args"]["amount"])
+            elif log["topics"][0] == self.topics["Uninvested"]:
+                event = self.vault.events.Uninvested().process_log(log)
+                if balances:
+                    self.model.on_uninvested(event["args"]["amount"])
+            return
+
+        args = self.token.events.Transfer().process_log(log)["args"]
+        if self.euler.address in (args["from"], args["to"]):
+            return
+        if args["to"] == self.vault.address:
+            if balances:
+                self.model.on_inflow(args["value"])
+        elif balances:
+            self.model.on_withdrawal(log["blockNumber"], args["value"])
+        else:
+            self.model.record_withdrawal(log["blockNumber"], args["value"])
+
+    def bootstrap(self):
+        """Sync balances at head and load the recent withdrawal history"""
+        head = self.w3.eth.block_number
+        self.sync(head)
+        start = max(head - self.config.lookback_blocks + 1, 0)
+        for log in self.fetch_logs(start, head):
+            self.apply_log(log, balances=False)
+        self.last_block = head
+        print(
+            f"📊 Synced at block {head}: idle={self.model.idle} invested={self.model.invested}"
+        )
+
+    def send(self, name: str, *args):
+        tx = {
+            "from": self.account.address,
+            "to": self.vault.address,
+            "data": self.vault.encodeABI(fn_name=name, args=list(args)),
+        }
+        receipt = send_with_replacement(
+            self.w3,
+            self.fees,
+            self.account,
+            tx,
+            self.config.target_blocks,
+            preflight=self.preflight,
+        )
+        if receipt["status"] != 1:
+            raise Exception(f"Transaction {receipt['transactionHash'].hex()} reverted")
+        return receipt
+
+    def tick(self):
+        """Fold new blocks into the model and rebalance if needed"""
+        head = self.w3.eth.block_number
+        if head > self.last_block:
+            for log in self.fetch_logs(self.last_block + 1, head):
+                self.apply_log(log)
+            self.last_block = head
+            # Principal is tracked from events, yield only shows in share value
+            self.model.invested = self.invested_assets(head)
+
+        predicted = self.model.predicted_outflow(head, self.config.horizon_blocks)
+        action = plan(self.model.idle, self.model.invested, predicted, self.config)
+        if action is None:
+            return
+
+        name, amount = action
+        print(
+            f"⚖️  idle={self.model.idle} invested={self.model.invested} "
+            f"predicted={predicted}: {name} {amount}"
+        )
+        try:
+            receipt = self.send(name, amount)
+        except Reverted as e:
+            # The model is off from the chain, start again from its balances
+            print(f"🚫 {name} {amount} would revert ({e}), not sent")
+            self.sync(head)
+            return
+        print(f"✅ {name} {amount} in block {receipt['blockNumber']}")
+
+    def run(self, interval: float):
+        self.bootstrap()
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Keeper tick failed: {str(e)}")
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep TelepayVault liquid while investing surplus in Euler"
+    )
+    parser.add_argument("--rpc-url", default=os.getenv("ETH_SEPOLIA_RPC"))
+    parser.add_argument("--vault", default=os.getenv("ETH_VAULT_ADDRESS"))
+    parser.add_argument(
+        "--buffer", type=int, default=1_000 * 10**6, help="Idle tokens always kept"
+    )
+    parser.add_argument("--horizon-blocks", type=int, default=300)
+    parser.add_argument("--lookback-blocks", type=int, default=7200)
+    parser.add_argument("--band", type=float, default=0.25)
+    parser.add_argument("--min-action", type=int, default=100 * 10**6)
+    parser.add_argument("--interval", type=float, default=12.0)
+    parser.add_argument("--target-blocks", type=int, default=3)
+    args = parser.parse_args()
+
+    if not args.rpc_url or not args.vault:
+        raise EnvironmentError("ETH_SEPOLIA_RPC and ETH_VAULT_ADDRESS must be set")
+
+    keeper = LiquidityKeeper(
+        make_web3(args.rpc_url),
+        args.vault,
+        os.getenv("PRIVATE_KEY"),
+        LiquidityConfig(
+            buffer=args.buffer,
+            horizon_blocks=args.horizon_blocks,
+            lookback_blocks=args.lookback_blocks,
+            band=args.band,
+            min_action=args.min_action,
+            target_blocks=args.target_blocks,
+        ),
+    )
+    keeper.run(args.interval)
@@ -0,0 +1,328 @@
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+# TelepayRouter.TELEPAY_DOMAIN and VAULT_DOMAIN
+TELEPAY_DOMAIN = 6
+VAULT_DOMAIN = 0
+
+
+@dataclass
+class Chain:
+    """Block production and CCTP finality of one domain
+
+    Circle attests a burn once its block is final. On L2s that means the L1
+    batch holding it is final, expressed here as a depth in L2 blocks.
+    """
+
+    name: str
+    domain: int
+    block_time: float
+    finality_blocks: int
+    deposits_per_hour: float = 0.0
+
+    @property
+    def finality(self) -> float:
+        return self.finality_blocks * self.block_time
+
+
+# CCTP standard transfer finality, about 13 to 19 minutes on every chain
+CHAINS = {
+    "ethereum": Chain("ethereum", VAULT_DOMAIN, 12.0, 65, deposits_per_hour=20),
+    "base": Chain("base", TELEPAY_DOMAIN, 2.0, 500, deposits_per_hour=60),
+    "arbitrum": Chain("arbitrum", 3, 0.25, 4000, deposits_per_hour=40),
+}
+
+
+@dataclass
+class Parameters:
+    """Attestation service and relayer behavior"""
+
+    # Attestation delay after finality, lognormal
+    attestation_median: float = 20.0
+    attestation_sigma: float = 0.6
+    # A relayer submits when this many messages are attested for a domain...
+    relay_batch: int = 1
+    # ...or when the oldest one has waited this long
+    relay_wait: float = 0.0
+    # Messages per relay transaction, one relay transaction per block
+    relay_max: int = 50
+    # Deposits are held by the router up to this long, or until there are
+    # aggregate_size of them, then burned with a single pair of messages.
+    # A window of 0 sends every deposit on its own.
+    aggregate_window: float = 0.0
+    aggregate_size: int = 100
+
+
+@dataclass
+class Message:
+    source: str
+    destination: int
+    deposits: list
+    attested: float = 0.0
+
+
+@dataclass
+class Deposit:
+    chain: str
+    created: float
+    credited: float = None
+    # Both messages delivered: Telepay credited and the vault holds the funds
+    settled: float = None
+    delivered: int = 0
+
+
+@dataclass
+class Stats:
+    credit: list = field(default_factory=list)
+    settle: list = field(default_factory=list)
+    messages: int = 0
+    relay_txs: int = 0
+    pending: int = 0
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class LatencySimulator:
+    """Discrete-event simulation of deposits from user transaction to credit
+
+    Every deposit is included in the next block of its chain, burned (on
+    its own or aggregated with others), attested by Circle once final and
+    relayed to the vault and Telepay domains. Events are processed in time
+    order from a heap; block inclusion is computed from a fixed block grid
+    per chain rather than simulated block by block.
+    """
+
+    def __init__(self, chains: dict, params: Parameters, seed: int = 0):
+        self.chains = chains
+        self.params = params
+        self.rng = random.Random(seed)
+        self.by_domain = {chain.domain: chain for chain in chains.values()}
+        self.stats = Stats()
+        self.deposits = []
+        self.now = 0.0
+
+        self._events = []
+        self._order = itertools.count()
+        # Random block phase per chain, so blocks of different chains don't line up
+        self._phase = {name: self.rng.uniform(0, c.block_time) for name, c in chains.items()}
+        self._aggregates = {name: [] for name in chains}
+        self._flush_round = {name: 0 for name in chains}
+        self._queues = {chain.domain: [] for chain in chains.values()}
+        self._relay_round = {chain.domain: 0 for chain in chains.values()}
+        self._relayer_free = {chain.domain: 0.0 for chain in chains.values()}
+        self._relayer_waiting = {chain.domain: False for chain in chains.values()}
+
+    def schedule(self, time: float, handler, *args):
+        heapq.heappush(self._events, (time, next(self._order), handler, args))
+
+    def next_block(self, chain: str, time: float) -> float:
+        """Timestamp of the first block of chain at or after time"""
+        block_time = self.chains[chain].block_time
+        phase = self._phase[chain]
+        return phase + math.ceil((time - phase) / block_time) * block_time
+
+    def attestation_delay(self) -> float:
+        p = self.params
+        return p.attestation_median * math.exp(self.rng.gauss(0.0, p.attestation_sigma))
+
+    def run(self, hours: float) -> Stats:
+        horizon = hours * 3600
+        for name, chain in self.chains.items():
+            if chain.deposits_per_hour <= 0:
+                continue
+            rate = chain.deposits_per_hour / 3600
+            time = self.rng.expovariate(rate)
+            while time < horizon:
+                self.schedule(time, self.on_deposit, name)
+                time += self.rng.expovariate(rate)
+
+        while self._events:
+            self.now, _, handler, args = heapq.heappop(self._events)
+            handler(*args)
+        self.stats.pending = sum(d.credited is None for d in self.deposits)
+        return self.stats
+
+    def on_deposit(self, chain: str):
+        deposit = Deposit(chain, self.now)
+        self.deposits.append(deposit)
+        self.schedule(self.next_block(chain, self.now), self.on_included, deposit)
+
+    def on_included(self, deposit: Deposit):
+        chain = deposit.chain
+        if self.params.aggregate_window <= 0:
+            self.burn(chain, [deposit])
+            return
+        aggregate = self._aggregates[chain]
+        aggregate.append(deposit)
+        if len(aggregate) == 1:
+            round_ = self._flush_round[chain]
+            self.schedule(self.now + self.params.aggregate_window, self.on_flush, chain, round_)
+        if len(aggregate) >= self.params.aggregate_size:
+            self.on_flush(chain, self._flush_round[chain])
+
+    def on_flush(self, chain: str, round_: int):
+        """Keeper transaction burning an aggregate, a stale timer is ignored"""
+        if round_ != self._flush_round[chain] or not self._aggregates[chain]:
+            return
+        deposits, self._aggregates[chain] = self._aggregates[chain], []
+        self._flush_round[chain] += 1
+        self.schedule(self.next_block(chain, self.now), self.on_burn, chain, deposits)
+
+    def on_burn(self, chain: str, deposits: list):
+        self.burn(chain, deposits)
+
+    def burn(self, chain: str, deposits: list):
+        """depositForBurn to the vault and sendMessage to Telepay, same block
+
+        A router on the vault's or Telepay's own domain settles that leg in
+        the deposit transaction, only the other one goes through CCTP.
+        """
+        final = self.now + self.chains[chain].finality
+        for destination in (VAULT_DOMAIN, TELEPAY_DOMAIN):
+            if destination == self.chains[chain].domain:
+                for deposit in deposits:
+                    self.deliver(deposit, destination)
+                continue
+            message = Message(chain, destination, deposits)
+            message.attested = final + self.attestation_delay()
+            self.stats.messages += 1
+            self.schedule(message.attested, self.on_attested, message)
+
+    def on_attested(self, message: Message):
+        queue = self._queues[message.destination]
+        queue.append(message)
+        if len(queue) >= self.params.relay_batch:
+            self.relay(message.destination)
+        elif len(queue) == 1 and self.params.relay_wait > 0:
+            round_ = self._relay_round[message.destination]
+            self.schedule(self.now + self.params.relay_wait, self.on_relay_timeout, message.destination, round_)
+
+    def on_relay_timeout(self, domain: int, round_: int):
+        if round_ == self._relay_round[domain] and self._queues[domain]:
+            self.relay(domain)
+
+    def relay(self, domain: int):
+        """One receiveMessage transaction with up to relay_max queued messages
+
+        The relayer's nonces are sequential, so it has one transaction per
+        destination block. Messages attested while it is busy wait and go
+        out together in its next transaction.
+        """
+        self._relay_round[domain] += 1
+        if self._relayer_free[domain] > self.now:
+            if not self._relayer_waiting[domain]:
+                self._relayer_waiting[domain] = True
+                self.schedule(self._relayer_free[domain], self.on_relayer_free, domain)
+            return
+
+        chain = self.by_domain[domain]
+        queue = self._queues[domain]
+        batch, queue[:] = queue[: self.params.relay_max], queue[self.params.relay_max :]
+        included = self.next_block(chain.name, self.now)
+        self._relayer_free[domain] = included + chain.block_time
+        self.stats.relay_txs += 1
+        self.schedule(included, self.on_delivered, batch)
+        if queue:
+            self.relay(domain)
+
+    def on_relayer_free(self, domain: int):
+        self._relayer_waiting[domain] = False
+        if self._queues[domain]:
+            self.relay(domain)
+
+    def on_delivered(self, messages: list):
+        for message in messages:
+            for deposit in message.deposits:
+                self.deliver(deposit, message.destination)
+
+    def deliver(self, deposit: Deposit, destination: int):
+        if destination == TELEPAY_DOMAIN:
+            deposit.credited = self.now
+            self.stats.credit.append(self.now - deposit.created)
+        deposit.delivered += 1
+        if deposit.delivered == 2:
+            deposit.settled = self.now
+            self.stats.settle.append(self.now - deposit.created)
+
+
+def load_chains(path: str = None) -> dict:
+    """Default chains, overridden field by field from a JSON file
+
+    {"arbitrum": {"finality_blocks": 3000}, "optimism": {"domain": 2, ...}}
+    """
+    chains = dict(CHAINS)
+    if path:
+        for name, values in json.loads(Path(path).read_text()).items():
+            chains[name] = replace(chains[name], **values) if name in chains else Chain(name, **values)
+    return chains
+
+
+def parse_list(value: str, cast=float) -> list:
+    return [cast(float(v)) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate deposit time-to-credit through CCTP attestation and relaying"
+    )
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--chains", help="JSON file overriding chain parameters")
+    parser.add_argument("--load", type=float, default=1.0, help="Multiplier of deposits_per_hour")
+    parser.add_argument("--attestation-median", type=float, default=20.0, help="Seconds")
+    parser.add_argument("--attestation-sigma", type=float, default=0.6)
+    parser.add_argument("--relay-batches", default="1", help="Messages a relayer waits for")
+    parser.add_argument("--relay-waits", default="0", help="Longest a message waits, seconds")
+    parser.add_argument("--relay-max", type=int, default=50)
+    parser.add_argument("--aggregate-windows", default="0", help="Router aggregation, seconds")
+    parser.add_argument("--aggregate-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chains = {
+        name: replace(chain, deposits_per_hour=chain.deposits_per_hour * args.load)
+        for name, chain in load_chains(args.chains).items()
+    }
+    for chain in chains.values():
+        print(
+            f"⛓️  {chain.name}: {chain.block_time}s blocks, final after {chain.finality:.0f}s, "
+            f"{chain.deposits_per_hour:g} deposits/h"
+        )
+
+    print(
+        f"\n{'window':>8}{'batch':>7}{'wait':>7}{'credit p50':>12}{'credit p99':>12}"
+        f"{'settle p99':>12}{'messages':>10}{'relay txs':>11}"
+    )
+    for window, batch, wait in itertools.product(
+        parse_list(args.aggregate_windows),
+        parse_list(args.relay_batches, int),
+        parse_list(args.relay_waits),
+    ):
+        params = Parameters(
+            attestation_median=args.attestation_median,
+            attestation_sigma=args.attestation_sigma,
+            relay_batch=batch,
+            relay_wait=wait,
+            relay_max=args.relay_max,
+            aggregate_window=window,
+            aggregate_size=args.aggregate_size,
+        )
+        # Same seed for every row, so every row sees the same deposits
+        stats = LatencySimulator(chains, params, args.seed).run(args.hours)
+        print(
+            f"{window:>8g}{batch:>7}{wait:>7g}{percentile(stats.credit, 50):>11.0f}s"
+            f"{percentile(stats.credit, 99):>11.0f}s{percentile(stats.settle, 99):>11.0f}s"
+            f"{stats.messages:>10,}{stats.relay_txs:>11,}"
+        )
+        if stats.pending:
+            print(f"  ⚠️  {stats.pending} deposits never credited, set --relay-waits")
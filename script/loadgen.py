@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import AsyncWeb3, Web3
+
+from contracts import load_abi
+from nonces import NonceAllocator
+from rpc import close_async_clients, make_async_web3, print_metrics
+
+load_dotenv()
+
+# Accounts anvil funds at startup
+ANVIL_MNEMONIC = "test test test test test test test test test test test junk"
+
+# Longest a worker waits for a free in-flight slot before giving up on its sender
+INFLIGHT_TIMEOUT = 120.0
+
+
+@dataclass
+class LoadStats:
+    sent: int = 0
+    send_errors: int = 0
+    reverted: int = 0
+    latencies: list = field(default_factory=list)
+    gas_used: list = field(default_factory=list)
+    started: float = 0.0
+    finished: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    def report(self):
+        confirmed = len(self.latencies)
+        elapsed = self.finished - self.started
+        print("\n" + "=" * 50)
+        print("📋 LOAD TEST SUMMARY")
+        print("=" * 50)
+        print(f"📤 Sent: {self.sent} ({self.send_errors} rejected by the node)")
+        print(f"📦 Confirmed: {confirmed} in {elapsed:.1f}s")
+        print(f"⚡ Throughput: {confirmed / elapsed if elapsed else 0:.1f} tx/s")
+        print(
+            f"⏱️  Inclusion latency: p50={self.percentile(50):.2f}s "
+            f"p90={self.percentile(90):.2f}s p99={self.percentile(99):.2f}s"
+        )
+        if self.gas_used:
+            print(f"⛽ Gas per operation: {statistics.mean(self.gas_used):,.0f}")
+        print(f"❌ Revert rate: {self.reverted / confirmed if confirmed else 0:.2%}")
+
+
+class SyntheticUser:
+    """A Telepay user: secp256k1 key whose 64-byte public key holds a balance"""
+
+    def __init__(self):
+        self.account = Account.create()
+        self.pub_key = self.account._key_obj.public_key.to_bytes()
+
+    def sign_transfer(self, amount: int, nonce: int, target_pub_key: bytes, telepay: str) -> bytes:
+        """Same message as Telepay.transferDigest"""
+        inner = Web3.solidity_keccak(
+            ["uint256", "uint256", "bytes", "bytes32", "address"],
+            [amount, nonce, self.pub_key, Web3.keccak(target_pub_key), telepay],
+        )
+        return self.account.sign_message(encode_defunct(primitive=inner)).signature
+
+
+class LoadGenerator:
+    def __init__(self, w3: AsyncWeb3, senders: list, telepay: str, router: str = None, token: str = None):
+        self.w3 = w3
+        self.senders = senders
+        self.telepay = w3.eth.contract(
+            address=Web3.to_checksum_address(telepay), abi=load_abi("Telepay")
+        )
+        self.router = router and w3.eth.contract(
+            address=Web3.to_checksum_address(router), abi=load_abi("TelepayRouter")
+        )
+        self.token = token and w3.eth.contract(
+            address=Web3.to_checksum_address(token), abi=load_abi("IERC20")
+        )
+        self.users = []
+        # Synthetic users are fresh keys, no nonce is used on chain yet
+        self.transfer_nonces = NonceAllocator()
+        self.nonces = {}
+        # Sends from one sender are signed and sent one at a time, so a
+        # failed send can reload its nonce without handing out one in flight
+        self.send_locks = {}
+        self.inflight = {}
+        self.pending = {}  # tx hash -> (send time, sender address)
+        self.stats = LoadStats()
+        self.chain_id = None
+        self.gas_price = None
+
+    async def prepare(self):
+        self.chain_id = await self.w3.eth.chain_id
+        self.gas_price = await self.w3.eth.gas_price * 2
+        for sender in self.senders:
+            self.inflight[sender.address] = 0
+            self.send_locks[sender.address] = asyncio.Lock()
+            self.nonces[sender.address] = await self.w3.eth.get_transaction_count(
+                sender.address, "pending"
+            )
+
+    async def send(self, sender, to: str, data: str, gas: int):
+        async with self.send_locks[sender.address]:
+            nonce = self.nonces[sender.address]
+            self.nonces[sender.address] += 1
+            tx = {
+                "to": to,
+                "data": data,
+                "gas": gas,
+                "gasPrice": self.gas_price,
+                "nonce": nonce,
+                "chainId": self.chain_id,
+                "value": 0,
+            }
+            signed = sender.sign_transaction(tx)
+            sent_at = time.perf_counter()
+            try:
+                tx_hash = await self.w3.eth.send_raw_transaction(signed.rawTransaction)
+            except Exception as e:
+                self.stats.send_errors += 1
+                print(f"❌ Send failed: {str(e)}")
+                # The nonce was not used: without a reload every later
+                # transaction from this sender would wait behind the gap forever
+                self.nonces[sender.address] = await self.w3.eth.get_transaction_count(
+                    sender.address, "pending"
+                )
+                return None
+        self.stats.sent += 1
+        self.inflight[sender.address] += 1
+        self.pending[tx_hash] = (sent_at, sender.address)
+        return tx_hash
+
+    async def wait_all(self, timeout: float):
+        """Wait until every pending transaction has a receipt"""
+        deadline = time.perf_counter() + timeout
+        while self.pending and time.perf_counter() < deadline:
+            await self.poll_receipts()
+            await asyncio.sleep(0.2)
+
+    async def poll_receipts(self):
+        hashes = list(self.pending)
+        receipts = await asyncio.gather(
+            *(self.w3.eth.get_transaction_receipt(h) for h in hashes),
+            return_exceptions=True,
+        )
+        now = time.perf_counter()
+        for tx_hash, receipt in zip(hashes, receipts):
+            # Both the background poller and wait_all may see the same receipt
+            if isinstance(receipt, Exception) or tx_hash not in self.pending:
+                continue
+            sent_at, sender = self.pending.pop(tx_hash)
+            self.inflight[sender] -= 1
+            self.stats.latencies.append(now - sent_at)
+            self.stats.gas_used.append(receipt["gasUsed"])
+            if receipt["status"] != 1:
+                self.stats.reverted += 1
+
+    async def seed(self, balance: int):
+        """Give every synthetic pubkey a balance with debugSetValue"""
+        print(f"🌱 Seeding {len(self.users)} synthetic users with {balance} each...")
+        gas = await self.telepay.functions.debugSetValue(
+            self.users[0].pub_key, balance
+        ).estimate_gas({"from": self.senders[0].address})
+
+        sends = []
+        for i, user in enumerate(self.users):
+            data = self.telepay.encodeABI("debugSetValue", [user.pub_key, balance])
+            sender = self.senders[i % len(self.senders)]
+            sends.append(self.send(sender, self.telepay.address, data, gas * 2))
+        await asyncio.gather(*sends)
+        await self.wait_all(timeout=120)
+        self.stats = LoadStats()
+
+    def transfer_call(self, amount: int):
+        source, target = random.sample(self.users, 2)
+        nonce = self.transfer_nonces.allocate(source.pub_key)
+        signature = source.sign_transfer(amount, nonce, target.pub_key, self.telepay.address)
+        data = self.telepay.encodeABI(
+            "transfer", [amount, nonce, source.pub_key, target.pub_key, signature]
+        )
+        return self.telepay.address, data
+
+    def deposit_call(self, amount: int):
+        user = random.choice(self.users)
+        return self.router.address, self.router.encodeABI("deposit", [user.pub_key, amount])
+
+    async def approve_router(self):
+        """Let the router pull each sender's tokens for deposit mode"""
+        data = self.token.encodeABI("approve", [self.router.address, 2**256 - 1])
+        await asyncio.gather(
+            *(self.send(s, self.token.address, data, 100_000) for s in self.senders)
+        )
+        await self.wait_all(timeout=120)
+        self.stats = LoadStats()
+
+    async def worker(self, sender, make_call, gas: int, count: int, amount: int, inflight: int):
+        """Keep up to `inflight` transactions from one sender in the mempool"""
+        for _ in range(count):
+            deadline = time.perf_counter() + INFLIGHT_TIMEOUT
+            while self.inflight[sender.address] >= inflight:
+                if time.perf_counter() > deadline:
+                    print(f"⚠️  No receipt for {sender.address} in {INFLIGHT_TIMEOUT:.0f}s, stopping its sends")
+                    return
+                await asyncio.sleep(0.01)
+            to, data = make_call(amount)
+            await self.send(sender, to, data, gas)
+
+    async def run(self, mode: str, transactions: int, amount: int, inflight: int):
+        make_call = self.transfer_call if mode == "transfer" else self.deposit_call
+        to, data = make_call(amount)
+        gas = await self.w3.eth.estimate_gas(
+            {"from": self.senders[0].address, "to": to, "data": data}
+        )
+        gas = gas * 3 // 2
+
+        print(
+            f"🚀 Sending {transactions} {mode} calls from {len(self.senders)} "
+            f"accounts ({inflight} in flight each)..."
+        )
+        counts = split_evenly(transactions, len(self.senders))
+        self.stats.started = time.perf_counter()
+        workers = [
+            self.worker(s, make_call, gas, count, amount, inflight)
+            for s, count in zip(self.senders, counts)
+        ]
+        poller = asyncio.create_task(self._poll_forever())
+        await asyncio.gather(*workers)
+        await self.wait_all(timeout=300)
+        poller.cancel()
+        self.stats.finished = time.perf_counter()
+        self.stats.report()
+
+    async def _poll_forever(self):
+        while True:
+            await self.poll_receipts()
+            await asyncio.sleep(0.2)
+
+
+def split_evenly(total: int, parts: int) -> list:
+    """total as parts counts differing by at most one, the larger ones first"""
+    share, extra = divmod(total, parts)
+    return [share + (i < extra) for i in range(parts)]
+
+
+def load_senders(count: int) -> list:
+    """PRIVATE_KEYS (comma separated) or PRIVATE_KEY, else anvil's default accounts"""
+    keys = os.getenv("PRIVATE_KEYS") or os.getenv("PRIVATE_KEY")
+    if keys:
+        return [Account.from_key(k.strip()) for k in keys.split(",")][:count]
+    Account.enable_unaudited_hdwallet_features()
+    return [
+        Account.from_mnemonic(ANVIL_MNEMONIC, account_path=f"m/44'/60'/0'/0/{i}")
+        for i in range(count)
+    ]
+
+
+async def main(args):
+    w3 = make_async_web3(args.rpc_url)
+    generator = LoadGenerator(
+        w3, load_senders(args.senders), args.telepay, args.router, args.token
+    )
+    await generator.prepare()
+    generator.users = [SyntheticUser() for _ in range(args.users)]
+    if args.mode == "transfer":
+        await generator.seed(args.seed_balance)
+    else:
+        # Senders must already hold the tokens they deposit
+        await generator.approve_router()
+    await generator.run(args.mode, args.transactions, args.amount, args.inflight)
+    print_metrics()
+    await close_async_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test Telepay transfers and router deposits")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545")
+    parser.add_argument("--mode", choices=["transfer", "deposit"], default="transfer")
+    parser.add_argument("--telepay", default=os.getenv("BASE_TELEPAY_ADDRESS"))
+    parser.add_argument("--router", help="TelepayRouter address, deposit mode only")
+    parser.add_argument("--token", help="USDC address, deposit mode only")
+    parser.add_argument("--users", type=int, default=100, help="Synthetic pubkeys")
+    parser.add_argument("--senders", type=int, default=10, help="Sending accounts")
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--inflight", type=int, default=8, help="Pending txs per sender")
+    parser.add_argument("--amount", type=int, default=1)
+    parser.add_argument("--seed-balance", type=int, default=10**12)
+    args = parser.parse_args()
+
+    if not args.telepay:
+        raise EnvironmentError("--telepay or BASE_TELEPAY_ADDRESS must be set")
+    if args.mode == "deposit" and not (args.router and args.token):
+        raise EnvironmentError("--router and --token are required in deposit mode")
+
+    asyncio.run(main(args))
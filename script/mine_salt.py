@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_utils import to_checksum_address
+
+from addresses import (
+    create2_addresses,
+    init_code_hash,
+    salts_from_range,
+    telepay_deployer_address,
+)
+
+load_dotenv()
+
+# Salts hashed by one worker task, large enough to amortize the IPC
+BATCH_SIZE = 1 << 16
+
+# Seconds between progress lines
+REPORT_INTERVAL = 5.0
+
+
+def leading_zero_bytes(addresses: np.ndarray) -> np.ndarray:
+    """Number of leading zero bytes of every (N, 20) address"""
+    nonzero = addresses != 0
+    return np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), 20)
+
+
+def mine_batch(factory: str, code_hash: bytes, owner: bytes, start: int, count: int):
+    """Best salt among start..start+count-1, as (zero bytes, salt, address)
+
+    Salts are the owner address followed by a 12 byte counter, the layout
+    TelepayDeployer.deployRouter accepts from that owner.
+    """
+    salts = salts_from_range(start, count)
+    salts[:, :20] = np.frombuffer(owner, dtype=np.uint8)
+    addresses = create2_addresses(factory, salts, code_hash)
+    zeros = leading_zero_bytes(addresses)
+    best = int(zeros.argmax())
+    return int(zeros[best]), salts[best].tobytes(), addresses[best].tobytes()
+
+
+def mine(owner: str, zero_bytes: int, workers: int, start: int = 0, max_hashes: int = None):
+    """Search router salts of owner until an address has zero_bytes leading zeros
+
+    Batches are spread over a process pool, each process hashing whole
+    batches with the vectorized keccak, so throughput scales with cores.
+    Returns (zero bytes, salt, address) of the best salt found.
+    """
+    factory = telepay_deployer_address()
+    code_hash = init_code_hash("TelepayRouter")
+    owner_bytes = bytes.fromhex(owner[2:])
+    print(f"⛏️  Mining router salts for {owner} through TelepayDeployer {factory}")
+    print(f"🎯 Target: {zero_bytes} leading zero bytes, {workers} workers")
+
+    best = (-1, None, None)
+    hashed = 0
+    next_start = start
+    started = last_report = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            # Two batches queued per worker keeps every core busy
+            while len(pending) < 2 * workers and (
+                max_hashes is None or next_start - start < max_hashes
+            ):
+                pending.add(
+                    pool.submit(
+                        mine_batch, factory, code_hash, owner_bytes, next_start, BATCH_SIZE
+                    )
+                )
+                next_start += BATCH_SIZE
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                hashed += BATCH_SIZE
+                result = future.result()
+                if result[0] > best[0]:
+                    best = result
+                    print(
+                        f"✨ {best[0]} zero bytes: salt 0x{best[1].hex()} -> "
+                        f"{to_checksum_address(best[2])}"
+                    )
+
+            now = time.perf_counter()
+            if best[0] >= zero_bytes:
+                for future in pending:
+                    future.cancel()
+                break
+            if now - last_report >= REPORT_INTERVAL:
+                rate = hashed / (now - started)
+                print(
+                    f"⚡ {hashed:,} salts in {now - started:.0f}s: {rate:,.0f} H/s "
+                    f"({rate / workers:,.0f} H/s per worker)"
+                )
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    print(f"⚡ {hashed:,} salts in {elapsed:.1f}s: {hashed / elapsed:,.0f} H/s")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mine a TelepayRouter CREATE2 salt, the address is the same on every chain"
+    )
+    parser.add_argument("--owner", help="Deploying address, defaults to the PRIVATE_KEY address")
+    parser.add_argument("--zero-bytes", type=int, default=2, help="Leading zero bytes wanted")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--start", type=int, default=0, help="First salt counter to try")
+    parser.add_argument("--max-hashes", type=int, help="Give up after this many salts")
+    args = parser.parse_args()
+
+    owner = args.owner or Account.from_key(os.getenv("PRIVATE_KEY")).address
+    zeros, salt, address = mine(owner, args.zero_bytes, args.workers, args.start, args.max_hashes)
+    if zeros < args.zero_bytes:
+        print(f"❌ No salt with {args.zero_bytes} zero bytes, best has {zeros}")
+    print(f"\nROUTER_SALT=0x{salt.hex()}")
+    print(f"# TelepayRouter on every chain: {to_checksum_address(address)}")
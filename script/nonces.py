@@ -0,0 +1,66 @@
+import threading
+
+from web3 import Web3
+
+# Nonces per Telepay.nonceBitmap word
+WORD_BITS = 256
+
+
+class NonceAllocator:
+    """Hands out Telepay transfer nonces for any number of public keys
+
+    Nonces are unordered on chain, so transfers signed with them can be sent
+    concurrently and land in any order. The allocator packs them into as few
+    bitmap words as possible: only the first nonce used in a word pays for a
+    cold zero to non-zero SSTORE, the following 255 update a warm non-zero
+    slot. Bits already set on chain are skipped when a contract is given.
+    """
+
+    def __init__(self, telepay=None):
+        self.telepay = telepay
+        self._lock = threading.Lock()
+        self._words = {}  # owner -> (word index, bitmap of taken nonces)
+        self._released = {}  # owner -> nonces handed back, reused first
+
+    @staticmethod
+    def owner(pub_key: bytes) -> bytes:
+        """Key of pub_key in Telepay.nonceBitmap"""
+        return Web3.keccak(pub_key)
+
+    def _load_word(self, owner: bytes, index: int) -> int:
+        if self.telepay is None:
+            return 0
+        return self.telepay.functions.nonceBitmap(owner, index).call()
+
+    def allocate(self, pub_key: bytes) -> int:
+        """Lowest nonce of the current word that is neither used nor handed out"""
+        owner = self.owner(pub_key)
+        with self._lock:
+            released = self._released.get(owner)
+            if released:
+                return released.pop()
+
+            index, bitmap = self._words.get(owner, (None, None))
+            if index is None:
+                index = 0
+                bitmap = self._load_word(owner, index)
+            while bitmap == (1 << WORD_BITS) - 1:
+                index += 1
+                bitmap = self._load_word(owner, index)
+
+            # Lowest clear bit
+            bit = (~bitmap & (bitmap + 1)).bit_length() - 1
+            self._words[owner] = (index, bitmap | (1 << bit))
+            return index * WORD_BITS + bit
+
+    def allocate_many(self, pub_key: bytes, count: int) -> list:
+        return [self.allocate(pub_key) for _ in range(count)]
+
+    def release(self, pub_key: bytes, nonce: int):
+        """Give back a nonce whose signed transfer was never sent
+
+        A signature that might still be broadcast must not be released,
+        the nonce would then be spent by whichever transfer lands first.
+        """
+        with self._lock:
+            self._released.setdefault(self.owner(pub_key), []).append(nonce)
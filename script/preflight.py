@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from eth_abi import decode
+from web3 import Web3
+
+from rpc import MultiEndpointClient, RpcClient
+
+# Error(string), what require and revert with a message return
+ERROR_SELECTOR = "0x08c379a0"
+
+# Simulations kept across recent blocks
+CACHE_SIZE = 4096
+
+# Headroom over eth_estimateGas, state may move between simulation and inclusion
+GAS_MARGIN = 1.2
+
+
+class Reverted(Exception):
+    """A transaction that would revert, caught before it was broadcast"""
+
+
+@dataclass
+class Simulation:
+    ok: bool
+    gas: Optional[int] = None
+    output: bytes = b""
+    error: Optional[str] = None
+
+
+def revert_reason(error: dict) -> str:
+    """Revert message of an eth_call error, as far as the node reports it"""
+    data = error.get("data")
+    if isinstance(data, dict):
+        # Some nodes nest the revert data one level down
+        data = data.get("data")
+    if isinstance(data, str) and data.startswith(ERROR_SELECTOR):
+        (reason,) = decode(["string"], bytes.fromhex(data[len(ERROR_SELECTOR) :]))
+        return reason
+    return error.get("message", "execution reverted")
+
+
+def _hex_data(tx: dict) -> str:
+    data = tx.get("data", "0x")
+    return data if isinstance(data, str) else Web3.to_hex(data)
+
+
+def batch_client(w3: Web3) -> RpcClient:
+    """The endpoint behind a make_web3 instance that batches go to"""
+    client = w3.provider.client
+    if isinstance(client, MultiEndpointClient):
+        return client.pinned()
+    return client
+
+
+class Preflight:
+    """eth_call and eth_estimateGas of transactions before they are sent
+
+    Both calls of every transaction go out in one JSON-RPC batch and the
+    results are cached per (block, sender, target, calldata, value), so a
+    sender re-planning or retrying within a block simulates only once.
+    """
+
+    def __init__(self, w3: Web3, cache_size: int = CACHE_SIZE, gas_margin: float = GAS_MARGIN):
+        self.w3 = w3
+        self.client = batch_client(w3)
+        self.cache_size = cache_size
+        self.gas_margin = gas_margin
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(tx: dict, block: int) -> tuple:
+        return (block, tx.get("from"), tx.get("to"), _hex_data(tx).lower(), tx.get("value", 0))
+
+    @staticmethod
+    def call_params(tx: dict) -> dict:
+        """Only what affects execution: nonce and fees would make calls fail
+        for transactions queued behind pending ones"""
+        params = {field: tx[field] for field in ("from", "to", "value") if field in tx}
+        params["data"] = _hex_data(tx)
+        if "value" in params:
+            params["value"] = hex(params["value"])
+        return params
+
+    def simulate(self, txs: List[dict], block: int = None) -> List[Simulation]:
+        """Simulation of every tx on top of block, the latest one by default"""
+        block = self.w3.eth.block_number if block is None else block
+        keys = [self.key(tx, block) for tx in txs]
+        with self._lock:
+            cached = {k: self._cache[k] for k in keys if k in self._cache}
+            for k in cached:
+                self._cache.move_to_end(k)
+
+        missing = list(dict.fromkeys(k for k in keys if k not in cached))
+        if missing:
+            by_key = dict(zip(keys, txs))
+            calls = []
+            for k in missing:
+                params = self.call_params(by_key[k])
+                calls += [("eth_call", [params, hex(block)]), ("eth_estimateGas", [params, hex(block)])]
+            responses = self.client.batches(calls)
+            fresh = {
+                k: self._simulation(call, estimate)
+                for k, call, estimate in zip(missing, responses[0::2], responses[1::2])
+            }
+            with self._lock:
+                self._cache.update(fresh)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            cached.update(fresh)
+
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return [cached[k] for k in keys]
+
+    def _simulation(self, call: dict, estimate: dict) -> Simulation:
+        if "error" in call:
+            return Simulation(False, error=revert_reason(call["error"]))
+        if "error" in estimate:
+            # Succeeds as a call but not within the block gas limit, or the
+            # node could not estimate it
+            return Simulation(False, error=revert_reason(estimate["error"]))
+        return Simulation(
+            True,
+            gas=int(int(estimate["result"], 16) * self.gas_margin),
+            output=bytes.fromhex(call["result"][2:]),
+        )
+
+    def filter(self, txs: List[dict], block: int = None) -> Tuple[List[dict], List[tuple]]:
+        """Transactions that would succeed, with gas filled in, and the
+        (tx, reason) of those dropped"""
+        passing, dropped = [], []
+        for tx, simulation in zip(txs, self.simulate(txs, block)):
+            if simulation.ok:
+                passing.append({"gas": simulation.gas, **tx})
+            else:
+                dropped.append((tx, simulation.error))
+        return passing, dropped
+
+    def check(self, tx: dict, block: int = None) -> dict:
+        """tx with gas filled in, raising Reverted if it would revert"""
+        passing, dropped = self.filter([tx], block)
+        if dropped:
+            raise Reverted(dropped[0][1])
+        return passing[0]
@@ -0,0 +1,353 @@
+import argparse
+import bisect
+import json
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from eth_abi import decode
+from web3 import Web3
+
+from addresses import RPC_ENV, parse_nonces
+from events import get_logs, iter_logs
+from rpc import RpcError, get_client, get_multi_client, make_web3
+
+load_dotenv()
+
+# CCTP domain of each network
+DOMAINS = {"eth_sepolia": 0, "arbitrum_sepolia": 3, "base_sepolia": 6}
+
+MESSAGE_SENT = Web3.keccak(text="MessageSent(bytes)")
+MESSAGE_RECEIVED = Web3.keccak(text="MessageReceived(address,uint32,uint64,bytes32,bytes)")
+USED_NONCES = Web3.keccak(text="usedNonces(bytes32)")[:4]
+
+# usedNonces eth_calls per JSON-RPC batch
+CALL_BATCH_SIZE = 500
+
+
+def env_prefix(network: str) -> str:
+    return network.split("_")[0].upper()
+
+
+def parse_message(message: bytes) -> dict:
+    """Header fields of a CCTP v1 message and its body"""
+    return {
+        "sourceDomain": int.from_bytes(message[4:8], "big"),
+        "destinationDomain": int.from_bytes(message[8:12], "big"),
+        "nonce": int.from_bytes(message[12:20], "big"),
+        "sender": message[20:52],
+        "body": message[116:],
+    }
+
+
+def burn_sender(body: bytes) -> bytes:
+    """messageSender of a TokenMessenger burn message body, the depositForBurn caller"""
+    return body[100:132]
+
+
+class NonceRanges:
+    """Set of uint64 nonces stored as sorted, disjoint [start, end] ranges
+
+    Relayed nonces arrive mostly in order and in runs, so millions of them
+    take a handful of ranges at 16 bytes each instead of a set entry each.
+    """
+
+    def __init__(self):
+        self.starts = array("Q")
+        self.ends = array("Q")
+
+    def add(self, nonce: int):
+        starts, ends = self.starts, self.ends
+        # Next nonce in order, or past every range
+        if ends and ends[-1] + 1 == nonce:
+            ends[-1] = nonce
+            return
+        if not ends or nonce > ends[-1]:
+            starts.append(nonce)
+            ends.append(nonce)
+            return
+
+        i = bisect.bisect_right(starts, nonce)
+        if i and ends[i - 1] >= nonce:
+            return
+        joins_left = i > 0 and ends[i - 1] + 1 == nonce
+        joins_right = i < len(starts) and starts[i] == nonce + 1
+        if joins_left and joins_right:
+            ends[i - 1] = ends[i]
+            del starts[i]
+            del ends[i]
+        elif joins_left:
+            ends[i - 1] = nonce
+        elif joins_right:
+            starts[i] = nonce
+        else:
+            starts.insert(i, nonce)
+            ends.insert(i, nonce)
+
+    def __contains__(self, nonce: int) -> bool:
+        i = bisect.bisect_right(self.starts, nonce)
+        return i > 0 and self.ends[i - 1] >= nonce
+
+    def __len__(self) -> int:
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.starts) * self.starts.itemsize * 2
+
+
+class SentIndex:
+    """Nonces and blocks of the messages sent from one domain to another
+
+    CCTP nonces only increase within a source domain, so both arrays stay
+    sorted by appending.
+    """
+
+    def __init__(self):
+        self.nonces = array("Q")
+        self.blocks = array("Q")
+
+    def add(self, nonce: int, block: int):
+        self.nonces.append(nonce)
+        self.blocks.append(block)
+
+    def __len__(self) -> int:
+        return len(self.nonces)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.nonces) * self.nonces.itemsize * 2
+
+
+class Chain:
+    """CCTP contracts and the Telepay router of one network, from the env"""
+
+    def __init__(self, network: str):
+        prefix = env_prefix(network)
+        self.network = network
+        self.domain = DOMAINS[network]
+        self.url = os.getenv(RPC_ENV[network])
+        self.transmitter = os.getenv(f"{prefix}_MESSAGE_TRANSMITTER")
+        self.token_messenger = os.getenv(f"{prefix}_TOKEN_MESSENGER")
+        self.router = os.getenv(f"{prefix}_ROUTER_ADDRESS")
+        missing = [
+            name
+            for name, value in [
+                (RPC_ENV[network], self.url),
+                (f"{prefix}_MESSAGE_TRANSMITTER", self.transmitter),
+                (f"{prefix}_TOKEN_MESSENGER", self.token_messenger),
+                (f"{prefix}_ROUTER_ADDRESS", self.router),
+            ]
+            if not value
+        ]
+        if missing:
+            raise EnvironmentError(f"Missing {', '.join(missing)} for {network}")
+        self.w3 = make_web3(self.url)
+        self.latest = self.w3.eth.block_number
+
+    def blocks_in(self, seconds: float) -> int:
+        """Blocks produced in that many seconds, at the recent average rate"""
+        sample = max(self.latest - 10_000, 0)
+        elapsed = (
+            self.w3.eth.get_block(self.latest)["timestamp"]
+            - self.w3.eth.get_block(sample)["timestamp"]
+        )
+        return int(seconds * (self.latest - sample) / max(elapsed, 1))
+
+
+def scan_sent(chain: Chain, from_block: int, to_block: int) -> dict:
+    """Messages the router sent, keyed by (source, destination) domain
+
+    Both legs of a deposit are picked out of the transmitter's MessageSent
+    logs: the credit message the router sends to Telepay, and the burn to
+    the vault, sent by the TokenMessenger on the router's behalf.
+    """
+    router = bytes(12) + bytes.fromhex(chain.router[2:])
+    messenger = bytes(12) + bytes.fromhex(chain.token_messenger[2:])
+    sent = {}
+    for log in iter_logs(
+        chain.w3, chain.transmitter, [MESSAGE_SENT.hex()], from_block, to_block
+    ):
+        (message,) = decode(["bytes"], bytes(log["data"]))
+        fields = parse_message(message)
+        if fields["sender"] != router and not (
+            fields["sender"] == messenger and burn_sender(fields["body"]) == router
+        ):
+            continue
+        key = (fields["sourceDomain"], fields["destinationDomain"])
+        sent.setdefault(key, SentIndex()).add(fields["nonce"], log["blockNumber"])
+    return sent
+
+
+def scan_received(chain: Chain, from_block: int, to_block: int) -> dict:
+    """Nonces received on chain, as ranges per source domain"""
+    received = {}
+    for log in iter_logs(
+        chain.w3, chain.transmitter, [MESSAGE_RECEIVED.hex()], from_block, to_block
+    ):
+        # sourceDomain is the first data word, the nonce the second indexed topic
+        source_domain = int.from_bytes(bytes(log["data"])[:32], "big")
+        nonce = int.from_bytes(bytes(log["topics"][2]), "big")
+        received.setdefault(source_domain, NonceRanges()).add(nonce)
+    return received
+
+
+def check_used(chain: Chain, source_domain: int, nonces: list, block: int) -> list:
+    """MessageTransmitter.usedNonces of each nonce at block, in batched eth_calls"""
+    client = get_client(get_multi_client(chain.url).best_url())
+    calls = [
+        (
+            "eth_call",
+            [
+                {
+                    "to": chain.transmitter,
+                    "data": "0x"
+                    + (
+                        USED_NONCES
+                        + Web3.solidity_keccak(["uint32", "uint64"], [source_domain, nonce])
+                    ).hex(),
+                },
+                hex(block),
+            ],
+        )
+        for nonce in nonces
+    ]
+    used = []
+    for response in client.batches(calls, CALL_BATCH_SIZE):
+        if "error" in response:
+            raise RpcError(response["error"])
+        used.append(int(response["result"], 16) != 0)
+    return used
+
+
+def fetch_messages(chain: Chain, stuck: list) -> list:
+    """Full messages of (nonce, block) pairs, refetched from their blocks"""
+    wanted = {}
+    for nonce, block in stuck:
+        wanted.setdefault(block, set()).add(nonce)
+    messages = []
+    for block, nonces in sorted(wanted.items()):
+        for log in get_logs(chain.w3, chain.transmitter, [MESSAGE_SENT.hex()], block, block):
+            (message,) = decode(["bytes"], bytes(log["data"]))
+            fields = parse_message(message)
+            if fields["nonce"] in nonces:
+                messages.append(
+                    {
+                        "sourceDomain": fields["sourceDomain"],
+                        "destinationDomain": fields["destinationDomain"],
+                        "nonce": fields["nonce"],
+                        "blockNumber": block,
+                        "transactionHash": log["transactionHash"].hex(),
+                        "message": "0x" + message.hex(),
+                        # Circle's attestation API is keyed by this hash
+                        "messageHash": Web3.keccak(message).hex(),
+                    }
+                )
+    return messages
+
+
+def unrelayed(chains: dict, starts: dict, sent_ends: dict, received_ends: dict) -> list:
+    """Router messages sent by sent_ends and not received by received_ends
+
+    chains, and the block dicts, are keyed by CCTP domain.
+    """
+    with ThreadPoolExecutor(max_workers=len(chains)) as pool:
+        sent_futures = [
+            pool.submit(scan_sent, chain, starts[domain], sent_ends[domain])
+            for domain, chain in chains.items()
+        ]
+        received_futures = {
+            domain: pool.submit(scan_received, chain, starts[domain], received_ends[domain])
+            for domain, chain in chains.items()
+        }
+        sent = {}
+        for future in sent_futures:
+            sent.update(future.result())
+        received = {domain: future.result() for domain, future in received_futures.items()}
+
+    stuck = []
+    for (source, destination), index in sorted(sent.items()):
+        if destination not in chains:
+            continue
+        ranges = received[destination].get(source, NonceRanges())
+        candidates = [
+            (nonce, block)
+            for nonce, block in zip(index.nonces, index.blocks)
+            if nonce not in ranges
+        ]
+        # Received before the scanned window, or missed by the log scan
+        target = chains[destination]
+        used = check_used(
+            target, source, [nonce for nonce, _ in candidates], received_ends[destination]
+        )
+        missing = [c for c, was_used in zip(candidates, used) if not was_used]
+        print(
+            f"📨 {chains[source].network} -> {target.network}: {len(index):,} sent, "
+            f"{len(missing):,} unrelayed ({index.nbytes + ranges.nbytes:,} bytes indexed, "
+            f"{len(ranges.starts):,} received ranges)"
+        )
+        stuck += fetch_messages(chains[source], missing)
+    return stuck
+
+
+def load_chains(networks: list) -> dict:
+    """Chain of each network, keyed by CCTP domain"""
+    with ThreadPoolExecutor(max_workers=len(networks)) as pool:
+        return {chain.domain: chain for chain in pool.map(Chain, networks)}
+
+
+def window_starts(chains: dict, from_blocks: dict, since_hours: float) -> dict:
+    """First block to scan per domain, from_blocks by network or since_hours back"""
+    starts = {}
+    for domain, chain in chains.items():
+        start = from_blocks.get(chain.network)
+        if start is None:
+            start = max(chain.latest - chain.blocks_in(since_hours * 3600), 0)
+        starts[domain] = start
+    return starts
+
+
+def reconcile(networks: list, from_blocks: dict, since_hours: float, grace_minutes: float) -> list:
+    """Router messages older than the grace period that were never received"""
+    chains = load_chains(networks)
+    starts = window_starts(chains, from_blocks, since_hours)
+    # Recent messages may still be waiting for finality or attestation
+    sent_ends = {
+        domain: chain.latest - chain.blocks_in(grace_minutes * 60)
+        for domain, chain in chains.items()
+    }
+    received_ends = {domain: chain.latest for domain, chain in chains.items()}
+    return unrelayed(chains, starts, sent_ends, received_ends)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find Telepay CCTP messages that were sent but never relayed"
+    )
+    parser.add_argument("--networks", nargs="+", default=list(DOMAINS))
+    parser.add_argument(
+        "--from-block",
+        action="append",
+        default=[],
+        metavar="NETWORK=BLOCK",
+        help="First block to scan on a network",
+    )
+    parser.add_argument("--since-hours", type=float, default=24 * 7, help="Default scan window")
+    parser.add_argument(
+        "--grace-minutes",
+        type=float,
+        default=60,
+        help="Messages younger than this are in flight, not stuck",
+    )
+    parser.add_argument("--output", default="unrelayed.jsonl", help="One message per line")
+    args = parser.parse_args()
+
+    stuck = reconcile(args.networks, parse_nonces(args.from_block), args.since_hours, args.grace_minutes)
+    with open(args.output, "w") as f:
+        for message in stuck:
+            f.write(json.dumps(message) + "\n")
+    if stuck:
+        print(f"❌ {len(stuck)} unrelayed messages written to {args.output}")
+    else:
+        print("✅ Every message was relayed")
@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from eth_abi import encode
+from web3 import Web3
+
+from addresses import RPC_ENV, parse_nonces
+from batch import MerkleTree
+from events import TOPIC_OF, decode_log, iter_logs
+from keccak import keccak256_batch
+from reconcile import (
+    CALL_BATCH_SIZE,
+    DOMAINS,
+    load_chains,
+    parse_message,
+    unrelayed,
+    window_starts,
+)
+from rpc import RpcError, get_client, get_multi_client, make_web3
+
+load_dotenv()
+
+TELEPAY_NETWORK = "base_sepolia"
+VAULT_NETWORK = "eth_sepolia"
+
+SELECTORS = {
+    name: Web3.keccak(text=signature)[:4]
+    for name, signature in [
+        ("balances", "balances(bytes)"),
+        ("balanceOf", "balanceOf(address)"),
+        ("shares", "shares(address)"),
+        ("totalShares", "totalShares()"),
+        ("token", "token()"),
+        ("eulerVault", "eulerVault()"),
+    ]
+}
+
+
+class BalanceIndexer:
+    """Telepay balances replayed from Credit and NativeTransfer logs
+
+    Only public keys seen in logs are known, so the snapshot it resumes from
+    also carries every key with a balance. debugSetValue emits nothing: its
+    effect shows up as drift against the balances read on-chain.
+    """
+
+    def __init__(self, balances: dict = None, block: int = -1):
+        self.balances = balances or {}
+        self.block = block
+
+    def apply(self, event: dict):
+        if event["event"] == "Credit":
+            key = event["pubKey"]
+            self.balances[key] = self.balances.get(key, 0) + event["amount"]
+        elif event["event"] == "NativeTransfer":
+            source, target = event["fromPubKey"], event["toPubKey"]
+            self.balances[source] = self.balances.get(source, 0) - event["amount"]
+            self.balances[target] = self.balances.get(target, 0) + event["amount"]
+
+    def sync(self, w3: Web3, telepay: str, from_block: int, to_block: int):
+        topics = [[TOPIC_OF["Credit"].hex(), TOPIC_OF["NativeTransfer"].hex()]]
+        for log in iter_logs(w3, telepay, topics, max(from_block, self.block + 1), to_block):
+            self.apply(decode_log(log))
+        self.block = to_block
+
+
+def eth_call(to: str, name: str, args: bytes = b"", block: int = None) -> tuple:
+    return ("eth_call", [{"to": to, "data": "0x" + (SELECTORS[name] + args).hex()}, hex(block)])
+
+
+def results(responses: list) -> list:
+    """eth_call results as ints, raising on the first error"""
+    values = []
+    for response in responses:
+        if "error" in response:
+            raise RpcError(response["error"])
+        values.append(int(response["result"], 16))
+    return values
+
+
+def read_balances(url: str, telepay: str, keys: list, block: int) -> list:
+    """Telepay.balances of every key at block, in concurrent eth_call batches"""
+    client = get_client(get_multi_client(url).best_url())
+    calls = [eth_call(telepay, "balances", encode(["bytes"], [key]), block) for key in keys]
+    return results(client.batches(calls, CALL_BATCH_SIZE))
+
+
+def read_assets(url: str, vault: str, block: int) -> dict:
+    """Idle USDC of the vault and its Euler shares valued like keeper.py does"""
+    client = get_client(get_multi_client(url).best_url())
+    token, euler = results(
+        client.batch([eth_call(vault, "token", block=block), eth_call(vault, "eulerVault", block=block)])
+    )
+    token, euler = (Web3.to_checksum_address(a.to_bytes(20, "big")) for a in (token, euler))
+    holder = encode(["address"], [vault])
+    idle, shares, total_shares, euler_assets = results(
+        client.batch(
+            [
+                eth_call(token, "balanceOf", holder, block),
+                eth_call(euler, "shares", holder, block),
+                eth_call(euler, "totalShares", block=block),
+                eth_call(token, "balanceOf", encode(["address"], [euler]), block),
+            ]
+        )
+    )
+    invested = shares * euler_assets // total_shares if shares else 0
+    return {"idle": idle, "invested": invested}
+
+
+def in_flight(networks: list, pins: dict, since_hours: float) -> dict:
+    """Deposit amounts sent by the pinned blocks and not yet received
+
+    Burns are on their way to the vault, credits on their way to Telepay.
+    """
+    chains = load_chains(networks)
+    starts = window_starts(chains, {}, since_hours)
+    blocks = {domain: pins[chain.network] for domain, chain in chains.items()}
+    totals = {"burns": 0, "credits": 0}
+    for message in unrelayed(chains, starts, blocks, blocks):
+        fields = parse_message(bytes.fromhex(message["message"][2:]))
+        if fields["destinationDomain"] == DOMAINS[VAULT_NETWORK]:
+            # BurnMessage: version, burnToken, mintRecipient, amount, messageSender
+            totals["burns"] += int.from_bytes(fields["body"][68:100], "big")
+        else:
+            # TelepayRouter credit: abi.encode(amount, pubKey, burnNonce)
+            totals["credits"] += int.from_bytes(fields["body"][:32], "big")
+    return totals
+
+
+def balance_leaves(key_hashes: np.ndarray, balances: list) -> np.ndarray:
+    """keccak256(keccak256(abi.encode(keccak256(pubKey), balance))) of each entry"""
+    encoded = np.empty((len(balances), 64), dtype=np.uint8)
+    encoded[:, :32] = key_hashes
+    encoded[:, 32:] = np.frombuffer(
+        b"".join(balance.to_bytes(32, "big") for balance in balances), dtype=np.uint8
+    ).reshape(-1, 32)
+    return keccak256_batch(keccak256_batch(encoded))
+
+
+def key_hashes(keys: list) -> np.ndarray:
+    """keccak256 of every public key, hashed together by key length"""
+    hashes = np.empty((len(keys), 32), dtype=np.uint8)
+    by_length = {}
+    for i, key in enumerate(keys):
+        by_length.setdefault(len(key), []).append(i)
+    for length, index in by_length.items():
+        messages = np.frombuffer(b"".join(keys[i] for i in index), dtype=np.uint8)
+        hashes[index] = keccak256_batch(messages.reshape(len(index), length))
+    return hashes
+
+
+class BalanceTree:
+    """batch.MerkleTree built a level at a time with vectorized keccak
+
+    Same shape and commutative pair hash, so proofs verify with
+    MerkleTree.verify and OpenZeppelin's MerkleProof. With no balances the
+    root is zero.
+    """
+
+    def __init__(self, leaves: np.ndarray):
+        self.levels = [leaves]
+        while len(self.levels[-1]) > 1:
+            nodes = self.levels[-1]
+            pairs = len(nodes) // 2
+            left, right = nodes[0 : 2 * pairs : 2], nodes[1 : 2 * pairs : 2]
+            # Order each pair by its first differing byte
+            first = (left != right).argmax(axis=1)
+            rows = np.arange(pairs)
+            swap = (left[rows, first] > right[rows, first])[:, None]
+            parents = keccak256_batch(
+                np.hstack([np.where(swap, right, left), np.where(swap, left, right)])
+            )
+            if len(nodes) % 2 == 1:
+                parents = np.vstack([parents, nodes[-1:]])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> bytes:
+        if not len(self.levels[-1]):
+            return bytes(32)
+        return self.levels[-1][0].tobytes()
+
+    def proof(self, index: int) -> list:
+        proof = []
+        for nodes in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                proof.append(nodes[sibling].tobytes())
+            index //= 2
+        return proof
+
+
+def build_tree(balances: dict) -> tuple:
+    """Keys with a balance in leaf order (by key hash) and their tree"""
+    keys = [key for key, balance in balances.items() if balance > 0]
+    hashes = key_hashes(keys)
+    order = np.lexsort(hashes.T[::-1])
+    keys = [keys[i] for i in order]
+    hashes = hashes[order]
+    return keys, BalanceTree(balance_leaves(hashes, [balances[key] for key in keys]))
+
+
+def load_snapshot(path: str) -> tuple:
+    """Header and balances of a snapshot written by save_snapshot"""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        balances = {}
+        for line in f:
+            entry = json.loads(line)
+            balances[bytes.fromhex(entry["pubKey"][2:])] = entry["balance"]
+    return header, balances
+
+
+def save_snapshot(path: str, header: dict, keys: list, balances: dict):
+    """Header line, then one balance per line in leaf order"""
+    with open(path, "w") as f:
+        f.write(json.dumps(header) + "\n")
+        for key in keys:
+            f.write(json.dumps({"pubKey": "0x" + key.hex(), "balance": balances[key]}) + "\n")
+
+
+def liabilities(url: str, telepay: str, block: int, snapshot: str, from_block: int) -> dict:
+    """Telepay balances at block, resuming the index from the last snapshot"""
+    w3 = make_web3(url)
+    indexer = BalanceIndexer()
+    if snapshot and Path(snapshot).exists():
+        header, balances = load_snapshot(snapshot)
+        if header["telepay"] == telepay and header["block"] < block:
+            indexer = BalanceIndexer(balances, header["block"])
+    indexer.sync(w3, telepay, from_block, block)
+
+    keys = list(indexer.balances)
+    onchain = dict(zip(keys, read_balances(url, telepay, keys, block)))
+    drift = sum(onchain[key] != indexer.balances[key] for key in keys)
+
+    keys, tree = build_tree(onchain)
+    header = {
+        "telepay": telepay,
+        "block": block,
+        "root": "0x" + tree.root.hex(),
+        "accounts": len(keys),
+        "total": sum(onchain[key] for key in keys),
+    }
+    if snapshot:
+        save_snapshot(snapshot, header, keys, onchain)
+    return {**header, "drift": drift}
+
+
+def pinned_blocks(networks: list, blocks: dict) -> dict:
+    """Given block per network, the finalized block otherwise"""
+    pins = {}
+    for network in networks:
+        if network in blocks:
+            pins[network] = blocks[network]
+        else:
+            w3 = make_web3(os.getenv(RPC_ENV[network]))
+            pins[network] = w3.eth.get_block("finalized")["number"]
+    return pins
+
+
+def prove(snapshot: str, pub_key: bytes) -> dict:
+    header, balances = load_snapshot(snapshot)
+    keys, tree = build_tree(balances)
+    if tree.root.hex() != header["root"][2:]:
+        raise ValueError(f"{snapshot} does not match its root {header['root']}")
+    if not balances.get(pub_key):
+        raise ValueError(f"No balance for 0x{pub_key.hex()} in {snapshot}")
+    index = keys.index(pub_key)
+    leaf = tree.levels[0][index].tobytes()
+    proof = tree.proof(index)
+    if not MerkleTree.verify(proof, tree.root, leaf):
+        raise ValueError(f"Proof of 0x{pub_key.hex()} does not verify")
+    return {
+        "root": header["root"],
+        "block": header["block"],
+        "pubKey": "0x" + pub_key.hex(),
+        "balance": balances[pub_key],
+        "leaf": "0x" + leaf.hex(),
+        "proof": ["0x" + p.hex() for p in proof],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proof of reserves of Telepay and its vault")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    run_parser = sub.add_parser("run", help="Liabilities against assets at pinned blocks")
+    run_parser.add_argument("--networks", nargs="+", default=list(DOMAINS))
+    run_parser.add_argument(
+        "--block",
+        action="append",
+        default=[],
+        metavar="NETWORK=BLOCK",
+        help="Block to pin a network at, its finalized block by default",
+    )
+    run_parser.add_argument("--telepay", default=os.getenv("BASE_TELEPAY_ADDRESS"))
+    run_parser.add_argument("--vault", default=os.getenv("ETH_VAULT_ADDRESS"))
+    run_parser.add_argument("--from-block", type=int, default=0, help="Telepay deployment block")
+    run_parser.add_argument("--snapshot", default="balances.jsonl", help="Read, then rewritten")
+    run_parser.add_argument(
+        "--since-hours", type=float, default=24, help="How far back to look for in-flight messages"
+    )
+    run_parser.add_argument("--output", help="Write the report as JSON")
+
+    prove_parser = sub.add_parser("prove", help="Inclusion proof of one balance")
+    prove_parser.add_argument("--snapshot", default="balances.jsonl")
+    prove_parser.add_argument("--pubkey", required=True, help="64-byte public key, hex")
+    args = parser.parse_args()
+
+    if args.mode == "prove":
+        pub_key = bytes.fromhex(args.pubkey[2:] if args.pubkey.startswith("0x") else args.pubkey)
+        print(json.dumps(prove(args.snapshot, pub_key), indent=2))
+        raise SystemExit
+
+    if not args.telepay or not args.vault:
+        raise EnvironmentError("BASE_TELEPAY_ADDRESS and ETH_VAULT_ADDRESS must be set")
+    pins = pinned_blocks(args.networks, parse_nonces(args.block))
+    for network, block in pins.items():
+        print(f"📌 {network} at block {block}")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        owed = pool.submit(
+            liabilities,
+            os.getenv("BASE_SEPOLIA_RPC"),
+            Web3.to_checksum_address(args.telepay),
+            pins[TELEPAY_NETWORK],
+            args.snapshot,
+            args.from_block,
+        )
+        held = pool.submit(
+            read_assets,
+            os.getenv("ETH_SEPOLIA_RPC"),
+            Web3.to_checksum_address(args.vault),
+            pins[VAULT_NETWORK],
+        )
+        moving = pool.submit(in_flight, args.networks, pins, args.since_hours)
+        owed, held, moving = owed.result(), held.result(), moving.result()
+
+    total_liabilities = owed["total"] + moving["credits"]
+    total_assets = held["idle"] + held["invested"] + moving["burns"]
+    report = {
+        "blocks": pins,
+        "liabilities": {"balances": owed["total"], "inFlightCredits": moving["credits"]},
+        "assets": {**held, "inFlightBurns": moving["burns"]},
+        "surplus": total_assets - total_liabilities,
+        "root": owed["root"],
+        "accounts": owed["accounts"],
+        "drift": owed["drift"],
+    }
+    print(f"🧾 Liabilities {total_liabilities:,}: {owed['accounts']:,} balances, "
+          f"{moving['credits']:,} in-flight credits")
+    print(f"🏦 Assets {total_assets:,}: {held['idle']:,} idle, {held['invested']:,} invested, "
+          f"{moving['burns']:,} in-flight burns")
+    print(f"🌳 Balance root {owed['root']}")
+    if owed["drift"]:
+        print(f"⚠️  {owed['drift']} balances differ from their event history")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if report["surplus"] < 0:
+        print(f"❌ Reserves short by {-report['surplus']:,}")
+        raise SystemExit(1)
+    print(f"✅ Reserves cover liabilities, surplus {report['surplus']:,}")
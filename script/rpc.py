@@ -0,0 +1,438 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Dict, List, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3, Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+
+# Client-side limits, shared by every script through the environment
+MAX_CONCURRENCY = int(os.getenv("RPC_MAX_CONCURRENCY", "16"))
+RETRIES = int(os.getenv("RPC_RETRIES", "3"))
+TIMEOUT = float(os.getenv("RPC_TIMEOUT", "30"))
+
+# HTTP statuses worth retrying, anything else is returned to the caller
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Hedged reads wait for the primary endpoint's p95 before asking the next one
+MIN_HEDGE_DELAY = 0.05
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_LATENCY_SAMPLES = 20
+
+# Seconds of latency a failing endpoint is scored as
+ERROR_PENALTY = 10.0
+
+# Every Nth read also probes the worst endpoint so it can earn its way back
+PROBE_INTERVAL = 50
+
+# Sent to every endpoint instead of hedged
+BROADCAST_METHODS = {"eth_sendRawTransaction"}
+
+# Answers that don't depend on how far an endpoint has synced, the only reads
+# hedged across endpoints. Everything else goes to the pinned endpoint.
+HEDGED_METHODS = {"eth_chainId", "net_version", "web3_clientVersion"}
+
+
+class RpcError(Exception):
+    """JSON-RPC error response or an endpoint that kept failing"""
+
+
+class EndpointMetrics:
+    """Request counts and a sliding window of latencies for one endpoint"""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=window)
+        self.ewma_latency = None
+        self.ewma_errors = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+            self.ewma_latency = (
+                latency
+                if self.ewma_latency is None
+                else 0.8 * self.ewma_latency + 0.2 * latency
+            )
+            self.ewma_errors = 0.9 * self.ewma_errors + (0.0 if ok else 0.1)
+
+    def health_score(self) -> float:
+        """Lower is better: recent latency, heavily penalized by recent errors"""
+        if self.ewma_latency is None:
+            return 0.0  # untried endpoints get a chance first
+        return self.ewma_latency + ERROR_PENALTY * self.ewma_errors
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(self.percentile(95), MIN_HEDGE_DELAY)
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests, {self.errors} errors, {self.retries} retries, "
+            f"p50={self.percentile(50) * 1000:.0f}ms p95={self.percentile(95) * 1000:.0f}ms"
+        )
+
+
+class RpcClient:
+    """JSON-RPC over a keep-alive session with a cap on concurrent requests
+
+    One client per endpoint URL is shared process-wide (see get_client), so
+    every Web3 instance and polling loop reuses the same TLS connections.
+    """
+
+    def __init__(self, url: str, max_concurrency: int = MAX_CONCURRENCY, retries: int = RETRIES, timeout: float = TIMEOUT):
+        self.url = url
+        self.retries = retries
+        self.timeout = timeout
+        self.metrics = EndpointMetrics()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._ids = itertools.count()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+
+    def post(self, payload, retries: int = None) -> Any:
+        """POST a JSON-RPC payload, retrying transport failures with backoff"""
+        retries = self.retries if retries is None else retries
+        body = json.dumps(payload, cls=Web3JsonEncoder)
+        for attempt in range(retries + 1):
+            if attempt:
+                self.metrics.retries += 1
+                time.sleep(min(0.25 * 2**attempt, 4.0))
+            start = time.perf_counter()
+            try:
+                with self._slots:
+                    response = self.session.post(self.url, data=body, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.record(time.perf_counter() - start, ok=False)
+                error = e
+                continue
+            ok = response.status_code not in RETRY_STATUSES
+            self.metrics.record(time.perf_counter() - start, ok=ok)
+            if ok:
+                response.raise_for_status()
+                return response.json()
+            error = f"HTTP {response.status_code}"
+        raise RpcError(f"{self.url} failed after {retries + 1} attempts: {error}")
+
+    def make_request(self, method: str, params: list, retries: int = None) -> dict:
+        """Raw JSON-RPC response, error responses included"""
+        return self.post(
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": next(self._ids)},
+            retries,
+        )
+
+    def call(self, method: str, params: list = None) -> Any:
+        response = self.make_request(method, params or [])
+        if "error" in response:
+            raise RpcError(response["error"])
+        return response["result"]
+
+    def batch(self, calls: List[tuple]) -> List[dict]:
+        """Send [(method, params), ...] as one JSON-RPC batch, responses in order"""
+        ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+            for request_id, (method, params) in zip(ids, calls)
+        ]
+        reply = self.post(payload)
+        if isinstance(reply, dict):
+            # Some nodes refuse a whole batch (size or rate limits) with one error
+            raise RpcError(reply.get("error", reply))
+        responses = {r.get("id"): r for r in reply}
+        missing = [request_id for request_id in ids if request_id not in responses]
+        if missing:
+            raise RpcError(f"{self.url} returned no response for {len(missing)} of {len(ids)} batched calls")
+        return [responses[request_id] for request_id in ids]
+
+    def batches(self, calls: List[tuple], size: int = 500) -> List[dict]:
+        """batch() in chunks of size sent concurrently, responses in order"""
+        chunks = [calls[i : i + size] for i in range(0, len(calls), size)]
+        with ThreadPoolExecutor(max_workers=max(min(len(chunks), MAX_CONCURRENCY), 1)) as pool:
+            return [response for chunk in pool.map(self.batch, chunks) for response in chunk]
+
+
+class MultiEndpointClient:
+    """Several endpoints of one chain behind the RpcClient interface
+
+    Endpoints can be at different heads, so reads whose answer depends on
+    the chain state (block number, nonces, logs, receipts, calls) all go to
+    one pinned endpoint: a block number and the logs or receipts read after
+    it always come from the same node. The pin starts on the healthiest
+    endpoint and only moves, to the next healthiest, when its endpoint fails.
+    Reads that don't depend on the head are hedged: if the healthiest
+    endpoint hasn't answered within its own p95 latency the next one is
+    asked too, and the first answer wins. Raw transactions are broadcast to
+    every endpoint.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.clients = [get_client(url) for url in urls]
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(urls))
+        self._reads = itertools.count()
+        self._pinned = None
+        self._pin_lock = threading.Lock()
+
+    def ranked(self) -> List[RpcClient]:
+        return sorted(self.clients, key=lambda c: c.metrics.health_score())
+
+    def best_url(self) -> str:
+        return self.ranked()[0].url
+
+    def pinned(self) -> RpcClient:
+        """The endpoint state-dependent reads and batches go to"""
+        with self._pin_lock:
+            if self._pinned is None:
+                self._pinned = self.ranked()[0]
+            return self._pinned
+
+    def make_request(self, method: str, params: list) -> dict:
+        if method in BROADCAST_METHODS:
+            return self._broadcast(method, params)
+        self._probe(method, params)
+        if method in HEDGED_METHODS:
+            return self._hedged(method, params)
+        return self._pinned_read(method, params)
+
+    def call(self, method: str, params: list = None) -> Any:
+        response = self.make_request(method, params or [])
+        if "error" in response:
+            raise RpcError(response["error"])
+        return response["result"]
+
+    def _probe(self, method: str, params: list):
+        """Every Nth read also goes to the worst endpoint, its answer unused"""
+        ranked = self.ranked()
+        if len(ranked) > 1 and next(self._reads) % PROBE_INTERVAL == 0:
+            self._pool.submit(ranked[-1].make_request, method, params, 0)
+
+    def _pinned_read(self, method: str, params: list) -> dict:
+        errors = []
+        for _ in self.clients:
+            client = self.pinned()
+            try:
+                return client.make_request(method, params)
+            except (RpcError, requests.RequestException) as e:
+                errors.append(e)
+            with self._pin_lock:
+                # Another thread may have moved the pin already
+                if self._pinned is client:
+                    others = [c for c in self.ranked() if c is not client]
+                    self._pinned = others[0] if others else client
+        raise RpcError(f"All endpoints failed for {method}: {errors}")
+
+    def _hedged(self, method: str, params: list) -> dict:
+        ranked = self.ranked()
+        pending, errors = set(), []
+        launched = 0
+
+        def launch():
+            nonlocal launched
+            client = ranked[launched]
+            pending.add(self._pool.submit(client.make_request, method, params, 0))
+            launched += 1
+
+        launch()
+        while pending:
+            more = launched < len(ranked)
+            timeout = ranked[launched - 1].metrics.hedge_delay() if more else None
+            done, _ = wait(set(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                try:
+                    return future.result()
+                except (RpcError, requests.RequestException) as e:
+                    errors.append(e)
+            # Either the last endpoint is slower than its p95 (hedge) or a
+            # request failed (fail over), both mean asking the next one
+            if more:
+                launch()
+        raise RpcError(f"All endpoints failed for {method}: {errors}")
+
+    def _broadcast(self, method: str, params: list) -> dict:
+        futures = [self._pool.submit(c.make_request, method, params, 0) for c in self.clients]
+        responses = []
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except (RpcError, requests.RequestException):
+                continue
+            # Other endpoints may answer "already known" once one accepted it
+            if "result" in response:
+                return response
+            responses.append(response)
+        if responses:
+            return responses[0]
+        raise RpcError(f"Broadcast failed on every endpoint: {self.urls}")
+
+
+class AsyncRpcClient:
+    """asyncio counterpart of RpcClient on a pooled aiohttp session"""
+
+    def __init__(self, url: str, max_concurrency: int = MAX_CONCURRENCY, retries: int = RETRIES, timeout: float = TIMEOUT):
+        self.url = url
+        self.retries = retries
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.metrics = EndpointMetrics()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._ids = itertools.count()
+        self._session = None
+
+    async def session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._session
+
+    async def post(self, payload) -> Any:
+        session = await self.session()
+        body = json.dumps(payload, cls=Web3JsonEncoder)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.metrics.retries += 1
+                await asyncio.sleep(min(0.25 * 2**attempt, 4.0))
+            start = time.perf_counter()
+            try:
+                async with self._slots:
+                    async with session.post(self.url, data=body) as response:
+                        status = response.status
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.metrics.record(time.perf_counter() - start, ok=False)
+                error = e
+                continue
+            ok = status not in RETRY_STATUSES
+            self.metrics.record(time.perf_counter() - start, ok=ok)
+            if ok:
+                return data
+            error = f"HTTP {status}"
+        raise RpcError(f"{self.url} failed after {self.retries + 1} attempts: {error}")
+
+    async def make_request(self, method: str, params: list) -> dict:
+        return await self.post({"jsonrpc": "2.0", "method": method, "params": params, "id": next(self._ids)})
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class PooledProvider(JSONBaseProvider):
+    """Web3 provider backed by a shared RpcClient or MultiEndpointClient"""
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def make_request(self, method, params):
+        return self.client.make_request(method, params)
+
+
+class AsyncPooledProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider backed by a shared AsyncRpcClient"""
+
+    def __init__(self, client: AsyncRpcClient):
+        super().__init__()
+        self.client = client
+
+    async def make_request(self, method, params):
+        return await self.client.make_request(method, params)
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        response = await self.make_request("web3_clientVersion", [])
+        return "result" in response
+
+
+_clients: Dict[str, RpcClient] = {}
+_multi_clients: Dict[tuple, MultiEndpointClient] = {}
+_async_clients: Dict[str, AsyncRpcClient] = {}
+_registry_lock = threading.RLock()
+
+
+def get_client(url: str) -> RpcClient:
+    """The process-wide client for url"""
+    with _registry_lock:
+        if url not in _clients:
+            _clients[url] = RpcClient(url)
+        return _clients[url]
+
+
+def endpoints(value: Union[str, List[str]]) -> List[str]:
+    """Endpoint list from a comma separated *_RPC value"""
+    if isinstance(value, str):
+        value = value.split(",")
+    return [url.strip() for url in value if url.strip()]
+
+
+def get_multi_client(urls: Union[str, List[str]]) -> MultiEndpointClient:
+    """The process-wide client for a set of endpoints of one chain"""
+    key = tuple(endpoints(urls))
+    with _registry_lock:
+        if key not in _multi_clients:
+            _multi_clients[key] = MultiEndpointClient(list(key))
+    return _multi_clients[key]
+
+
+def get_async_client(url: str) -> AsyncRpcClient:
+    if url not in _async_clients:
+        _async_clients[url] = AsyncRpcClient(url)
+    return _async_clients[url]
+
+
+def make_web3(urls: Union[str, List[str]]) -> Web3:
+    """Web3 on the shared pooled connections, hedged when given several endpoints"""
+    urls = endpoints(urls)
+    if len(urls) == 1:
+        return Web3(PooledProvider(get_client(urls[0])))
+    return Web3(PooledProvider(get_multi_client(urls)))
+
+
+def make_async_web3(url: str) -> AsyncWeb3:
+    return AsyncWeb3(AsyncPooledProvider(get_async_client(url)))
+
+
+async def close_async_clients():
+    for client in _async_clients.values():
+        await client.close()
+
+
+def print_metrics():
+    """Per-endpoint request stats of everything this process sent"""
+    clients = list(_clients.values()) + list(_async_clients.values())
+    if not clients:
+        return
+    print("\n📡 RPC endpoints:")
+    for client in clients:
+        print(f"  {client.url}: {client.metrics.summary()}")
@@ -0,0 +1,368 @@
+import argparse
+import json
+import os
+import subprocess
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+TRACE_PATH = ROOT / "cache" / "simulator" / "trace.json"
+
+MASK32 = np.uint64(0xFFFFFFFF)
+TWO_64 = 2.0**64
+
+# Operation codes shared with test/EulerVaultMock.t.sol::test_SimulatorParity
+VAULT_DEPOSIT, VAULT_WITHDRAW, OTHER_DEPOSIT, OTHER_WITHDRAW, YIELD = range(5)
+
+
+def _mul_wide(a: np.ndarray, b: np.ndarray):
+    """Full 128-bit product of two uint64 arrays as (hi, lo) limbs"""
+    a_lo, a_hi = a & MASK32, a >> np.uint64(32)
+    b_lo, b_hi = b & MASK32, b >> np.uint64(32)
+    ll = a_lo * b_lo
+    lh = a_lo * b_hi
+    hl = a_hi * b_lo
+    mid = (ll >> np.uint64(32)) + (lh & MASK32) + (hl & MASK32)
+    lo = (ll & MASK32) | ((mid & MASK32) << np.uint64(32))
+    hi = a_hi * b_hi + (lh >> np.uint64(32)) + (hl >> np.uint64(32)) + (mid >> np.uint64(32))
+    return hi, lo
+
+
+def mul_div(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Exact floor(a * b / c) on uint64 arrays, like Solidity's (a * b) / c
+
+    Inputs and result must stay below 2**63. Products that fit in 64 bits are
+    divided directly; wider ones start from a float estimate that is corrected
+    with the exact 128-bit remainder until it is the true floor. Raises
+    OverflowError when a wide quotient would not fit below 2**63.
+    """
+    a, b, c = np.broadcast_arrays(*(np.asarray(x, dtype=np.uint64) for x in (a, b, c)))
+    p_hi, p_lo = _mul_wide(a, b)
+    narrow = p_hi == 0
+    q = np.where(narrow, p_lo // c, np.uint64(0))
+    wide = ~narrow
+    if not wide.any():
+        return q
+
+    ph, pl, cw = p_hi[wide], p_lo[wide], c[wide]
+    # a * b >= c * 2**63 exactly when the quotient needs the sign bit
+    c_hi, c_lo = cw >> np.uint64(1), (cw & np.uint64(1)) << np.uint64(63)
+    if ((ph > c_hi) | ((ph == c_hi) & (pl >= c_lo))).any():
+        raise OverflowError("mul_div quotient does not fit below 2**63")
+    cf = cw.astype(np.float64)
+    estimate = (ph.astype(np.float64) * TWO_64 + pl.astype(np.float64)) / cf
+    qw = np.minimum(estimate, 2.0**63 - 1).astype(np.uint64)
+    while True:
+        q_hi, q_lo = _mul_wide(qw, cw)
+        d_lo = pl - q_lo
+        d_hi = ph - q_hi - (pl < q_lo).astype(np.uint64)
+        negative = (d_hi >> np.uint64(63)) == 1
+        too_small = ~negative & ((d_hi > 0) | (d_lo >= cw))
+        if not (negative.any() or too_small.any()):
+            break
+        # Magnitude of the remainder, two's complement negated when below zero
+        m_lo = np.where(negative, ~d_lo + np.uint64(1), d_lo)
+        m_hi = np.where(negative, ~d_hi + (m_lo == 0).astype(np.uint64), d_hi)
+        step = np.floor((m_hi.astype(np.float64) * TWO_64 + m_lo.astype(np.float64)) / cf)
+        step = np.maximum(step, 1.0).astype(np.uint64)
+        qw = np.where(negative, qw - step, np.where(too_small, qw + step, qw))
+    q[wide] = qw
+    return q
+
+
+class ParameterGrid:
+    """Cartesian product of policy and market parameters, one lane per combination"""
+
+    def __init__(self, **values):
+        self.names = list(values)
+        combos = list(product(*values.values()))
+        self.lanes = len(combos)
+        for i, name in enumerate(self.names):
+            setattr(self, name, np.array([combo[i] for combo in combos]))
+
+    def row(self, lane: int) -> dict:
+        return {name: getattr(self, name)[lane].item() for name in self.names}
+
+
+class Simulation:
+    """TelepayVault + EulerVaultMock balances for many parameter sets at once
+
+    Every lane holds its own vault and Euler vault. The Euler share math
+    mirrors EulerVaultMock.deposit/withdraw, withdrawals uninvest their
+    shortfall like TelepayVault.handleReceiveMessage, and the keeper policy
+    is a vectorized script/keeper.py::plan.
+    """
+
+    def __init__(
+        self,
+        grid: ParameterGrid,
+        lookback: int,
+        horizon: int,
+        keeper_interval: int = 1,
+        seed: int = 0,
+        sample: int = 0,
+    ):
+        self.grid = grid
+        self.lookback = lookback
+        self.horizon = horizon
+        self.keeper_interval = keeper_interval
+        self.buffer = grid.buffer.astype(np.uint64)
+        self.min_action = grid.min_action.astype(np.uint64)
+        self.rng = np.random.default_rng(seed)
+
+        n = grid.lanes
+        zeros = lambda: np.zeros(n, dtype=np.uint64)
+        self.idle = zeros()
+        self.assets = zeros()  # underlying.balanceOf(eulerVault)
+        self.total_shares = zeros()
+        self.vault_shares = zeros()
+        self.other_shares = zeros()  # every other Euler depositor, pooled
+        self.outflows = np.zeros((lookback, n), dtype=np.uint64)
+
+        self.failed_withdrawals = np.zeros(n, dtype=np.int64)
+        self.transactions = np.zeros(n, dtype=np.int64)
+        self.idle_sum = np.zeros(n, dtype=np.float64)
+        self.net_inflow = np.zeros(n, dtype=np.float64)
+        self.operations = 0
+
+        self.sample = self.rng.choice(n, size=min(sample, n), replace=False)
+        self.traces = {int(lane): [] for lane in self.sample}
+
+    def _record(self, op: int, mask: np.ndarray, amount: np.ndarray):
+        for lane in self.sample[mask[self.sample]]:
+            self.traces[int(lane)].append(
+                (op, int(amount[lane]), int(self.total_shares[lane]), int(self.vault_shares[lane]))
+            )
+
+    def deposit(self, holder: np.ndarray, mask: np.ndarray, amount: np.ndarray, op: int) -> np.ndarray:
+        """EulerVaultMock.deposit for the lanes in mask, returns which succeeded"""
+        self.operations += int(mask.sum())
+        # Shares are priced against the balance before the transfer, and a
+        # drained vault with outstanding shares divides by zero
+        mask = mask & (amount > 0) & ~((self.total_shares > 0) & (self.assets == 0))
+        minted = np.where(
+            self.total_shares == 0,
+            amount,
+            mul_div(amount, self.total_shares, np.maximum(self.assets, 1)),
+        )
+        minted = np.where(mask, minted, 0).astype(np.uint64)
+        holder += minted
+        self.total_shares += minted
+        self.assets += np.where(mask, amount, 0).astype(np.uint64)
+        self._record(op, mask, amount)
+        return mask
+
+    def withdraw(self, holder: np.ndarray, mask: np.ndarray, amount: np.ndarray, op: int) -> np.ndarray:
+        """EulerVaultMock.withdraw for the lanes in mask, returns which succeeded"""
+        self.operations += int(mask.sum())
+        mask = mask & (amount > 0) & (self.assets > 0) & (amount <= self.assets)
+        burned = mul_div(amount, self.total_shares, np.maximum(self.assets, 1))
+        mask &= holder >= burned
+        burned = np.where(mask, burned, 0).astype(np.uint64)
+        holder -= burned
+        self.total_shares -= burned
+        self.assets -= np.where(mask, amount, 0).astype(np.uint64)
+        self._record(op, mask, amount)
+        return mask
+
+    def invested(self) -> np.ndarray:
+        """Vault shares valued in underlying, like keeper.invested_assets"""
+        return np.where(
+            self.vault_shares == 0,
+            0,
+            mul_div(self.vault_shares, self.assets, np.maximum(self.total_shares, 1)),
+        ).astype(np.uint64)
+
+    def _draw(self, probability, mean) -> np.ndarray:
+        n = self.grid.lanes
+        hit = self.rng.random(n) < probability
+        return np.where(hit, self.rng.exponential(mean, n), 0).astype(np.uint64)
+
+    def keeper_tick(self):
+        """Vectorized keeper.plan: at most one invest or uninvest per lane"""
+        predicted = np.maximum(
+            self.outflows.sum(axis=0) * np.uint64(self.horizon) // np.uint64(self.lookback),
+            self.outflows.max(axis=0),
+        )
+        target = self.buffer + predicted
+        tolerance = np.floor(target.astype(np.float64) * self.grid.band).astype(np.uint64)
+        invested = self.invested()
+
+        low = (self.idle + tolerance < target) | (self.idle < predicted)
+        high = ~low & (self.idle > target + tolerance)
+        uninvest_amount = np.minimum(np.where(low, target - self.idle, 0), invested)
+        invest_amount = np.where(high, self.idle - target, 0).astype(np.uint64)
+
+        do_uninvest = low & (uninvest_amount >= self.min_action)
+        ok = self.withdraw(self.vault_shares, do_uninvest, uninvest_amount, VAULT_WITHDRAW)
+        self.idle += np.where(ok, uninvest_amount, 0).astype(np.uint64)
+
+        do_invest = high & (invest_amount >= self.min_action)
+        ok_invest = self.deposit(self.vault_shares, do_invest, invest_amount, VAULT_DEPOSIT)
+        self.idle -= np.where(ok_invest, invest_amount, 0).astype(np.uint64)
+
+        self.transactions += ok | ok_invest
+
+    def step(self, step: int):
+        g = self.grid
+
+        # Yield accrues to the Euler vault's balance
+        accrued = mul_div(self.assets, g.yield_ppm.astype(np.uint64), 1_000_000)
+        self.assets += accrued
+        self._record(YIELD, accrued > 0, accrued)
+
+        # Third-party Euler depositors moving the share price around us
+        everyone = np.ones(g.lanes, dtype=bool)
+        self.deposit(self.other_shares, everyone, self._draw(0.3, g.deposit_mean), OTHER_DEPOSIT)
+        other_value = mul_div(self.other_shares, self.assets, np.maximum(self.total_shares, 1))
+        self.withdraw(
+            self.other_shares,
+            everyone,
+            np.minimum(self._draw(0.3, g.deposit_mean), other_value),
+            OTHER_WITHDRAW,
+        )
+
+        # Telepay deposits minted to the vault, then withdrawals burned from it
+        inflow = self._draw(g.inflow_rate, g.deposit_mean)
+        self.idle += inflow
+        withdrawal = self._draw(g.outflow_rate, g.withdrawal_mean)
+        wants = withdrawal > 0
+        shortfall = np.where(wants & (self.idle < withdrawal), withdrawal - self.idle, 0).astype(np.uint64)
+        pulled = self.withdraw(self.vault_shares, shortfall > 0, shortfall, VAULT_WITHDRAW)
+        self.idle += np.where(pulled, shortfall, 0).astype(np.uint64)
+        served = wants & ((shortfall == 0) | pulled)
+        self.idle -= np.where(served, withdrawal, 0).astype(np.uint64)
+        self.failed_withdrawals += wants & ~served
+        self.operations += 2 * g.lanes
+
+        self.outflows[step % self.lookback] = np.where(served, withdrawal, 0)
+        self.net_inflow += inflow.astype(np.float64) - np.where(served, withdrawal, 0)
+
+        if step % self.keeper_interval == 0:
+            self.keeper_tick()
+        self.idle_sum += self.idle.astype(np.float64)
+
+    def run(self, steps: int) -> float:
+        start = time.perf_counter()
+        for step in range(steps):
+            self.step(step)
+        return time.perf_counter() - start
+
+    def report(self, steps: int, top: int = 10) -> list:
+        """Parameter sets ranked by failed withdrawals, then capital left idle"""
+        total = self.idle.astype(np.float64) + self.invested().astype(np.float64)
+        idle_share = self.idle_sum / steps / np.maximum(total, 1)
+        order = np.lexsort((self.transactions, idle_share, self.failed_withdrawals))
+        rows = []
+        for lane in order[:top]:
+            rows.append(
+                {
+                    **self.grid.row(lane),
+                    "failed_withdrawals": int(self.failed_withdrawals[lane]),
+                    "transactions": int(self.transactions[lane]),
+                    "avg_idle_share": round(float(idle_share[lane]), 4),
+                    "yield": int(total[lane] - self.net_inflow[lane]),
+                }
+            )
+        return rows
+
+    def write_traces(self, path: Path):
+        """Dump the sampled lanes' Euler calls for the Solidity parity test"""
+        traces = []
+        for ops in self.traces.values():
+            columns = list(zip(*ops)) if ops else [[], [], [], []]
+            traces.append(
+                {
+                    "ops": list(columns[0]),
+                    "amounts": list(columns[1]),
+                    "totalShares": list(columns[2]),
+                    "vaultShares": list(columns[3]),
+                }
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traces": traces}, f)
+
+
+def check_against_solidity(path: Path) -> bool:
+    """Replay the sampled traces on EulerVaultMock with forge"""
+    env = os.environ.copy()
+    env["SIMULATOR_TRACE"] = str(path.relative_to(ROOT))
+    result = subprocess.run(
+        ["forge", "test", "--match-test", "test_SimulatorParity", "-vv"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stdout[-4000:])
+    return result.returncode == 0
+
+
+def parse_list(value: str, cast=float) -> list:
+    return [cast(float(v)) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simulate TelepayVault liquidity policies over EulerVaultMock share math"
+    )
+    parser.add_argument("--steps", type=int, default=24 * 30 * 6, help="Hourly steps")
+    parser.add_argument("--buffers", default="250e6,1000e6,5000e6")
+    parser.add_argument("--bands", default="0.1,0.25,0.5")
+    parser.add_argument("--min-actions", default="50e6,200e6")
+    parser.add_argument("--yield-ppm", default="1,5")
+    parser.add_argument("--inflow-rates", default="0.2,0.5")
+    parser.add_argument("--outflow-rates", default="0.2,0.5")
+    parser.add_argument("--deposit-mean", type=float, default=500e6)
+    parser.add_argument("--withdrawal-mean", type=float, default=400e6)
+    parser.add_argument("--keeper-interval", type=int, default=1)
+    parser.add_argument("--lookback", type=int, default=24)
+    parser.add_argument("--horizon", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replicas", type=int, default=1, help="Lanes per parameter set")
+    parser.add_argument("--check", type=int, default=0, help="Lanes to verify with forge")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = ParameterGrid(
+        buffer=parse_list(args.buffers, int),
+        band=parse_list(args.bands),
+        min_action=parse_list(args.min_actions, int),
+        yield_ppm=parse_list(args.yield_ppm, int),
+        inflow_rate=parse_list(args.inflow_rates),
+        outflow_rate=parse_list(args.outflow_rates),
+        deposit_mean=[args.deposit_mean],
+        withdrawal_mean=[args.withdrawal_mean],
+        replica=list(range(args.replicas)),
+    )
+
+    sim = Simulation(
+        grid,
+        args.lookback,
+        args.horizon,
+        keeper_interval=args.keeper_interval,
+        seed=args.seed,
+        sample=args.check,
+    )
+    print(f"🧮 Simulating {grid.lanes} parameter sets over {args.steps} steps...")
+    elapsed = sim.run(args.steps)
+    print(
+        f"✅ {sim.operations:,} operations in {elapsed:.2f}s "
+        f"({sim.operations / elapsed:,.0f} ops/s)"
+    )
+
+    print("\n📋 Best parameter sets:")
+    for row in sim.report(args.steps, args.top):
+        print("  " + ", ".join(f"{k}={v}" for k, v in row.items()))
+
+    if args.check:
+        sim.write_traces(TRACE_PATH)
+        print(f"\n🔍 Checking {args.check} sampled lanes against EulerVaultMock...")
+        if not check_against_solidity(TRACE_PATH):
+            raise SystemExit("❌ Simulator diverged from EulerVaultMock")
+        print("✅ Simulator matches EulerVaultMock")
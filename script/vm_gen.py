@@ -0,0 +1,602 @@
+import argparse
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib import error, request
+
+ROOT = Path(__file__).resolve().parent.parent
+FORGE_STD = ROOT / "lib" / "forge-std"
+VM_SCRIPT = FORGE_STD / "scripts" / "vm.py"
+OUT_PATH = FORGE_STD / "src" / "Vm.sol"
+
+# Cheatcodes left out of Vm.sol
+HIDDEN_STATUSES = frozenset(["experimental", "internal"])
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "forge-std"
+
+
+def load_vm():
+    """forge-std's scripts/vm.py, whose models and printer are reused as they are"""
+    spec = importlib.util.spec_from_file_location("forge_std_vm", VM_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+vm = load_vm()
+
+
+class PartsPrinter(vm.CheatcodesPrinter):
+    """CheatcodesPrinter collecting its output in a list
+
+    The upstream printer grows one string, which is quadratic over the
+    whole of Vm.sol. It also gains `take` and `p_interface`, so an interface
+    can be rendered section by section.
+    """
+
+    @property
+    def buffer(self) -> str:
+        return "".join(self._parts)
+
+    @buffer.setter
+    def buffer(self, value: str):
+        self._parts = [value] if value else []
+
+    def take(self) -> str:
+        ret = self.buffer
+        self._parts = []
+        return ret
+
+    def p_interface(self, name: str, inherits: str, body: Callable[[], None]):
+        """p_contract with the items replaced by body"""
+        self._p_str("interface ")
+        name = name.strip()
+        if name != "":
+            self._p_str(name)
+            self._p_str(" ")
+        if inherits != "":
+            self._p_str("is ")
+            self._p_str(inherits)
+            self._p_str(" ")
+        self._p_str("{")
+        self._p_nl()
+        body()
+        self._p_str("}")
+        self._p_nl()
+
+    def _p_indent(self):
+        self._p_str(self._indent_str * self.indent_level)
+
+    def _p_str(self, txt: str):
+        self._parts.append(txt)
+
+
+# The models of vm.py as frozen, slotted dataclasses: no per-instance
+# __dict__, and nothing can change them once loaded, so they are shared
+# between VmSafe and Vm instead of copied. The printer only reads their
+# attributes, so it takes them in place of vm.py's classes.
+
+
+@dataclass(frozen=True)
+class Function:
+    __slots__ = (
+        "id",
+        "description",
+        "declaration",
+        "visibility",
+        "mutability",
+        "signature",
+        "selector",
+        "selector_bytes",
+    )
+    id: str
+    description: str
+    declaration: str
+    visibility: "vm.Visibility"
+    mutability: "vm.Mutability"
+    signature: str
+    selector: str
+    selector_bytes: bytes
+
+    @staticmethod
+    def from_dict(d: dict) -> "Function":
+        return Function(
+            d["id"],
+            d["description"],
+            d["declaration"],
+            vm.Visibility(d["visibility"]),
+            vm.Mutability(d["mutability"]),
+            d["signature"],
+            d["selector"],
+            bytes(d["selectorBytes"]),
+        )
+
+
+@dataclass(frozen=True)
+class Cheatcode:
+    __slots__ = ("func", "group", "status", "safety")
+    func: Function
+    group: str
+    status: str
+    safety: str
+
+    @staticmethod
+    def from_dict(d: dict) -> "Cheatcode":
+        # Deprecated cheatcodes have an object as their status, kept as
+        # vm.Cheatcode.from_dict keeps it
+        return Cheatcode(Function.from_dict(d["func"]), str(d["group"]), str(d["status"]), str(d["safety"]))
+
+
+@dataclass(frozen=True)
+class Error:
+    __slots__ = ("name", "description", "declaration")
+    name: str
+    description: str
+    declaration: str
+
+    @staticmethod
+    def from_dict(d: dict) -> "Error":
+        return Error(**d)
+
+
+@dataclass(frozen=True)
+class Event:
+    __slots__ = ("name", "description", "declaration")
+    name: str
+    description: str
+    declaration: str
+
+    @staticmethod
+    def from_dict(d: dict) -> "Event":
+        return Event(**d)
+
+
+@dataclass(frozen=True)
+class EnumVariant:
+    __slots__ = ("name", "description")
+    name: str
+    description: str
+
+
+@dataclass(frozen=True)
+class Enum:
+    __slots__ = ("name", "description", "variants")
+    name: str
+    description: str
+    variants: Tuple[EnumVariant, ...]
+
+    @staticmethod
+    def from_dict(d: dict) -> "Enum":
+        return Enum(d["name"], d["description"], tuple(EnumVariant(**v) for v in d["variants"]))
+
+
+@dataclass(frozen=True)
+class StructField:
+    __slots__ = ("name", "ty", "description")
+    name: str
+    ty: str
+    description: str
+
+
+@dataclass(frozen=True)
+class Struct:
+    __slots__ = ("name", "description", "fields")
+    name: str
+    description: str
+    fields: Tuple[StructField, ...]
+
+    @staticmethod
+    def from_dict(d: dict) -> "Struct":
+        return Struct(d["name"], d["description"], tuple(StructField(**f) for f in d["fields"]))
+
+
+@dataclass(frozen=True)
+class Cheatcodes:
+    __slots__ = ("errors", "events", "enums", "structs", "cheatcodes")
+    errors: Tuple[Error, ...]
+    events: Tuple[Event, ...]
+    enums: Tuple[Enum, ...]
+    structs: Tuple[Struct, ...]
+    cheatcodes: Tuple[Cheatcode, ...]
+
+    @staticmethod
+    def from_dict(d: dict, skip_statuses: frozenset = frozenset()) -> "Cheatcodes":
+        """Skips cheatcodes with a status in skip_statuses before building them"""
+        return Cheatcodes(
+            errors=tuple(Error.from_dict(e) for e in d["errors"]),
+            events=tuple(Event.from_dict(e) for e in d["events"]),
+            enums=tuple(Enum.from_dict(e) for e in d["enums"]),
+            structs=tuple(Struct.from_dict(e) for e in d["structs"]),
+            cheatcodes=tuple(
+                Cheatcode.from_dict(e) for e in d["cheatcodes"] if str(e["status"]) not in skip_statuses
+            ),
+        )
+
+
+def load_cheatcodes(d: dict, skip_statuses: frozenset = frozenset()) -> Cheatcodes:
+    """Cheatcodes.from_dict, skipping hidden cheatcodes before they are built
+
+    Statuses are compared as Cheatcode.from_dict stores them: deprecated
+    cheatcodes have an object as their status in the json.
+    """
+    return Cheatcodes.from_dict(d, skip_statuses)
+
+
+def split_by_safety(cheatcodes: list) -> Tuple[list, list]:
+    """Visible cheatcodes split into (safe, unsafe) in one pass, without copying them"""
+    split = {"safe": [], "unsafe": []}
+    for cc in cheatcodes:
+        if cc.status not in HIDDEN_STATUSES:
+            split[cc.safety].append(cc)
+    return split["safe"], split["unsafe"]
+
+
+def cheatcode_key(cc) -> Tuple[str, str, str, str]:
+    """vm.cmp_cheatcode as a sort key"""
+    return (cc.group, cc.status, cc.safety, cc.func.id)
+
+
+def with_group_header(cheats: list) -> list:
+    """vm.prefix_with_group_headers for one group, building the header
+    instead of deep copying the first cheatcode"""
+    first = cheats[0]
+    func = first.func
+    header = Function(
+        func.id,
+        "",
+        f"// ======== {vm.group(first.group)} ========",
+        func.visibility,
+        func.mutability,
+        func.signature,
+        func.selector,
+        func.selector_bytes,
+    )
+    return [Cheatcode(header, first.group, first.status, first.safety)] + cheats
+
+
+def calldata_compat(out: str) -> str:
+    # Compatibility with <0.8.0
+    def memory_to_calldata(m: re.Match) -> str:
+        return " calldata " + m.group(1)
+
+    return re.sub(r" memory (.*returns)", memory_to_calldata, out)
+
+
+def fingerprints(d: dict) -> Dict[str, str]:
+    """Hash of the json behind every section, keyed by cheatcode id or "types" """
+
+    def digest(value) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+    hashes = {cc["func"]["id"]: digest(cc) for cc in d["cheatcodes"]}
+    hashes["types"] = digest([d["events"], d["enums"], d["structs"]])
+    return hashes
+
+
+class FragmentCache:
+    """Rendered sections of an output file, reused while their json is unchanged
+
+    A section's hash covers the json of everything in it and the source of
+    this script and of vm.py, so any change to either re-renders it. The
+    previous hashes of every cheatcode are kept to report what changed in
+    each section.
+    """
+
+    def __init__(self, cache_dir: Path, out_path: Path, hashes: Dict[str, str]):
+        self.path = cache_dir / "fragments.json"
+        self.key = str(Path(out_path).resolve())
+        self.hashes = hashes
+        self.generator = hashlib.sha256(
+            Path(__file__).read_bytes() + VM_SCRIPT.read_bytes()
+        ).hexdigest()
+        self.all = json.loads(self.path.read_text()) if self.path.exists() else {}
+        previous = self.all.get(self.key, {})
+        self.previous = previous.get("sections", {}) if previous.get("generator") == self.generator else {}
+        self.sections = {}
+        self.rendered = 0
+
+    def render(self, key: str, ids: List[str], render: Callable[[], str]) -> str:
+        members = {i: self.hashes[i] for i in ids}
+        digest = hashlib.sha256(json.dumps(members).encode()).hexdigest()
+        cached = self.previous.get(key)
+        if cached is not None and cached["hash"] == digest:
+            text = cached["text"]
+        else:
+            text = render()
+            self.rendered += 1
+        self.sections[key] = {"hash": digest, "members": members, "text": text}
+        return text
+
+    def report(self) -> str:
+        if not self.previous:
+            return f"{len(self.sections)} sections rendered, no previous run to compare with"
+        lines = []
+        unchanged = 0
+        for key in sorted(self.previous.keys() | self.sections.keys()):
+            old = self.previous.get(key)
+            new = self.sections.get(key)
+            if old is None:
+                lines.append(f"  {key}: added ({len(new['members'])} items)")
+            elif new is None:
+                lines.append(f"  {key}: removed ({len(old['members'])} items)")
+            elif old["hash"] != new["hash"]:
+                before, after = old["members"], new["members"]
+                changes = [f"+{i}" for i in after if i not in before]
+                changes += [f"-{i}" for i in before if i not in after]
+                changes += [f"~{i}" for i in after if i in before and before[i] != after[i]]
+                lines.append(f"  {key}: changed ({', '.join(changes)})")
+            else:
+                unchanged += 1
+        total = len(self.sections)
+        head = f"{self.rendered} of {total} sections re-rendered, {unchanged} unchanged"
+        return "\n".join([head] + lines)
+
+    def save(self):
+        self.all[self.key] = {"generator": self.generator, "sections": self.sections}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.all))
+
+
+class JsonCache:
+    """Downloaded files kept on disk and revalidated with their ETag"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def path(self, url: str) -> Path:
+        return self.cache_dir / url.rsplit("/", 1)[-1]
+
+    def get(self, url: str, offline: bool = False) -> str:
+        body_path = self.path(url)
+        etag_path = body_path.with_name(body_path.name + ".etag")
+        cached = body_path.read_text() if body_path.exists() else None
+        if offline:
+            if cached is None:
+                raise FileNotFoundError(f"--offline but {body_path} is not cached yet")
+            return cached
+
+        req = request.Request(url)
+        if cached is not None and etag_path.exists():
+            req.add_header("If-None-Match", etag_path.read_text())
+        try:
+            with request.urlopen(req) as res:
+                body = res.read().decode("utf-8")
+                etag = res.headers.get("ETag")
+        except error.HTTPError as e:
+            if e.code == 304:
+                return cached
+            raise
+        except error.URLError as e:
+            if cached is None:
+                raise
+            print(f"Could not fetch {url} ({e.reason}), using the cached copy", file=sys.stderr)
+            return cached
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        body_path.write_text(body)
+        if etag:
+            etag_path.write_text(etag)
+        elif etag_path.exists():
+            etag_path.unlink()
+        return body
+
+
+class OutputStamps:
+    """Hashes of the last generated output and of the formatted file it became
+
+    `forge fmt` rewrites the generated text, so the file on disk can't be
+    compared with a fresh generation directly. If the generated text and the
+    file are both unchanged since the last run, writing and formatting again
+    would produce the exact same bytes.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.path = cache_dir / "outputs.json"
+        self.stamps = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    @staticmethod
+    def _file_hash(out_path: Path) -> Optional[str]:
+        return hashlib.sha256(out_path.read_bytes()).hexdigest() if out_path.exists() else None
+
+    def is_current(self, out_path: Path, generated: str) -> bool:
+        file_hash = self._file_hash(out_path)
+        if file_hash is None:
+            return False
+        generated_hash = hashlib.sha256(generated.encode()).hexdigest()
+        if file_hash == generated_hash:
+            return True
+        stamp = self.stamps.get(str(out_path.resolve()))
+        return stamp == {"generated": generated_hash, "formatted": file_hash}
+
+    def record(self, out_path: Path, generated: str):
+        self.stamps[str(out_path.resolve())] = {
+            "generated": hashlib.sha256(generated.encode()).hexdigest(),
+            "formatted": self._file_hash(out_path),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.stamps, indent=2))
+
+
+def render_interface(
+    pp: PartsPrinter,
+    name: str,
+    inherits: str,
+    types: Optional[Cheatcodes],
+    cheatcodes: list,
+    fragments: Optional[FragmentCache],
+) -> str:
+    """Render one interface section by section, reusing cached unchanged sections
+
+    Sections are the type declarations and each group of cheatcodes (the ones
+    `prefix_with_group_headers` gives a header). They always end on a line
+    boundary, so rendering them separately gives the same text as rendering
+    the interface at once.
+    """
+    sections = []
+    if types is not None:
+        sections.append((f"{name}/types", ["types"], lambda: pp._p_items(types)))
+    for grp, ccs in itertools.groupby(cheatcodes, key=lambda cc: cc.group):
+        ccs = list(ccs)
+        ids = [cc.func.id for cc in ccs]
+        sections.append((f"{name}/{grp}", ids, lambda ccs=ccs: pp.p_functions(with_group_header(ccs))))
+
+    def body():
+        opening = pp.take()
+        texts = []
+        for key, ids, render in sections:
+
+            def render_section(render=render) -> str:
+                pp._with_indent(render)
+                return calldata_compat(pp.take())
+
+            if fragments is None:
+                texts.append(render_section())
+            else:
+                texts.append(fragments.render(key, ids, render_section))
+        pp._p_str(opening + "".join(texts))
+
+    pp.p_interface(name, inherits, body)
+    return pp.finish()
+
+
+def generate(contract: Cheatcodes, fragments: Optional[FragmentCache] = None) -> str:
+    """The same Vm.sol text as vm.py, before `forge fmt`"""
+    safe, unsafe = split_by_safety(contract.cheatcodes)
+    safe.sort(key=cheatcode_key)
+    unsafe.sort(key=cheatcode_key)
+
+    out = ["// Automatically @generated by scripts/vm.py. Do not modify manually.\n\n"]
+
+    pp = PartsPrinter(
+        spdx_identifier="MIT OR Apache-2.0",
+        solidity_requirement=">=0.6.2 <0.9.0",
+        abicoder_pragma=True,
+    )
+    pp.p_prelude()
+    pp.prelude = False
+    out.append(pp.finish())
+
+    out.append("\n\n")
+    out.append(vm.VM_SAFE_DOC)
+    safe_types = Cheatcodes(
+        # TODO: Custom errors were introduced in 0.8.4
+        errors=(),  # contract.errors
+        events=contract.events,
+        enums=contract.enums,
+        structs=contract.structs,
+        cheatcodes=(),
+    )
+    out.append(render_interface(pp, "VmSafe", "", safe_types, safe, fragments))
+
+    out.append("\n\n")
+    out.append(vm.VM_DOC)
+    out.append(render_interface(pp, "Vm", "VmSafe", None, unsafe, fragments))
+
+    return "".join(out)
+
+
+def model_bytes(load: Callable[[], object]) -> int:
+    """Memory held by what load returns"""
+    tracemalloc.start()
+    try:
+        loaded = load()  # held until measured
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(json_str: str, iterations: int):
+    """Time every stage of a full, uncached generation
+
+    vm.py's own load and filter are timed alongside, over the same parsed
+    json, for comparison with the slotted models.
+    """
+    stages = ("load", "filter", "sort", "generate", "vm.py load", "vm.py filter")
+    timings = {stage: [] for stage in stages}
+    for _ in range(iterations):
+        d = json.loads(json_str)
+        t0 = time.perf_counter()
+        contract = load_cheatcodes(d, HIDDEN_STATUSES)
+        t1 = time.perf_counter()
+        safe, unsafe = split_by_safety(contract.cheatcodes)
+        t2 = time.perf_counter()
+        safe.sort(key=cheatcode_key)
+        unsafe.sort(key=cheatcode_key)
+        t3 = time.perf_counter()
+        generate(contract)
+        t4 = time.perf_counter()
+        upstream = vm.Cheatcodes.from_dict(d)
+        t5 = time.perf_counter()
+        visible = [cc for cc in upstream.cheatcodes if cc.status not in HIDDEN_STATUSES]
+        [cc for cc in visible if cc.safety == "safe"], [cc for cc in visible if cc.safety == "unsafe"]
+        t6 = time.perf_counter()
+        for stage, elapsed in zip(timings, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+            timings[stage].append(elapsed * 1000)
+
+    print(f"{len(contract.cheatcodes)} cheatcodes, {iterations} runs")
+    for stage, samples in timings.items():
+        print(f"  {stage:<12} median {statistics.median(samples):8.3f} ms  min {min(samples):8.3f} ms")
+    total = sum(statistics.median(timings[stage]) for stage in stages[:4])
+    print(f"  {'total':<12} median {total:8.3f} ms")
+
+    d = json.loads(json_str)
+    slotted = model_bytes(lambda: load_cheatcodes(d, HIDDEN_STATUSES))
+    upstream = model_bytes(lambda: vm.Cheatcodes.from_dict(d))
+    print(f"  models       {slotted / 1024:8.1f} KiB, vm.py's {upstream / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate forge-std's Vm.sol like scripts/vm.py, with a download cache and incremental rendering"
+    )
+    parser.add_argument("--from", dest="path", help="Cheatcodes json generated by Foundry, instead of downloading it")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--offline", action="store_true", help="Use the cached cheatcodes json, don't fetch it")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Write and format Vm.sol even if it would not change")
+    parser.add_argument("--report", type=Path, help="Also write the per-group change report to this file")
+    parser.add_argument("--benchmark", metavar="N", type=int, help="Time every stage over N runs, without writing")
+    args = parser.parse_args()
+
+    if args.path is not None:
+        json_str = Path(args.path).read_text()
+    else:
+        json_str = JsonCache(args.cache_dir).get(vm.CHEATCODES_JSON_URL, offline=args.offline)
+
+    if args.benchmark is not None:
+        benchmark(json_str, args.benchmark)
+        raise SystemExit(0)
+
+    d = json.loads(json_str)
+    fragments = FragmentCache(args.cache_dir, args.out, fingerprints(d))
+    out = generate(load_cheatcodes(d, HIDDEN_STATUSES), fragments)
+
+    report = fragments.report()
+    print(report)
+    if args.report is not None:
+        args.report.write_text(report + "\n")
+
+    stamps = OutputStamps(args.cache_dir)
+    if not args.force and stamps.is_current(args.out, out):
+        fragments.save()
+        print(f"{args.out} is up to date")
+        raise SystemExit(0)
+
+    args.out.write_text(out)
+    # forge-std's foundry.toml holds the formatter settings
+    subprocess.run(["forge", "fmt", str(args.out.resolve())], cwd=FORGE_STD, check=True)
+
+    stamps.record(args.out, out)
+    fragments.save()
+    print(f"Wrote to {args.out}")
@@ -2,33 +2,259 @@
 pragma solidity ^0.8.13;
 
 import "@openzeppelin/contracts/utils/cryptography/ECDSA.sol";
+import "@openzeppelin/contracts/utils/cryptography/Hashes.sol";
+import "@openzeppelin/contracts/utils/cryptography/MerkleProof.sol";
+import "@openzeppelin/contracts/utils/cryptography/MessageHashUtils.sol";
 import "./interfaces/IMessageHandler.sol";
 
 contract Telepay is IMessageHandler {
     using ECDSA for bytes32;
+    using MessageHashUtils for bytes32;
+
+    /// @notice A user-signed transfer settled as part of a batch
+    /// @dev signatureHash is keccak256 of the user's transfer signature, the
+    /// one transfer would take. The leaf commits to it so every settled
+    /// transfer is tied to the authorization it was settled with.
+    struct BatchTransfer {
+        uint256 amount;
+        uint256 nonce;
+        bytes sourcePubKey;
+        bytes targetPubKey;
+        bytes32 signatureHash;
+    }
+
+    uint32 public constant LOCAL_DOMAIN = 6; // Base domain ID
+
+    /// @notice Collects user-signed transfers and co-signs their batches
+    address public immutable OPERATOR;
 
     mapping(bytes => uint256) public balances;
 
-    event NativeTransfer(bytes fromPubKey, bytes toPubKey, uint256 amount);
+    /// @notice Used transfer nonces, 256 per word: bit `nonce & 0xff` of word
+    /// `nonce >> 8` for the keccak256 hash of the source public key
+    mapping(bytes32 => mapping(uint256 => uint256)) public nonceBitmap;
+
+    /// @notice Block at which each batch root was settled, 0 if it wasn't
+    mapping(bytes32 => uint256) public settledBatches;
+
+    /// @notice Set once a settled transfer is shown to lack a valid user
+    /// signature, batch settlement is disabled from then on
+    bool public batchesHalted;
+
+    /// @notice TelepayRouter on this chain, credits without a CCTP message
+    address public localRouter;
+
+    /// @dev Public keys are indexed by their keccak256 hash and repeated in
+    /// full in the data, so one key's history is a topic filter away
+    event NativeTransfer(
+        bytes32 indexed fromPubKeyHash,
+        bytes32 indexed toPubKeyHash,
+        bytes fromPubKey,
+        bytes toPubKey,
+        uint256 amount,
+        uint256 nonce
+    );
+    /// @param burnNonce Nonce of the CCTP burn on sourceDomain that backs the credit
+    event Credit(
+        bytes32 indexed pubKeyHash,
+        uint32 indexed sourceDomain,
+        bytes pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    );
+    event BatchSettled(bytes32 indexed root, uint256 count);
+    event UnauthorizedTransfer(bytes32 indexed root, bytes32 indexed leaf);
+    event LocalRouterSet(address indexed router);
+
+    constructor() {
+        OPERATOR = msg.sender;
+    }
 
     /// @notice Updates balances to reflect transfers between telegram users
     /// @param amount The amount to transfer between public keys
+    /// @param nonce Unordered nonce, any unused value is accepted so transfers
+    /// signed concurrently can be submitted in any order
     /// @param sourcePubKey The public key of the sender
     /// @param targetPubKey The public key of the recipient
-    /// @param signature Signature proving ownership of the source public key
+    /// @param signature Signature of transferDigest by the source public key
     function transfer(
         uint256 amount,
+        uint256 nonce,
         bytes calldata sourcePubKey,
         bytes calldata targetPubKey,
         bytes calldata signature
     ) external {
-        require(balances[sourcePubKey] >= amount, "Insufficient balance");
-        _verifySignature(amount, sourcePubKey, address(0), signature);
+        _verifySignature(amount, nonce, sourcePubKey, targetPubKey, signature);
+        _applyTransfer(amount, nonce, sourcePubKey, targetPubKey);
+    }
 
-        balances[sourcePubKey] -= amount;
-        balances[targetPubKey] += amount;
+    /// @notice Settles transfers the operator verified off-chain, with one
+    /// operator signature over their Merkle root instead of one user
+    /// signature per transfer
+    /// @dev Trust model: the operator signature alone authorizes the batch,
+    /// user signatures are only checked off-chain (script/batch.py). Each
+    /// leaf commits to the hash of its user signature, so the operator must
+    /// publish the signatures with the batch, and a settled transfer whose
+    /// signature does not match its source key can be proven with
+    /// challengeTransfer. A successful challenge halts batch settlement; it
+    /// does not reverse the transfer. Nonces and balances are checked exactly
+    /// as in transfer.
+    /// @param transfers The transfers, in the leaf order of the tree
+    /// @param signature Operator signature over the root, see batchDigest
+    function settleBatch(
+        BatchTransfer[] calldata transfers,
+        bytes calldata signature
+    ) external {
+        require(!batchesHalted, "Batch settlement halted");
+        bytes32 root = batchRoot(transfers);
+        require(settledBatches[root] == 0, "Batch already settled");
+        require(
+            batchDigest(root).recover(signature) == OPERATOR,
+            "Invalid operator signature"
+        );
+        settledBatches[root] = block.number;
+
+        for (uint256 i = 0; i < transfers.length; i++) {
+            BatchTransfer calldata t = transfers[i];
+            _applyTransfer(t.amount, t.nonce, t.sourcePubKey, t.targetPubKey);
+        }
+
+        emit BatchSettled(root, transfers.length);
+    }
+
+    /// @notice Merkle root of a batch, leaves hashed pairwise in order with
+    /// the last node of an odd level moved up unchanged
+    function batchRoot(
+        BatchTransfer[] calldata transfers
+    ) public pure returns (bytes32) {
+        uint256 n = transfers.length;
+        require(n > 0, "Empty batch");
+
+        bytes32[] memory nodes = new bytes32[](n);
+        for (uint256 i = 0; i < n; i++) {
+            nodes[i] = batchLeaf(transfers[i]);
+        }
+        while (n > 1) {
+            for (uint256 i = 0; i < n / 2; i++) {
+                nodes[i] = Hashes.commutativeKeccak256(
+                    nodes[2 * i],
+                    nodes[2 * i + 1]
+                );
+            }
+            if (n % 2 == 1) {
+                nodes[n / 2] = nodes[n - 1];
+            }
+            n = (n + 1) / 2;
+        }
+        return nodes[0];
+    }
+
+    /// @notice Leaf of a transfer, double hashed so it can't be mistaken for
+    /// an inner node
+    function batchLeaf(
+        BatchTransfer calldata item
+    ) public pure returns (bytes32) {
+        return
+            keccak256(
+                bytes.concat(
+                    keccak256(
+                        abi.encode(
+                            item.amount,
+                            item.nonce,
+                            item.sourcePubKey,
+                            item.targetPubKey,
+                            item.signatureHash
+                        )
+                    )
+                )
+            );
+    }
 
-        emit NativeTransfer(sourcePubKey, targetPubKey, amount);
+    /// @notice Message the operator signs to authorize a batch
+    function batchDigest(bytes32 root) public view returns (bytes32) {
+        return
+            keccak256(abi.encodePacked(root, block.chainid, address(this)))
+                .toEthSignedMessageHash();
+    }
+
+    /// @notice Whether a transfer was settled in the batch with this root
+    /// @param proof Sibling hashes from the leaf up to the root
+    function isSettled(
+        bytes32 root,
+        BatchTransfer calldata item,
+        bytes32[] calldata proof
+    ) external view returns (bool) {
+        return
+            settledBatches[root] != 0 &&
+            MerkleProof.verifyCalldata(proof, root, batchLeaf(item));
+    }
+
+    /// @notice What the source key signs for a transfer, with the eth_sign
+    /// prefix. It covers the recipient, so a transfer can't be redirected.
+    function transferDigest(
+        uint256 amount,
+        uint256 nonce,
+        bytes calldata sourcePubKey,
+        bytes calldata targetPubKey
+    ) public view returns (bytes32) {
+        return
+            keccak256(
+                abi.encodePacked(
+                    amount,
+                    nonce,
+                    sourcePubKey,
+                    keccak256(targetPubKey),
+                    address(this)
+                )
+            ).toEthSignedMessageHash();
+    }
+
+    /// @notice Whether signature is the user signature a settled transfer
+    /// committed to, and was made by the key behind its sourcePubKey
+    function isAuthorized(
+        BatchTransfer calldata item,
+        bytes calldata signature
+    ) public view returns (bool) {
+        if (keccak256(signature) != item.signatureHash) {
+            return false;
+        }
+        bytes32 digest = transferDigest(
+            item.amount,
+            item.nonce,
+            item.sourcePubKey,
+            item.targetPubKey
+        );
+        (address signer, ECDSA.RecoverError error, ) = digest.tryRecover(
+            signature
+        );
+        return
+            error == ECDSA.RecoverError.NoError &&
+            signer == address(uint160(uint256(keccak256(item.sourcePubKey))));
+    }
+
+    /// @notice Proves a settled transfer was not authorized by its source:
+    /// the published signature it committed to is not the source's. Halts
+    /// batch settlement.
+    /// @param signature Preimage of item.signatureHash, as published with the batch
+    function challengeTransfer(
+        bytes32 root,
+        BatchTransfer calldata item,
+        bytes32[] calldata proof,
+        bytes calldata signature
+    ) external {
+        require(settledBatches[root] != 0, "Batch not settled");
+        bytes32 leaf = batchLeaf(item);
+        require(
+            MerkleProof.verifyCalldata(proof, root, leaf),
+            "Invalid proof"
+        );
+        require(
+            keccak256(signature) == item.signatureHash,
+            "Signature not committed"
+        );
+        require(!isAuthorized(item, signature), "Transfer authorized");
+        batchesHalted = true;
+        emit UnauthorizedTransfer(root, leaf);
     }
 
     function handleReceiveMessage(
@@ -41,25 +267,95 @@ contract Telepay is IMessageHandler {
         // Verify the sender is TelepayRouter
         // _verifySender(sourceDomain, sender);
 
-        // Decode message into amount and pubKey
-        (uint256 amount, bytes memory pubKey) = abi.decode(
+        // Decode message into amount, pubKey and the nonce of the matching burn
+        (uint256 amount, bytes memory pubKey, uint64 burnNonce) = abi.decode(
             messageBody,
-            (uint256, bytes)
+            (uint256, bytes, uint64)
         );
 
-        // Credit the balance
-        balances[pubKey] += amount;
+        _credit(sourceDomain, pubKey, amount, burnNonce);
 
         return true;
     }
 
+    /// @notice Registers the router deployed on this chain
+    function setLocalRouter(address router) external {
+        require(msg.sender == OPERATOR, "Only operator");
+        localRouter = router;
+        emit LocalRouterSet(router);
+    }
+
+    /// @notice Credits a deposit made through the router on this chain
+    /// @param burnNonce Nonce of the CCTP burn sending the funds to the vault
+    function creditLocal(
+        bytes calldata pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    ) external {
+        require(msg.sender == localRouter, "Only local router");
+        _credit(LOCAL_DOMAIN, pubKey, amount, burnNonce);
+    }
+
+    function _credit(
+        uint32 sourceDomain,
+        bytes memory pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    ) internal {
+        balances[pubKey] += amount;
+        emit Credit(keccak256(pubKey), sourceDomain, pubKey, amount, burnNonce);
+    }
+
+    /// @dev Moves an authorized transfer, shared by transfer and settleBatch
+    function _applyTransfer(
+        uint256 amount,
+        uint256 nonce,
+        bytes calldata sourcePubKey,
+        bytes calldata targetPubKey
+    ) internal {
+        require(balances[sourcePubKey] >= amount, "Insufficient balance");
+        bytes32 sourceHash = keccak256(sourcePubKey);
+        _useUnorderedNonce(sourceHash, nonce);
+
+        balances[sourcePubKey] -= amount;
+        balances[targetPubKey] += amount;
+
+        emit NativeTransfer(
+            sourceHash,
+            keccak256(targetPubKey),
+            sourcePubKey,
+            targetPubKey,
+            amount,
+            nonce
+        );
+    }
+
+    /// @notice Whether a transfer with this nonce was already made from pubKey
+    function isNonceUsed(
+        bytes calldata pubKey,
+        uint256 nonce
+    ) external view returns (bool) {
+        uint256 word = nonceBitmap[keccak256(pubKey)][nonce >> 8];
+        return word & (1 << (nonce & 0xff)) != 0;
+    }
+
+    /// @dev Marks a nonce as used, reverting if it already was. Nonces sharing
+    /// a word only pay for a cold SSTORE once.
+    function _useUnorderedNonce(bytes32 owner, uint256 nonce) internal {
+        uint256 bit = 1 << (nonce & 0xff);
+        uint256 flipped = nonceBitmap[owner][nonce >> 8] ^= bit;
+        require(flipped & bit != 0, "Nonce already used");
+    }
+
     function _verifySignature(
         uint256 amount,
+        uint256 nonce,
         bytes memory pubKey,
-        address target,
+        bytes memory targetPubKey,
         bytes memory signature
     ) internal pure {
-        // Mock implementation - in production, implement proper signature verification
+        // Mock implementation - in production, recover the signer of
+        // transferDigest and check it against pubKey
         require(signature.length > 0, "Invalid signature");
     }
 
@@ -0,0 +1,57 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import "./TelepayRouter.sol";
+import "./interfaces/ITelepayDeployer.sol";
+
+/// @notice CREATE2 factory for TelepayRouter
+/// @dev The router reads its chain specific arguments back from this contract
+/// instead of taking constructor arguments, so its init code and therefore its
+/// address only depend on the salt. Deployed itself through the deterministic
+/// deployment proxy, a router gets the same address on every chain.
+contract TelepayDeployer is ITelepayDeployer {
+    struct Parameters {
+        address token;
+        address telepay;
+        address vault;
+        address tokenMessenger;
+        address messageTransmitter;
+    }
+
+    Parameters public override parameters;
+
+    event RouterDeployed(address indexed router, bytes32 salt);
+
+    /// @notice Deploys a router at the address given by `salt`
+    /// @param salt CREATE2 salt, its first 20 bytes must be the caller so
+    /// nobody else can take the address with different parameters
+    /// @param params Chain specific router arguments
+    function deployRouter(
+        bytes32 salt,
+        Parameters calldata params
+    ) external returns (address router) {
+        require(
+            address(bytes20(salt)) == msg.sender,
+            "Salt not owned by caller"
+        );
+
+        parameters = params;
+        router = address(new TelepayRouter{salt: salt}());
+        delete parameters;
+
+        emit RouterDeployed(router, salt);
+    }
+
+    /// @notice Address deployRouter(salt, ...) deploys to, on any chain
+    function routerAddress(bytes32 salt) external view returns (address) {
+        bytes32 hash = keccak256(
+            abi.encodePacked(
+                bytes1(0xff),
+                address(this),
+                salt,
+                keccak256(type(TelepayRouter).creationCode)
+            )
+        );
+        return address(uint160(uint256(hash)));
+    }
+}
@@ -5,6 +5,7 @@ import "./Telepay.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
 import "./interfaces/ITokenMessenger.sol";
 import "./interfaces/IMessageTransmitter.sol";
+import "./interfaces/ITelepayDeployer.sol";
 
 contract TelepayRouter {
     IERC20 public immutable TOKEN;
@@ -16,22 +17,57 @@ contract TelepayRouter {
     uint32 public constant TELEPAY_DOMAIN = 6; // Base domain ID
     uint32 public constant VAULT_DOMAIN = 0; // Ethereum domain ID
 
-    event Deposit(bytes indexed pubKey, uint256 amount);
+    /// @notice How deposits reach the vault and Telepay from this chain
+    /// @dev CrossChain burns to the vault and messages Telepay. Vault pays the
+    /// vault directly and only messages Telepay. Telepay burns to the vault
+    /// and credits Telepay directly.
+    enum Route {
+        CrossChain,
+        Vault,
+        Telepay
+    }
+
+    /// @notice CCTP domain of this chain, read from the message transmitter
+    uint32 public immutable LOCAL_DOMAIN;
+    Route public immutable ROUTE;
+
+    /// @param burnNonce CCTP nonce of the burn, also carried to Telepay's Credit
+    /// event. On the vault domain nothing is burned and it is the nonce of the
+    /// message to Telepay instead.
+    event Deposit(
+        bytes32 indexed pubKeyHash,
+        bytes pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    );
     event TelepayRouterDeployed(address indexed telepay, address indexed vault);
 
-    constructor(
-        address _token,
-        address _telepay,
-        address _vault,
-        address _tokenMessenger,
-        address _messageTransmitter
-    ) {
+    /// @dev Deployed by TelepayDeployer, which holds the chain specific
+    /// arguments during deployment so the init code is the same on every chain
+    constructor() {
+        (
+            address _token,
+            address _telepay,
+            address _vault,
+            address _tokenMessenger,
+            address _messageTransmitter
+        ) = ITelepayDeployer(msg.sender).parameters();
+
         TOKEN = IERC20(_token);
         TELEPAY = Telepay(_telepay);
         VAULT = _vault;
         TOKEN_MESSENGER = ITokenMessenger(_tokenMessenger);
         MESSAGE_TRANSMITTER = IMessageTransmitter(_messageTransmitter);
 
+        // The init code stays chain independent, the role comes from CCTP
+        uint32 localDomain = MESSAGE_TRANSMITTER.localDomain();
+        LOCAL_DOMAIN = localDomain;
+        ROUTE = localDomain == TELEPAY_DOMAIN
+            ? Route.Telepay
+            : localDomain == VAULT_DOMAIN
+                ? Route.Vault
+                : Route.CrossChain;
+
         // Approve TokenMessenger to spend tokens
         TOKEN.approve(address(TOKEN_MESSENGER), type(uint256).max);
 
@@ -55,6 +91,31 @@ contract TelepayRouter {
         // Check if the user has enough balance
         require(TOKEN.balanceOf(msg.sender) >= amount, "Insufficient balance");
 
+        uint64 burnNonce;
+        if (ROUTE == Route.Vault) {
+            // Already on the vault's chain, only the credit crosses chains
+            require(
+                TOKEN.transferFrom(msg.sender, VAULT, amount),
+                "Transfer failed"
+            );
+            burnNonce = MESSAGE_TRANSMITTER.nextAvailableNonce();
+            _sendCredit(pubKey, amount, burnNonce);
+        } else {
+            burnNonce = _burnToVault(amount);
+            if (ROUTE == Route.Telepay) {
+                // Already on Telepay's chain, only the funds cross chains
+                TELEPAY.creditLocal(pubKey, amount, burnNonce);
+            } else {
+                _sendCredit(pubKey, amount, burnNonce);
+            }
+        }
+
+        // Emit a deposit event
+        emit Deposit(keccak256(pubKey), pubKey, amount, burnNonce);
+    }
+
+    /// @dev Pulls the deposit and burns it via CCTP, minted to the vault
+    function _burnToVault(uint256 amount) internal returns (uint64) {
         // Transfer tokens from user to this contract
         require(
             TOKEN.transferFrom(msg.sender, address(this), amount),
@@ -74,22 +135,26 @@ contract TelepayRouter {
         }
 
         // Burn tokens via CCTP
-        TOKEN_MESSENGER.depositForBurn(
-            amount,
-            VAULT_DOMAIN,
-            bytes32(uint256(uint160(VAULT))),
-            address(TOKEN)
-        );
+        return
+            TOKEN_MESSENGER.depositForBurn(
+                amount,
+                VAULT_DOMAIN,
+                bytes32(uint256(uint160(VAULT))),
+                address(TOKEN)
+            );
+    }
 
-        // Send message to Telepay to credit balance
-        bytes memory message = abi.encode(amount, pubKey);
+    /// @dev Sends the message crediting pubKey to Telepay via CCTP
+    function _sendCredit(
+        bytes calldata pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    ) internal {
+        bytes memory message = abi.encode(amount, pubKey, burnNonce);
         MESSAGE_TRANSMITTER.sendMessage(
             TELEPAY_DOMAIN,
             bytes32(uint256(uint160(address(TELEPAY)))),
             message
         );
-
-        // Emit a deposit event
-        emit Deposit(pubKey, amount);
     }
 }
@@ -37,14 +37,15 @@ contract TelepayVault is IMessageHandler {
     }
 
     function uninvest(uint256 amount) external {
-        // Withdraw from Euler vault
-        eulerVault.withdraw(
-            amount,
-            address(this), // receive tokens back to this contract
-            address(this) // we are the owner of the shares
-        );
+        _uninvest(amount);
+    }
 
-        emit Uninvested(amount);
+    /// @notice Uninvests just enough for the vault to hold `amount` idle
+    /// @dev Relayers call this with the sum of several pending withdrawals so
+    /// they share a single Euler withdrawal instead of one each
+    /// @param amount The idle balance the vault must hold afterwards
+    function ensureLiquidity(uint256 amount) external {
+        _ensureLiquidity(amount);
     }
 
     function handleReceiveMessage(
@@ -66,6 +67,9 @@ contract TelepayVault is IMessageHandler {
             (uint256, uint32, address)
         );
 
+        // Pull the shortfall from Euler if idle tokens can't cover it
+        _ensureLiquidity(amount);
+
         // Approve TokenMessenger to spend tokens
         token.approve(address(tokenMessenger), amount);
 
@@ -79,4 +83,22 @@ contract TelepayVault is IMessageHandler {
 
         return true;
     }
+
+    function _ensureLiquidity(uint256 amount) internal {
+        uint256 idle = token.balanceOf(address(this));
+        if (idle < amount) {
+            _uninvest(amount - idle);
+        }
+    }
+
+    function _uninvest(uint256 amount) internal {
+        // Withdraw from Euler vault
+        eulerVault.withdraw(
+            amount,
+            address(this), // receive tokens back to this contract
+            address(this) // we are the owner of the shares
+        );
+
+        emit Uninvested(amount);
+    }
 }
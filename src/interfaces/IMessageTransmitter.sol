@@ -11,4 +11,10 @@ interface IMessageTransmitter {
         bytes32 recipient,
         bytes memory messageBody
     ) external;
+
+    /// @notice CCTP domain ID of the chain this transmitter is deployed on
+    function localDomain() external view returns (uint32);
+
+    /// @notice Nonce the next message sent from this domain gets
+    function nextAvailableNonce() external view returns (uint64);
 }
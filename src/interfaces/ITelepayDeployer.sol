@@ -0,0 +1,17 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+interface ITelepayDeployer {
+    /// @notice Constructor arguments of the router being deployed
+    /// @dev Only set for the duration of a deployRouter call
+    function parameters()
+        external
+        view
+        returns (
+            address token,
+            address telepay,
+            address vault,
+            address tokenMessenger,
+            address messageTransmitter
+        );
+}
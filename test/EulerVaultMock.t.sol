@@ -0,0 +1,127 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import {Test, console} from "forge-std/Test.sol";
+import {EulerVaultMock} from "../src/EulerVaultMock.sol";
+import "../test/mocks/MockUSDC.sol";
+
+contract EulerVaultMockTest is Test {
+    EulerVaultMock public eulerVault;
+    MockUSDC public usdc;
+
+    address public constant VAULT = address(0x5678);
+    address public constant OTHER = address(0xBEEF);
+
+    // Operation codes of the traces written by script/simulator.py
+    uint256 constant VAULT_DEPOSIT = 0;
+    uint256 constant VAULT_WITHDRAW = 1;
+    uint256 constant OTHER_DEPOSIT = 2;
+    uint256 constant OTHER_WITHDRAW = 3;
+    uint256 constant YIELD = 4;
+
+    function setUp() public {
+        _reset();
+        vm.label(VAULT, "Vault");
+        vm.label(OTHER, "Other");
+    }
+
+    function _reset() internal {
+        usdc = new MockUSDC();
+        eulerVault = new EulerVaultMock(address(usdc));
+        vm.label(address(usdc), "USDC");
+        vm.label(address(eulerVault), "EulerVault");
+    }
+
+    function _deposit(address holder, uint256 amount) internal {
+        usdc.mint(holder, amount);
+        vm.startPrank(holder);
+        usdc.approve(address(eulerVault), amount);
+        eulerVault.deposit(amount, holder);
+        vm.stopPrank();
+    }
+
+    function _withdraw(address holder, uint256 amount) internal {
+        vm.prank(holder);
+        eulerVault.withdraw(amount, holder, holder);
+    }
+
+    function test_FirstDepositMintsOneShare() public {
+        _deposit(VAULT, 100e6);
+
+        assertEq(eulerVault.shares(VAULT), 100e6);
+        assertEq(eulerVault.totalShares(), 100e6);
+    }
+
+    function test_DepositAfterYieldMintsFewerShares() public {
+        _deposit(VAULT, 100e6);
+        usdc.mint(address(eulerVault), 50e6);
+
+        _deposit(OTHER, 30e6);
+
+        // 30 * 100 / 150
+        assertEq(eulerVault.shares(OTHER), 20e6);
+        assertEq(eulerVault.totalShares(), 120e6);
+    }
+
+    function test_WithdrawBurnsProportionalShares() public {
+        _deposit(VAULT, 100e6);
+        usdc.mint(address(eulerVault), 50e6);
+
+        _withdraw(VAULT, 30e6);
+
+        assertEq(eulerVault.shares(VAULT), 80e6);
+        assertEq(usdc.balanceOf(VAULT), 30e6);
+    }
+
+    /// @notice Replays the sampled lanes of `python3 script/simulator.py --check N`
+    /// and compares share balances after every operation
+    function test_SimulatorParity() public {
+        string memory path = vm.envOr("SIMULATOR_TRACE", string(""));
+        if (bytes(path).length == 0) {
+            vm.skip(true);
+        }
+        string memory json = vm.readFile(path);
+
+        for (uint256 i = 0; ; i++) {
+            string memory key = string.concat(".traces[", vm.toString(i), "]");
+            if (!vm.keyExistsJson(json, key)) {
+                break;
+            }
+            _reset();
+
+            uint256[] memory ops = vm.parseJsonUintArray(
+                json,
+                string.concat(key, ".ops")
+            );
+            uint256[] memory amounts = vm.parseJsonUintArray(
+                json,
+                string.concat(key, ".amounts")
+            );
+            uint256[] memory totalShares = vm.parseJsonUintArray(
+                json,
+                string.concat(key, ".totalShares")
+            );
+            uint256[] memory vaultShares = vm.parseJsonUintArray(
+                json,
+                string.concat(key, ".vaultShares")
+            );
+
+            for (uint256 j = 0; j < ops.length; j++) {
+                if (ops[j] == VAULT_DEPOSIT) {
+                    _deposit(VAULT, amounts[j]);
+                } else if (ops[j] == VAULT_WITHDRAW) {
+                    _withdraw(VAULT, amounts[j]);
+                } else if (ops[j] == OTHER_DEPOSIT) {
+                    _deposit(OTHER, amounts[j]);
+                } else if (ops[j] == OTHER_WITHDRAW) {
+                    _withdraw(OTHER, amounts[j]);
+                } else if (ops[j] == YIELD) {
+                    usdc.mint(address(eulerVault), amounts[j]);
+                }
+
+                assertEq(eulerVault.totalShares(), totalShares[j]);
+                assertEq(eulerVault.shares(VAULT), vaultShares[j]);
+            }
+        }
+    }
+}
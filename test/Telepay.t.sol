@@ -7,6 +7,22 @@ import {Telepay} from "../src/Telepay.sol";
 contract TelepayTest is Test {
     Telepay public telepay;
 
+    event NativeTransfer(
+        bytes32 indexed fromPubKeyHash,
+        bytes32 indexed toPubKeyHash,
+        bytes fromPubKey,
+        bytes toPubKey,
+        uint256 amount,
+        uint256 nonce
+    );
+    event Credit(
+        bytes32 indexed pubKeyHash,
+        uint32 indexed sourceDomain,
+        bytes pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    );
+
     // Test keys (64 bytes each, representing uncompressed public keys without 0x04 prefix)
     bytes constant TEST_PUB_KEY_1 =
         hex"0102030405060708091011121314151617181920212223242526272829303132333435363738394041424344454647484950515253545556575859606162636465";
@@ -25,15 +41,22 @@ contract TelepayTest is Test {
 
     function _signMessage(
         uint256 amount,
+        uint256 nonce,
         bytes memory pubKey,
-        address target,
+        bytes memory targetPubKey,
         uint256 privateKey
     ) internal view returns (bytes memory) {
         bytes32 messageHash = keccak256(
             abi.encodePacked(
                 "\x19Ethereum Signed Message:\n32",
                 keccak256(
-                    abi.encodePacked(amount, pubKey, target, address(telepay))
+                    abi.encodePacked(
+                        amount,
+                        nonce,
+                        pubKey,
+                        keccak256(targetPubKey),
+                        address(telepay)
+                    )
                 )
             )
         );
@@ -57,12 +80,7 @@ contract TelepayTest is Test {
         assertEq(telepay.balances(TEST_PUB_KEY_2), 0);
 
         // Perform transfer
-        telepay.transfer(
-            TEST_AMOUNT,
-            TEST_PUB_KEY_1,
-            TEST_PUB_KEY_2,
-            _signMessage(TEST_AMOUNT, TEST_PUB_KEY_1, address(0), PRIVATE_KEY_1)
-        );
+        _transfer(TEST_AMOUNT, 0);
 
         // Verify final balances
         assertEq(telepay.balances(TEST_PUB_KEY_1), 0);
@@ -71,11 +89,111 @@ contract TelepayTest is Test {
 
     function testFail_TransferInsufficientBalance() public {
         // Try to transfer more than available balance
+        _transfer(TEST_AMOUNT, 0);
+    }
+
+    function _transfer(uint256 amount, uint256 nonce) internal {
         telepay.transfer(
-            TEST_AMOUNT,
+            amount,
+            nonce,
             TEST_PUB_KEY_1,
             TEST_PUB_KEY_2,
-            _signMessage(TEST_AMOUNT, TEST_PUB_KEY_1, address(0), PRIVATE_KEY_1)
+            _signMessage(
+                amount,
+                nonce,
+                TEST_PUB_KEY_1,
+                TEST_PUB_KEY_2,
+                PRIVATE_KEY_1
+            )
         );
     }
+
+    function test_Transfer_RevertsOnReplay() public {
+        telepay.debugSetValue(TEST_PUB_KEY_1, TEST_AMOUNT);
+        _transfer(1, 7);
+
+        vm.expectRevert("Nonce already used");
+        _transfer(1, 7);
+    }
+
+    function test_Transfer_NoncesOutOfOrder() public {
+        telepay.debugSetValue(TEST_PUB_KEY_1, TEST_AMOUNT);
+
+        // Any unused nonce works, across and within words
+        _transfer(1, 1000);
+        _transfer(1, 3);
+        _transfer(1, 255);
+        _transfer(1, 256);
+        _transfer(1, 0);
+
+        assertTrue(telepay.isNonceUsed(TEST_PUB_KEY_1, 3));
+        assertFalse(telepay.isNonceUsed(TEST_PUB_KEY_1, 4));
+        assertFalse(telepay.isNonceUsed(TEST_PUB_KEY_2, 3));
+
+        bytes32 owner = keccak256(TEST_PUB_KEY_1);
+        assertEq(
+            telepay.nonceBitmap(owner, 0),
+            (1 << 255) | (1 << 3) | 1
+        );
+        assertEq(telepay.nonceBitmap(owner, 1), 1);
+        assertEq(telepay.nonceBitmap(owner, 3), 1 << (1000 - 768));
+        assertEq(telepay.balances(TEST_PUB_KEY_2), 5);
+    }
+
+    function test_Transfer_NonceGasSameWord() public {
+        telepay.debugSetValue(TEST_PUB_KEY_1, TEST_AMOUNT);
+        telepay.debugSetValue(TEST_PUB_KEY_2, 1);
+
+        // First nonce of a word pays for the zero to non-zero store, the
+        // next ones in the same word don't
+        _transfer(1, 0);
+        vm.snapshotGasLastCall("Telepay", "transfer_newNonceWord");
+        _transfer(1, 1);
+        vm.snapshotGasLastCall("Telepay", "transfer_sameNonceWord");
+    }
+
+    function test_Transfer_EmitsIndexedEvent() public {
+        telepay.debugSetValue(TEST_PUB_KEY_1, TEST_AMOUNT);
+
+        vm.expectEmit(address(telepay));
+        emit NativeTransfer(
+            keccak256(TEST_PUB_KEY_1),
+            keccak256(TEST_PUB_KEY_2),
+            TEST_PUB_KEY_1,
+            TEST_PUB_KEY_2,
+            10,
+            42
+        );
+        _transfer(10, 42);
+    }
+
+    function test_HandleReceiveMessage_EmitsCredit() public {
+        bytes memory message = abi.encode(TEST_AMOUNT, TEST_PUB_KEY_1, uint64(7));
+
+        vm.expectEmit(address(telepay));
+        emit Credit(keccak256(TEST_PUB_KEY_1), 3, TEST_PUB_KEY_1, TEST_AMOUNT, 7);
+        telepay.handleReceiveMessage(3, bytes32(uint256(1)), message);
+
+        assertEq(telepay.balances(TEST_PUB_KEY_1), TEST_AMOUNT);
+    }
+
+    function test_CreditLocal_OnlyFromLocalRouter() public {
+        address router = makeAddr("router");
+
+        vm.prank(router);
+        vm.expectRevert("Only local router");
+        telepay.creditLocal(TEST_PUB_KEY_1, TEST_AMOUNT, 7);
+
+        vm.prank(router);
+        vm.expectRevert("Only operator");
+        telepay.setLocalRouter(router);
+
+        telepay.setLocalRouter(router);
+        vm.expectEmit(address(telepay));
+        emit Credit(keccak256(TEST_PUB_KEY_1), 6, TEST_PUB_KEY_1, TEST_AMOUNT, 7);
+        vm.prank(router);
+        telepay.creditLocal(TEST_PUB_KEY_1, TEST_AMOUNT, 7);
+
+        assertEq(telepay.balances(TEST_PUB_KEY_1), TEST_AMOUNT);
+    }
 }
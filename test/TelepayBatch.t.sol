@@ -0,0 +1,328 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import {Test, Vm, console} from "forge-std/Test.sol";
+import {Telepay} from "../src/Telepay.sol";
+
+contract TelepayBatchTest is Test {
+    Telepay public telepay;
+
+    address operator;
+    uint256 operatorKey;
+
+    // Distinct users a batch is spread over
+    uint256 constant USERS = 20;
+    uint256 constant INITIAL_BALANCE = 1e12;
+
+    event UnauthorizedTransfer(bytes32 indexed root, bytes32 indexed leaf);
+
+    function setUp() public {
+        (operator, operatorKey) = makeAddrAndKey("operator");
+        vm.prank(operator);
+        telepay = new Telepay();
+        vm.label(address(telepay), "Telepay");
+
+        for (uint256 i = 0; i < USERS; i++) {
+            telepay.debugSetValue(_pubKey(i), INITIAL_BALANCE);
+        }
+    }
+
+    function _pubKey(uint256 user) internal pure returns (bytes memory) {
+        return abi.encodePacked(keccak256(abi.encode(user)), bytes32(user));
+    }
+
+    /// @dev Transfer i goes from user i to user i + 1, with the next nonce of
+    /// its source so nonces fill bitmap words in order. Users sign with an
+    /// all-zero signature, the same as batch.synthetic_transfers.
+    function _batch(
+        uint256 size
+    ) internal pure returns (Telepay.BatchTransfer[] memory transfers) {
+        transfers = new Telepay.BatchTransfer[](size);
+        for (uint256 i = 0; i < size; i++) {
+            transfers[i] = Telepay.BatchTransfer({
+                amount: 1,
+                nonce: i / USERS,
+                sourcePubKey: _pubKey(i % USERS),
+                targetPubKey: _pubKey((i + 1) % USERS),
+                signatureHash: keccak256(new bytes(65))
+            });
+        }
+    }
+
+    function _sign(
+        Telepay.BatchTransfer[] memory transfers,
+        uint256 key
+    ) internal view returns (bytes memory) {
+        bytes32 digest = telepay.batchDigest(telepay.batchRoot(transfers));
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(key, digest);
+        return abi.encodePacked(r, s, v);
+    }
+
+    /// @dev A transfer from a real key, and its user signature
+    function _signedTransfer(
+        Vm.Wallet memory source
+    )
+        internal
+        returns (Telepay.BatchTransfer memory item, bytes memory signature)
+    {
+        bytes memory pubKey = abi.encodePacked(
+            source.publicKeyX,
+            source.publicKeyY
+        );
+        telepay.debugSetValue(pubKey, INITIAL_BALANCE);
+        bytes32 digest = keccak256(
+            abi.encodePacked(
+                "\x19Ethereum Signed Message:\n32",
+                keccak256(
+                    abi.encodePacked(
+                        uint256(1),
+                        uint256(0),
+                        pubKey,
+                        keccak256(_pubKey(0)),
+                        address(telepay)
+                    )
+                )
+            )
+        );
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(source, digest);
+        signature = abi.encodePacked(r, s, v);
+        item = Telepay.BatchTransfer({
+            amount: 1,
+            nonce: 0,
+            sourcePubKey: pubKey,
+            targetPubKey: _pubKey(0),
+            signatureHash: keccak256(signature)
+        });
+    }
+
+    /// @dev Settles item alone, its proof is empty
+    function _settleOne(
+        Telepay.BatchTransfer memory item
+    ) internal returns (bytes32 root) {
+        Telepay.BatchTransfer[] memory transfers = new Telepay.BatchTransfer[](
+            1
+        );
+        transfers[0] = item;
+        telepay.settleBatch(transfers, _sign(transfers, operatorKey));
+        root = telepay.batchRoot(transfers);
+    }
+
+    function _settle(uint256 size) internal {
+        Telepay.BatchTransfer[] memory transfers = _batch(size);
+        bytes memory signature = _sign(transfers, operatorKey);
+
+        telepay.settleBatch(transfers, signature);
+        uint256 gasUsed = vm.snapshotGasLastCall(
+            "TelepayBatch",
+            string.concat("settleBatch_", vm.toString(size))
+        );
+        vm.snapshotValue(
+            "TelepayBatch",
+            string.concat("settleBatch_", vm.toString(size), "_perTransfer"),
+            gasUsed / size
+        );
+    }
+
+    function test_SettleBatch_Gas10() public {
+        _settle(10);
+    }
+
+    function test_SettleBatch_Gas100() public {
+        _settle(100);
+    }
+
+    function test_SettleBatch_Gas1000() public {
+        _settle(1000);
+    }
+
+    function test_Transfer_GasBaseline() public {
+        // The same transfers one call each, for comparison with the batches
+        Telepay.BatchTransfer[] memory transfers = _batch(USERS);
+        uint256 total;
+        for (uint256 i = 0; i < transfers.length; i++) {
+            telepay.transfer(
+                transfers[i].amount,
+                transfers[i].nonce,
+                transfers[i].sourcePubKey,
+                transfers[i].targetPubKey,
+                new bytes(65)
+            );
+            total += vm.lastCallGas().gasTotalUsed;
+        }
+        vm.snapshotValue("TelepayBatch", "transfer_perTransfer", total / USERS);
+    }
+
+    function test_SettleBatch_MovesBalances() public {
+        _settle(USERS + 1);
+
+        // User 0 sent twice and received once, user 1 sent once and received twice
+        assertEq(telepay.balances(_pubKey(0)), INITIAL_BALANCE - 1);
+        assertEq(telepay.balances(_pubKey(1)), INITIAL_BALANCE + 1);
+        assertTrue(telepay.isNonceUsed(_pubKey(0), 1));
+        assertFalse(telepay.isNonceUsed(_pubKey(1), 1));
+    }
+
+    function test_SettleBatch_InclusionProof() public {
+        // Three leaves: the last one is moved up a level without a sibling
+        Telepay.BatchTransfer[] memory transfers = _batch(3);
+        telepay.settleBatch(transfers, _sign(transfers, operatorKey));
+
+        bytes32 root = telepay.batchRoot(transfers);
+        bytes32 leaf0 = telepay.batchLeaf(transfers[0]);
+        bytes32 leaf1 = telepay.batchLeaf(transfers[1]);
+        bytes32 leaf2 = telepay.batchLeaf(transfers[2]);
+        bytes32 node01 = leaf0 < leaf1
+            ? keccak256(abi.encode(leaf0, leaf1))
+            : keccak256(abi.encode(leaf1, leaf0));
+
+        bytes32[] memory proof = new bytes32[](2);
+        proof[0] = leaf1;
+        proof[1] = leaf2;
+        assertTrue(telepay.isSettled(root, transfers[0], proof));
+
+        bytes32[] memory shortProof = new bytes32[](1);
+        shortProof[0] = node01;
+        assertTrue(telepay.isSettled(root, transfers[2], shortProof));
+
+        // Wrong sibling, or a root that was never settled
+        proof[0] = leaf2;
+        assertFalse(telepay.isSettled(root, transfers[0], proof));
+        assertFalse(telepay.isSettled(bytes32(0), transfers[2], shortProof));
+    }
+
+    function test_SettleBatch_RevertsWithoutOperatorSignature() public {
+        Telepay.BatchTransfer[] memory transfers = _batch(10);
+        (, uint256 otherKey) = makeAddrAndKey("other");
+        bytes memory signature = _sign(transfers, otherKey);
+
+        vm.expectRevert("Invalid operator signature");
+        telepay.settleBatch(transfers, signature);
+    }
+
+    function test_SettleBatch_RevertsOnReplay() public {
+        Telepay.BatchTransfer[] memory transfers = _batch(10);
+        bytes memory signature = _sign(transfers, operatorKey);
+        telepay.settleBatch(transfers, signature);
+
+        vm.expectRevert("Batch already settled");
+        telepay.settleBatch(transfers, signature);
+    }
+
+    function test_SettleBatch_RevertsOnUsedNonce() public {
+        Telepay.BatchTransfer[] memory transfers = _batch(10);
+        telepay.settleBatch(transfers, _sign(transfers, operatorKey));
+
+        // A different batch reusing one of the settled transfers
+        Telepay.BatchTransfer[] memory again = new Telepay.BatchTransfer[](2);
+        again[0] = _batch(USERS + 1)[USERS];
+        again[1] = transfers[3];
+
+        bytes memory signature = _sign(again, operatorKey);
+        vm.expectRevert("Nonce already used");
+        telepay.settleBatch(again, signature);
+    }
+
+    function test_BatchRoot_MatchesPythonTree() public view {
+        // MerkleTree in script/batch.py over batch.synthetic_transfers
+        assertEq(
+            telepay.batchRoot(_batch(3)),
+            0x17d47480d43a76d1f14d17cc77013660942d3953cae062bc70c82e852e662e23
+        );
+        assertEq(
+            telepay.batchRoot(_batch(USERS + 1)),
+            0x230b7fd90142afb3bb9488c8d67c4a9507840ff73e50e9e40cb0c4a79d59440c
+        );
+    }
+
+    function test_IsAuthorized() public {
+        Vm.Wallet memory alice = vm.createWallet("alice");
+        (
+            Telepay.BatchTransfer memory item,
+            bytes memory signature
+        ) = _signedTransfer(alice);
+        assertTrue(telepay.isAuthorized(item, signature));
+
+        // Signed by someone else, or not the signature the leaf committed to
+        Vm.Wallet memory mallory = vm.createWallet("mallory");
+        (, bytes memory other) = _signedTransfer(mallory);
+        assertFalse(telepay.isAuthorized(item, other));
+        item.signatureHash = keccak256(other);
+        assertFalse(telepay.isAuthorized(item, other));
+    }
+
+    function test_ChallengeTransfer_HaltsBatches() public {
+        Vm.Wallet memory alice = vm.createWallet("alice");
+        Vm.Wallet memory mallory = vm.createWallet("mallory");
+        (Telepay.BatchTransfer memory item, ) = _signedTransfer(alice);
+        (, bytes memory forged) = _signedTransfer(mallory);
+
+        // The operator settles a transfer out of alice's key signed by mallory
+        item.signatureHash = keccak256(forged);
+        bytes32 root = _settleOne(item);
+
+        vm.expectEmit(address(telepay));
+        emit UnauthorizedTransfer(root, telepay.batchLeaf(item));
+        telepay.challengeTransfer(root, item, new bytes32[](0), forged);
+        assertTrue(telepay.batchesHalted());
+
+        Telepay.BatchTransfer[] memory transfers = _batch(10);
+        bytes memory signature = _sign(transfers, operatorKey);
+        vm.expectRevert("Batch settlement halted");
+        telepay.settleBatch(transfers, signature);
+    }
+
+    function test_ChallengeTransfer_RedirectedTarget() public {
+        Vm.Wallet memory alice = vm.createWallet("alice");
+        (
+            Telepay.BatchTransfer memory item,
+            bytes memory signature
+        ) = _signedTransfer(alice);
+
+        // Alice's own signature, settled with another recipient
+        item.targetPubKey = _pubKey(1);
+        bytes32 root = _settleOne(item);
+        assertEq(telepay.balances(_pubKey(1)), INITIAL_BALANCE + 1);
+
+        telepay.challengeTransfer(root, item, new bytes32[](0), signature);
+        assertTrue(telepay.batchesHalted());
+
+        Telepay.BatchTransfer[] memory transfers = _batch(10);
+        bytes memory operatorSignature = _sign(transfers, operatorKey);
+        vm.expectRevert("Batch settlement halted");
+        telepay.settleBatch(transfers, operatorSignature);
+    }
+
+    function test_ChallengeTransfer_RevertsWhenAuthorized() public {
+        Vm.Wallet memory alice = vm.createWallet("alice");
+        (
+            Telepay.BatchTransfer memory item,
+            bytes memory signature
+        ) = _signedTransfer(alice);
+        bytes32 root = _settleOne(item);
+
+        vm.expectRevert("Transfer authorized");
+        telepay.challengeTransfer(root, item, new bytes32[](0), signature);
+        assertFalse(telepay.batchesHalted());
+    }
+
+    function test_ChallengeTransfer_RevertsOnUncommittedSignature() public {
+        Vm.Wallet memory alice = vm.createWallet("alice");
+        (Telepay.BatchTransfer memory item, ) = _signedTransfer(alice);
+        bytes32 root = _settleOne(item);
+
+        // Any bad signature would do if it didn't have to match the leaf
+        vm.expectRevert("Signature not committed");
+        telepay.challengeTransfer(root, item, new bytes32[](0), new bytes(65));
+    }
+
+    function test_ChallengeTransfer_RevertsOutsideSettledBatch() public {
+        Telepay.BatchTransfer[] memory transfers = _batch(3);
+        vm.expectRevert("Batch not settled");
+        telepay.challengeTransfer(
+            telepay.batchRoot(transfers),
+            transfers[0],
+            new bytes32[](0),
+            new bytes(65)
+        );
+    }
+}
@@ -3,20 +3,38 @@ pragma solidity ^0.8.13;
 
 import {Test, console} from "forge-std/Test.sol";
 import {TelepayRouter} from "../src/TelepayRouter.sol";
+import {TelepayDeployer} from "../src/TelepayDeployer.sol";
 import {Telepay} from "../src/Telepay.sol";
 import "../test/mocks/MockUSDC.sol";
+import "../test/mocks/MockTokenMessenger.sol";
+import "../test/mocks/MockMessageTransmitter.sol";
 
 contract TelepayRouterTest is Test {
     TelepayRouter public router;
+    TelepayDeployer public deployer;
     Telepay public telepay;
     MockUSDC public usdc;
+    MockMessageTransmitter public transmitter;
 
     address public constant USER = address(0x1234);
     address public constant MOCK_VAULT = address(0x5678);
     address public constant MOCK_TOKEN_MESSENGER = address(0x9ABC);
-    address public constant MOCK_MESSAGE_TRANSMITTER = address(0xDEF0);
+    uint32 constant ARBITRUM_DOMAIN = 3;
     uint256 constant INITIAL_BALANCE = 1000e6; // 1000 USDC
 
+    event Deposit(
+        bytes32 indexed pubKeyHash,
+        bytes pubKey,
+        uint256 amount,
+        uint64 burnNonce
+    );
+    event MessageSent(
+        uint64 indexed nonce,
+        uint32 destinationDomain,
+        bytes32 recipient,
+        bytes messageBody
+    );
+
     // Test keys (64 bytes each, representing uncompressed public keys without 0x04 prefix)
     bytes constant TEST_PUB_KEY_1 =
         hex"0102030405060708091011121314151617181920212223242526272829303132333435363738394041424344454647484950515253545556575859606162636465";
@@ -25,13 +43,9 @@ contract TelepayRouterTest is Test {
         // Deploy contracts
         telepay = new Telepay();
         usdc = new MockUSDC();
-        router = new TelepayRouter(
-            address(usdc),
-            address(telepay),
-            MOCK_VAULT,
-            MOCK_TOKEN_MESSENGER,
-            MOCK_MESSAGE_TRANSMITTER
-        );
+        transmitter = new MockMessageTransmitter(ARBITRUM_DOMAIN);
+        deployer = new TelepayDeployer();
+        router = TelepayRouter(deployer.deployRouter(_salt(0), _parameters()));
 
         // Label addresses for better trace output
         vm.label(address(telepay), "Telepay");
@@ -40,7 +54,7 @@ contract TelepayRouterTest is Test {
         vm.label(USER, "User");
         vm.label(MOCK_VAULT, "Vault");
         vm.label(MOCK_TOKEN_MESSENGER, "TokenMessenger");
-        vm.label(MOCK_MESSAGE_TRANSMITTER, "MessageTransmitter");
+        vm.label(address(transmitter), "MessageTransmitter");
 
         // Setup test user
         vm.startPrank(USER);
@@ -48,4 +62,183 @@ contract TelepayRouterTest is Test {
         usdc.approve(address(router), type(uint256).max);
         vm.stopPrank();
     }
+
+    function _salt(uint96 nonce) internal view returns (bytes32) {
+        return bytes32((uint256(uint160(address(this))) << 96) | nonce);
+    }
+
+    function _parameters()
+        internal
+        view
+        returns (TelepayDeployer.Parameters memory)
+    {
+        return
+            TelepayDeployer.Parameters({
+                token: address(usdc),
+                telepay: address(telepay),
+                vault: MOCK_VAULT,
+                tokenMessenger: MOCK_TOKEN_MESSENGER,
+                messageTransmitter: address(transmitter)
+            });
+    }
+
+    function test_DeployRouter_Parameters() public view {
+        assertEq(address(router.TOKEN()), address(usdc));
+        assertEq(address(router.TELEPAY()), address(telepay));
+        assertEq(router.VAULT(), MOCK_VAULT);
+        assertEq(address(router.TOKEN_MESSENGER()), MOCK_TOKEN_MESSENGER);
+        assertEq(
+            address(router.MESSAGE_TRANSMITTER()),
+            address(transmitter)
+        );
+        assertEq(router.LOCAL_DOMAIN(), ARBITRUM_DOMAIN);
+        assertEq(
+            uint8(router.ROUTE()),
+            uint8(TelepayRouter.Route.CrossChain)
+        );
+        assertEq(
+            usdc.allowance(address(router), MOCK_TOKEN_MESSENGER),
+            type(uint256).max
+        );
+
+        // Only set while deploying
+        (address token, , , , ) = deployer.parameters();
+        assertEq(token, address(0));
+    }
+
+    function test_DeployRouter_AddressOnlyDependsOnSalt() public {
+        bytes32 salt = _salt(1);
+        address predicted = vm.computeCreate2Address(
+            salt,
+            keccak256(type(TelepayRouter).creationCode),
+            address(deployer)
+        );
+        assertEq(deployer.routerAddress(salt), predicted);
+
+        // Different chain specific arguments, same address
+        TelepayDeployer.Parameters memory params = _parameters();
+        params.tokenMessenger = address(0xBEEF);
+        assertEq(deployer.deployRouter(salt, params), predicted);
+    }
+
+    function test_DeployRouter_RevertsForOtherCallersSalt() public {
+        bytes32 salt = _salt(2);
+        vm.prank(USER);
+        vm.expectRevert("Salt not owned by caller");
+        deployer.deployRouter(salt, _parameters());
+    }
+
+    function test_Deposit_CarriesBurnNonce() public {
+        MockTokenMessenger tokenMessenger = new MockTokenMessenger();
+        MockMessageTransmitter messageTransmitter = new MockMessageTransmitter(
+            ARBITRUM_DOMAIN
+        );
+        TelepayDeployer.Parameters memory params = _parameters();
+        params.tokenMessenger = address(tokenMessenger);
+        params.messageTransmitter = address(messageTransmitter);
+        TelepayRouter mocked = TelepayRouter(
+            deployer.deployRouter(_salt(3), params)
+        );
+
+        vm.startPrank(USER);
+        usdc.approve(address(mocked), type(uint256).max);
+        mocked.deposit(TEST_PUB_KEY_1, 100e6);
+
+        // Second burn gets nonce 1, the Telepay message carries it
+        vm.expectEmit(address(messageTransmitter));
+        emit MessageSent(
+            1,
+            6,
+            bytes32(uint256(uint160(address(telepay)))),
+            abi.encode(uint256(200e6), TEST_PUB_KEY_1, uint64(1))
+        );
+        vm.expectEmit(address(mocked));
+        emit Deposit(keccak256(TEST_PUB_KEY_1), TEST_PUB_KEY_1, 200e6, 1);
+        mocked.deposit(TEST_PUB_KEY_1, 200e6);
+        vm.snapshotGasLastCall("TelepayRouter", "deposit_crossChain");
+        vm.stopPrank();
+
+        assertEq(usdc.balanceOf(address(tokenMessenger)), 300e6);
+    }
+
+    /// @dev Router on the chain of `domain`, with mocks that record burns and messages
+    function _routerOn(
+        uint32 domain,
+        uint96 saltNonce
+    )
+        internal
+        returns (
+            TelepayRouter mocked,
+            MockTokenMessenger tokenMessenger,
+            MockMessageTransmitter messageTransmitter
+        )
+    {
+        tokenMessenger = new MockTokenMessenger();
+        messageTransmitter = new MockMessageTransmitter(domain);
+        TelepayDeployer.Parameters memory params = _parameters();
+        params.tokenMessenger = address(tokenMessenger);
+        params.messageTransmitter = address(messageTransmitter);
+        mocked = TelepayRouter(deployer.deployRouter(_salt(saltNonce), params));
+
+        vm.prank(USER);
+        usdc.approve(address(mocked), type(uint256).max);
+    }
+
+    function test_Route_FollowsLocalDomain() public {
+        (TelepayRouter onBase, , ) = _routerOn(6, 4);
+        (TelepayRouter onEthereum, , ) = _routerOn(0, 5);
+        assertEq(uint8(onBase.ROUTE()), uint8(TelepayRouter.Route.Telepay));
+        assertEq(uint8(onEthereum.ROUTE()), uint8(TelepayRouter.Route.Vault));
+        assertEq(onEthereum.LOCAL_DOMAIN(), 0);
+    }
+
+    function test_Deposit_OnVaultDomain_PaysVaultDirectly() public {
+        (
+            TelepayRouter mocked,
+            MockTokenMessenger tokenMessenger,
+            MockMessageTransmitter messageTransmitter
+        ) = _routerOn(0, 6);
+
+        // Nothing is burned, the credit carries the message nonce
+        vm.expectEmit(address(messageTransmitter));
+        emit MessageSent(
+            0,
+            6,
+            bytes32(uint256(uint160(address(telepay)))),
+            abi.encode(uint256(100e6), TEST_PUB_KEY_1, uint64(0))
+        );
+        vm.prank(USER);
+        mocked.deposit(TEST_PUB_KEY_1, 100e6);
+        vm.snapshotGasLastCall("TelepayRouter", "deposit_vault");
+
+        assertEq(usdc.balanceOf(MOCK_VAULT), 100e6);
+        assertEq(usdc.balanceOf(address(tokenMessenger)), 0);
+        assertEq(tokenMessenger.nextNonce(), 0);
+    }
+
+    function test_Deposit_OnTelepayDomain_CreditsLocally() public {
+        (
+            TelepayRouter mocked,
+            MockTokenMessenger tokenMessenger,
+            MockMessageTransmitter messageTransmitter
+        ) = _routerOn(6, 7);
+        telepay.setLocalRouter(address(mocked));
+
+        vm.prank(USER);
+        mocked.deposit(TEST_PUB_KEY_1, 100e6);
+        vm.snapshotGasLastCall("TelepayRouter", "deposit_telepay");
+
+        // Credited in the same transaction, only the funds go through CCTP
+        assertEq(telepay.balances(TEST_PUB_KEY_1), 100e6);
+        assertEq(usdc.balanceOf(address(tokenMessenger)), 100e6);
+        assertEq(messageTransmitter.nextAvailableNonce(), 0);
+    }
+
+    function test_Deposit_OnTelepayDomain_RevertsIfNotRegistered() public {
+        (TelepayRouter mocked, , ) = _routerOn(6, 8);
+
+        vm.prank(USER);
+        vm.expectRevert("Only local router");
+        mocked.deposit(TEST_PUB_KEY_1, 100e6);
+    }
 }
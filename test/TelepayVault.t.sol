@@ -0,0 +1,111 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import {Test, Vm, console} from "forge-std/Test.sol";
+import {TelepayVault} from "../src/TelepayVault.sol";
+import {EulerVaultMock} from "../src/EulerVaultMock.sol";
+import "../test/mocks/MockUSDC.sol";
+import "../test/mocks/MockTokenMessenger.sol";
+
+contract TelepayVaultTest is Test {
+    TelepayVault public vault;
+    EulerVaultMock public eulerVault;
+    MockTokenMessenger public tokenMessenger;
+    MockUSDC public usdc;
+
+    address public constant USER = address(0x1234);
+    uint32 constant TARGET_DOMAIN = 3; // Arbitrum domain ID
+    uint256 constant VAULT_BALANCE = 1000e6; // 1000 USDC
+
+    event Uninvested(uint256 amount);
+
+    function setUp() public {
+        usdc = new MockUSDC();
+        eulerVault = new EulerVaultMock(address(usdc));
+        tokenMessenger = new MockTokenMessenger();
+        vault = new TelepayVault(
+            address(usdc),
+            address(tokenMessenger),
+            address(eulerVault)
+        );
+
+        vm.label(address(vault), "TelepayVault");
+        vm.label(address(eulerVault), "EulerVault");
+        vm.label(address(tokenMessenger), "TokenMessenger");
+        vm.label(address(usdc), "USDC");
+        vm.label(USER, "User");
+
+        usdc.mint(address(vault), VAULT_BALANCE);
+    }
+
+    function _withdrawal(uint256 amount) internal pure returns (bytes memory) {
+        return abi.encode(amount, TARGET_DOMAIN, USER);
+    }
+
+    function _invested() internal view returns (uint256) {
+        return usdc.balanceOf(address(eulerVault));
+    }
+
+    function _countUninvested(
+        Vm.Log[] memory logs
+    ) internal pure returns (uint256 count) {
+        for (uint256 i = 0; i < logs.length; i++) {
+            if (logs[i].topics[0] == Uninvested.selector) {
+                count++;
+            }
+        }
+    }
+
+    function test_HandleReceiveMessage_IdleSufficient() public {
+        vault.invest(600e6);
+
+        vault.handleReceiveMessage(0, bytes32(0), _withdrawal(300e6));
+        vm.snapshotGasLastCall("TelepayVault", "handleReceiveMessage_idle");
+
+        // Nothing is pulled from Euler when idle tokens cover the withdrawal
+        assertEq(usdc.balanceOf(address(vault)), 100e6);
+        assertEq(_invested(), 600e6);
+        assertEq(usdc.balanceOf(address(tokenMessenger)), 300e6);
+    }
+
+    function test_HandleReceiveMessage_Shortfall() public {
+        vault.invest(600e6);
+
+        vm.expectEmit();
+        emit Uninvested(100e6);
+        vault.handleReceiveMessage(0, bytes32(0), _withdrawal(500e6));
+        vm.snapshotGasLastCall("TelepayVault", "handleReceiveMessage_shortfall");
+
+        // Only the shortfall over the 400 USDC idle is uninvested
+        assertEq(usdc.balanceOf(address(vault)), 0);
+        assertEq(_invested(), 500e6);
+        assertEq(usdc.balanceOf(address(tokenMessenger)), 500e6);
+    }
+
+    function test_EnsureLiquidity_BatchesPendingWithdrawals() public {
+        vault.invest(VAULT_BALANCE);
+
+        // One uninvest covers both pending withdrawals
+        vm.expectEmit();
+        emit Uninvested(500e6);
+        vault.ensureLiquidity(200e6 + 300e6);
+        assertEq(usdc.balanceOf(address(vault)), 500e6);
+
+        vm.recordLogs();
+        vault.handleReceiveMessage(0, bytes32(0), _withdrawal(200e6));
+        vault.handleReceiveMessage(0, bytes32(0), _withdrawal(300e6));
+        assertEq(_countUninvested(vm.getRecordedLogs()), 0);
+
+        assertEq(usdc.balanceOf(address(vault)), 0);
+        assertEq(_invested(), 500e6);
+    }
+
+    function test_EnsureLiquidity_NoopWhenIdle() public {
+        vault.invest(200e6);
+
+        vm.recordLogs();
+        vault.ensureLiquidity(800e6);
+        assertEq(_countUninvested(vm.getRecordedLogs()), 0);
+        assertEq(_invested(), 200e6);
+    }
+}
@@ -0,0 +1,34 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import "../../src/interfaces/IMessageTransmitter.sol";
+
+contract MockMessageTransmitter is IMessageTransmitter {
+    uint32 public immutable localDomain;
+    uint64 public nextAvailableNonce;
+
+    event MessageSent(
+        uint64 indexed nonce,
+        uint32 destinationDomain,
+        bytes32 recipient,
+        bytes messageBody
+    );
+
+    constructor(uint32 _localDomain) {
+        localDomain = _localDomain;
+    }
+
+    // Records the message instead of relaying it, tests deliver it themselves
+    function sendMessage(
+        uint32 destinationDomain,
+        bytes32 recipient,
+        bytes memory messageBody
+    ) external override {
+        emit MessageSent(
+            nextAvailableNonce++,
+            destinationDomain,
+            recipient,
+            messageBody
+        );
+    }
+}
@@ -0,0 +1,41 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.13;
+
+import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "../../src/interfaces/ITokenMessenger.sol";
+
+contract MockTokenMessenger is ITokenMessenger {
+    uint64 public nextNonce;
+
+    event DepositForBurn(
+        uint64 indexed nonce,
+        address indexed burnToken,
+        uint256 amount,
+        address indexed depositor,
+        bytes32 mintRecipient,
+        uint32 destinationDomain
+    );
+
+    // Pulls the tokens like the real TokenMessenger, but keeps them instead of burning
+    function depositForBurn(
+        uint256 amount,
+        uint32 destinationDomain,
+        bytes32 mintRecipient,
+        address burnToken
+    ) external override returns (uint64 nonce) {
+        require(
+            IERC20(burnToken).transferFrom(msg.sender, address(this), amount),
+            "Transfer failed"
+        );
+
+        nonce = nextNonce++;
+        emit DepositForBurn(
+            nonce,
+            burnToken,
+            amount,
+            msg.sender,
+            mintRecipient,
+            destinationDomain
+        );
+    }
+}
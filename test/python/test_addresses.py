@@ -0,0 +1,43 @@
+import numpy as np
+import rlp
+from eth_utils import keccak, to_checksum_address
+
+from addresses import create2_addresses, create_addresses, salts_from_range, to_hex
+from keccak import keccak256, keccak256_batch
+
+DEPLOYER = "0x6Ac7Ea33F8831eA9DcC53393AAA88B25A785dBf0"
+FACTORY = "0x4e59b44847b379578588920cA78FbF26c0B4956C"
+
+# Around the 136-byte rate, where padding spills into a second block
+LENGTHS = [0, 1, 32, 64, 135, 136, 137, 271, 272, 273]
+
+
+def test_keccak_matches_eth_utils():
+    rng = np.random.default_rng(0)
+    for length in LENGTHS:
+        messages = rng.integers(0, 256, (5, length), dtype=np.uint8)
+        hashes = keccak256_batch(messages)
+        for message, digest in zip(messages, hashes):
+            assert digest.tobytes() == keccak(message.tobytes())
+        assert keccak256(messages[0].tobytes()) == keccak(messages[0].tobytes())
+
+
+def test_create_addresses_match_rlp():
+    # Each side of every change in the nonce's RLP length
+    nonces = [0, 1, 0x7F, 0x80, 0xFF, 0x100, 0xFFFF, 0x10000, 2**32 - 1, 2**32, 2**56]
+    expected = [
+        to_checksum_address(keccak(rlp.encode([bytes.fromhex(DEPLOYER[2:]), nonce]))[12:])
+        for nonce in nonces
+    ]
+    assert to_hex(create_addresses(DEPLOYER, nonces)) == expected
+
+
+def test_create2_addresses():
+    init_code_hash = keccak(b"\x60\x00")
+    salts = salts_from_range(2**40 - 1, 3)
+    expected = [
+        to_checksum_address(keccak(b"\xff" + bytes.fromhex(FACTORY[2:]) + salt.tobytes() + init_code_hash)[12:])
+        for salt in salts
+    ]
+    assert to_hex(create2_addresses(FACTORY, salts, init_code_hash)) == expected
+    assert salts[1].tobytes() == (2**40).to_bytes(32, "big")
@@ -0,0 +1,71 @@
+import pytest
+from eth_account import Account
+from eth_keys import keys
+
+import batch
+
+TELEPAY = "0x" + "11" * 20
+
+# Telepay.batchRoot over TelepayBatchTest._batch, pinned in
+# test_BatchRoot_MatchesPythonTree
+ROOTS = {
+    3: "17d47480d43a76d1f14d17cc77013660942d3953cae062bc70c82e852e662e23",
+    21: "230b7fd90142afb3bb9488c8d67c4a9507840ff73e50e9e40cb0c4a79d59440c",
+}
+
+
+def signed_transfer(account) -> dict:
+    pub_key = keys.PrivateKey(account.key).public_key.to_bytes()
+    transfer = {"amount": 1, "nonce": 0, "sourcePubKey": pub_key, "targetPubKey": bytes(64)}
+    message = batch.transfer_message(transfer, TELEPAY)
+    transfer["signature"] = bytes(account.sign_message(message).signature)
+    return transfer
+
+
+def test_root_matches_contract():
+    for size, root in ROOTS.items():
+        tree = batch.MerkleTree([batch.leaf(t) for t in batch.synthetic_transfers(size)])
+        assert tree.root == bytes.fromhex(root)
+
+
+def test_every_proof_verifies():
+    for size in (1, 2, 3, 7, 21):
+        tree = batch.MerkleTree([batch.leaf(t) for t in batch.synthetic_transfers(size)])
+        for i, node in enumerate(tree.levels[0]):
+            assert batch.MerkleTree.verify(tree.proof(i), tree.root, node)
+        assert not batch.MerkleTree.verify(tree.proof(0), tree.root, bytes(32))
+
+
+def test_empty_batch_is_rejected():
+    with pytest.raises(ValueError, match="Empty batch"):
+        batch.MerkleTree([])
+
+
+def test_leaf_commits_to_signature():
+    transfer = batch.synthetic_transfers(1)[0]
+    forged = dict(transfer, signature=b"\x01" * 65)
+    assert batch.leaf(transfer) != batch.leaf(forged)
+
+
+def test_check_user_signature():
+    alice, mallory = Account.create(), Account.create()
+    transfer = signed_transfer(alice)
+    assert batch.check_user_signature(transfer, TELEPAY)
+    transfer["signature"] = signed_transfer(mallory)["signature"]
+    assert not batch.check_user_signature(transfer, TELEPAY)
+
+
+def test_signature_covers_target():
+    transfer = signed_transfer(Account.create())
+    redirected = dict(transfer, targetPubKey=b"\x02" * 64)
+    assert not batch.check_user_signature(redirected, TELEPAY)
+
+
+def test_build_output_round_trips():
+    transfers = [signed_transfer(Account.create()) for _ in range(3)]
+    built = batch.build(transfers, Account.create().key, 84532, TELEPAY)
+    root = bytes.fromhex(built["root"][2:])
+    assert len(root) == 32 and len(bytes.fromhex(built["signature"][2:])) == 65
+    for entry in built["proofs"]:
+        proof = [bytes.fromhex(p[2:]) for p in entry["proof"]]
+        assert batch.MerkleTree.verify(proof, root, bytes.fromhex(entry["leaf"][2:]))
@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+from deploy import MAX_LINE_CHARS, ForgeRun, stream_forge
+
+ADDRESS = "0x" + "ab" * 20
+
+
+def run_printing(tmp_path, *lines: str) -> ForgeRun:
+    """stream_forge over a process that prints lines, standing in for forge"""
+    output = tmp_path / "output.txt"
+    output.write_text("".join(line + "\n" for line in lines))
+    script = "import sys\nsys.stdout.write(open(sys.argv[1]).read())\n"
+    return stream_forge([sys.executable, "-c", script, str(output)], dict(os.environ))
+
+
+def test_oversized_json_record_is_kept_whole(tmp_path):
+    # --json script result whose trace pushes it past the text line limit
+    record = {
+        "logs": [f"TelepayVault deployed at: {ADDRESS}"],
+        "traces": ["x" * (4 * MAX_LINE_CHARS)],
+        "gas_used": 1000,
+    }
+    run = run_printing(tmp_path, json.dumps(record), "done")
+    assert run.returncode == 0 and run.aborted is None
+    assert run.addresses == {"TelepayVault": ADDRESS}
+    assert list(run.tail)[-1] == "done"
+
+
+def test_oversized_text_line_is_cut(tmp_path):
+    run = run_printing(tmp_path, "y" * (3 * MAX_LINE_CHARS), "done")
+    assert [len(line) for line in run.tail] == [MAX_LINE_CHARS, 4]
+
+
+def test_fatal_patterns_are_anchored():
+    run = ForgeRun()
+    for line in (
+        "  [Revert] error: custom message in a trace",
+        "Logs:",
+        "  0 retries on error: none",
+        "Warning: unused variable error",
+    ):
+        assert run.feed(line) is None
+    assert run.feed("Error: script failed: Invalid proof")
+    assert run.feed("Compiler run failed:")
+    assert run.feed("- server returned an error response: error code -32000: nonce too low")
+
+
+def test_stops_on_fatal_error(tmp_path):
+    run = run_printing(tmp_path, "Error: Failed to send transaction", f"Telepay deployed at: {ADDRESS}")
+    assert run.aborted == "Error: Failed to send transaction"
+    assert run.addresses == {}
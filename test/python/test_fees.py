@@ -0,0 +1,120 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+import rlp
+from eth_account import Account
+
+from fees import FeeOracle, send_with_replacement
+from preflight import Reverted
+
+UNSUPPORTED = ValueError({"code": -32601, "message": "the method eth_feeHistory does not exist/is not available"})
+RATE_LIMITED = ValueError({"code": 429, "message": "Too Many Requests"})
+
+
+class FakeEth:
+    """The w3.eth calls fees.py makes, against a chain that mines on demand"""
+
+    def __init__(self, fee_history=None, mined_after: int = 0, mined_from_poll: int = None):
+        self.gas_price = 7 * 10**9
+        self.chain_id = 1
+        self.fee_history_error = fee_history
+        self.raw = []
+        self.mined_after = mined_after
+        self.mined_from_poll = mined_from_poll
+        self.polls = 0
+        self.blocks = itertools.count()
+
+    def fee_history(self, blocks, newest, percentiles):
+        if self.fee_history_error is not None:
+            raise self.fee_history_error
+        return {"reward": [[10**9] * len(percentiles)] * blocks, "baseFeePerGas": [10**10] * (blocks + 1)}
+
+    @property
+    def block_number(self) -> int:
+        return next(self.blocks)
+
+    def get_transaction_count(self, address, block="latest") -> int:
+        return 0
+
+    def estimate_gas(self, tx) -> int:
+        return 21_000
+
+    def send_raw_transaction(self, raw: bytes):
+        self.raw.append(bytes(raw))
+        return len(self.raw) - 1
+
+    def get_transaction_receipt(self, tx_hash):
+        self.polls += 1
+        if self.mined_from_poll is not None:
+            if self.polls < self.mined_from_poll:
+                raise ValueError("not found")
+        elif tx_hash < self.mined_after:
+            raise ValueError("not found")
+        return {"transactionHash": tx_hash, "status": 1}
+
+
+def fake_w3(**kwargs):
+    return SimpleNamespace(eth=FakeEth(**kwargs))
+
+
+def test_eip1559_suggestion():
+    fees = FeeOracle(fake_w3()).suggest(3)
+    assert set(fees) == {"maxFeePerGas", "maxPriorityFeePerGas"}
+    assert fees["maxPriorityFeePerGas"] == 10**9
+
+
+def test_legacy_chain_gets_gas_price():
+    oracle = FeeOracle(fake_w3(fee_history=UNSUPPORTED))
+    assert oracle.suggest() == {"gasPrice": 7 * 10**9}
+    assert oracle.bump({"gasPrice": 7 * 10**9}) == {"gasPrice": int(7 * 10**9 * 1.125) + 1}
+
+
+def test_temporary_errors_are_raised():
+    with pytest.raises(ValueError):
+        FeeOracle(fake_w3(fee_history=RATE_LIMITED)).suggest()
+
+
+def test_legacy_transactions_are_sent_and_bumped(monkeypatch):
+    monkeypatch.setattr("fees.time.sleep", lambda seconds: None)
+    w3 = fake_w3(fee_history=UNSUPPORTED, mined_after=1)
+    tx = {"to": "0x" + "11" * 20, "value": 0, "gasPrice": 1}
+    receipt = send_with_replacement(w3, FeeOracle(w3), Account.create(), tx, wait_blocks=2)
+    assert receipt["transactionHash"] == 1
+    # Legacy transactions are RLP lists, typed ones start with their type
+    assert len(w3.eth.raw) == 2 and all(raw[0] >= 0xC0 for raw in w3.eth.raw)
+
+
+class FakePreflight:
+    """Succeeds until an attempt is mined, then reverts like the call would"""
+
+    def __init__(self, eth: FakeEth):
+        self.eth = eth
+        self.checks = 0
+
+    def check(self, tx: dict) -> dict:
+        self.checks += 1
+        if self.eth.mined_from_poll is not None and self.eth.polls >= self.eth.mined_from_poll:
+            raise Reverted("Nonce already used")
+        return {"gas": 50_000 + self.checks, **tx}
+
+
+def test_replacement_polls_before_simulating(monkeypatch):
+    monkeypatch.setattr("fees.time.sleep", lambda seconds: None)
+    # The first attempt is mined just after the wait for it ends
+    w3 = fake_w3(fee_history=UNSUPPORTED, mined_from_poll=2)
+    preflight = FakePreflight(w3.eth)
+    tx = {"to": "0x" + "11" * 20, "value": 0}
+    receipt = send_with_replacement(w3, FeeOracle(w3), Account.create(), tx, wait_blocks=2, preflight=preflight)
+    assert receipt["transactionHash"] == 0
+    assert preflight.checks == 1 and len(w3.eth.raw) == 1
+
+
+def test_replacement_takes_the_new_gas(monkeypatch):
+    monkeypatch.setattr("fees.time.sleep", lambda seconds: None)
+    w3 = fake_w3(fee_history=UNSUPPORTED, mined_after=1)
+    tx = {"to": "0x" + "11" * 20, "value": 0}
+    send_with_replacement(w3, FeeOracle(w3), Account.create(), tx, wait_blocks=2, preflight=FakePreflight(w3.eth))
+    # Legacy fields: nonce, gasPrice, gas, ...
+    gas = [int.from_bytes(rlp.decode(raw)[2], "big") for raw in w3.eth.raw]
+    assert gas == [50_001, 50_002]
@@ -0,0 +1,80 @@
+from fuzz import INITIAL_SUPPLY, Generator, Harness, Model, pub_key
+
+SEEDS = range(20)
+LENGTH = 200
+
+
+def test_generator_is_deterministic():
+    assert Generator(3).sequence(LENGTH) == Generator(3).sequence(LENGTH)
+    assert Generator(3).sequence(LENGTH) != Generator(4).sequence(LENGTH)
+
+
+def test_generated_sequences_replay_on_the_model():
+    kinds, outcomes = set(), set()
+    for seed in SEEDS:
+        generator = Generator(seed)
+        ops = generator.sequence(LENGTH)
+        model = Model()
+        created = INITIAL_SUPPLY
+        for op in ops:
+            expected, _ = model.step(op)
+            kinds.add(op[0])
+            outcomes.add((op[0], expected))
+            if op[0] in ("mint", "fund_vault", "yield"):
+                created += op[-1]
+        # The generator's own model saw the same operations
+        assert model.state() == generator.model.state()
+        # MockUSDC only moves between holders apart from the minting operations
+        assert sum(model.token.balances.values()) == created
+        assert all(balance >= 0 for balance in model.telepay.balances.values())
+        for key, nonce in model.telepay.used:
+            assert model.telepay.nonce_word(key, nonce >> 8) >> (nonce & 0xFF) & 1
+    assert kinds == set(Generator.WEIGHTS)
+    # Boundary amounts make both outcomes common
+    for kind in ("transfer", "settle", "deposit", "withdraw"):
+        assert {(kind, True), (kind, False)} <= outcomes
+
+
+def test_settle_is_all_or_nothing():
+    model = Model()
+    model.step(("debug_set", 0, 100))
+    # The second transfer reuses the first one's nonce
+    expected, root = model.step(("settle", ((0, 1, 10, 5), (0, 2, 10, 5)), True))
+    assert expected is False
+    assert model.telepay.balances[0] == 100 and not model.telepay.used
+    expected, root = model.step(("settle", ((0, 1, 10, 5), (0, 2, 10, 6)), True))
+    assert expected is True and root in model.telepay.settled
+    assert model.step(("settle", ((0, 1, 10, 5), (0, 2, 10, 6)), True))[0] is False
+    assert model.state()["nonceBitmap", 0, 0] == 1 << 5 | 1 << 6
+
+
+def test_deposit_message_reaches_telepay_on_relay():
+    model = Model()
+    model.step(("mint", "user0", 50))
+    model.step(("approve", 0, 50))
+    expected, message = model.step(("deposit", 0, 2, 50))
+    assert expected is True and pub_key(2) in message
+    assert model.step(("relay",)) == (True, message)
+    assert model.telepay.balances[2] == 50
+    assert model.step(("relay",)) == (None, None)
+
+
+def test_shrink_keeps_a_known_divergence():
+    # A deposit of more than zero followed by a relay diverges, nothing else does
+    def diverges(ops):
+        deposited = False
+        for op in ops:
+            if op[0] == "deposit" and op[3] > 0:
+                deposited = True
+            if op[0] == "relay" and deposited:
+                return ["relay after deposit"]
+        return []
+
+    noise = [op for op in Generator(1).sequence(80) if op[0] not in ("deposit", "relay")]
+    ops = noise[:20] + [("deposit", 1, 3, 500)] + noise[20:50] + [("relay",)] + noise[50:]
+    harness = Harness.__new__(Harness)
+    runs = []
+    harness.run = lambda candidate: runs.append(candidate) or diverges(candidate)
+
+    assert harness.shrink(ops) == [("deposit", 1, 3, 1), ("relay",)]
+    assert all(candidate for candidate in runs)
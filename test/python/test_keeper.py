@@ -0,0 +1,42 @@
+from keeper import LiquidityConfig, LiquidityModel, plan
+
+CONFIG = LiquidityConfig(buffer=1_000, horizon_blocks=10, lookback_blocks=100, band=0.1, min_action=50)
+
+
+def test_inside_band_does_nothing():
+    # Target 1,000 with a tolerance of 100 either side
+    assert plan(1_050, 5_000, 0, CONFIG) is None
+    assert plan(901, 5_000, 0, CONFIG) is None
+
+
+def test_uninvest_capped_at_invested():
+    assert plan(500, 5_000, 0, CONFIG) == ("uninvest", 500)
+    assert plan(500, 200, 0, CONFIG) == ("uninvest", 200)
+
+
+def test_uninvest_covers_predicted_outflow():
+    # Target 1,000 + 400 predicted
+    assert plan(1_100, 5_000, 400, CONFIG) == ("uninvest", 300)
+
+
+def test_invest_above_target():
+    assert plan(2_000, 0, 0, CONFIG) == ("invest", 1_000)
+
+
+def test_action_below_min_action_is_skipped():
+    assert plan(800, 30, 0, CONFIG) is None
+
+
+def test_predicted_outflow_expires_after_lookback():
+    model = LiquidityModel(lookback_blocks=100)
+    model.on_inflow(10_000)
+    model.on_withdrawal(10, 500)
+    model.on_withdrawal(60, 100)
+    assert model.idle == 9_400
+
+    # Average rate 600 / 100 blocks over 10 blocks, floored at the largest
+    assert model.predicted_outflow(105, 10) == 500
+    # The withdrawal at block 10 leaves the window at block 110
+    assert model.predicted_outflow(110, 10) == 100
+    assert model.predicted_outflow(160, 10) == 0
+    assert not model.withdrawals
@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import rlp
+from eth_account import Account
+
+from loadgen import LoadGenerator, LoadStats, split_evenly
+
+
+class FakeAsyncEth:
+    """A node that rejects the first transaction it sees with a given nonce"""
+
+    def __init__(self, reject_nonce: int):
+        self.reject_nonce = reject_nonce
+        self.accepted = []
+
+    async def send_raw_transaction(self, raw: bytes):
+        # Let other sends run in between, as a real round trip would
+        await asyncio.sleep(0)
+        nonce = int.from_bytes(rlp.decode(bytes(raw))[0], "big")
+        if nonce == self.reject_nonce:
+            self.reject_nonce = None
+            raise ValueError("replacement transaction underpriced")
+        self.accepted.append(nonce)
+        return f"0x{len(self.accepted):064x}"
+
+    async def get_transaction_count(self, address, block="latest") -> int:
+        await asyncio.sleep(0)
+        return len(self.accepted)
+
+
+def generator(eth: FakeAsyncEth, sender) -> LoadGenerator:
+    """LoadGenerator on a fake node, without the contract ABIs prepare needs"""
+    gen = LoadGenerator.__new__(LoadGenerator)
+    gen.w3 = SimpleNamespace(eth=eth)
+    gen.senders = [sender]
+    gen.nonces = {sender.address: 0}
+    gen.send_locks = {sender.address: asyncio.Lock()}
+    gen.inflight = {sender.address: 0}
+    gen.pending = {}
+    gen.stats = LoadStats()
+    gen.chain_id = 1
+    gen.gas_price = 10**9
+    return gen
+
+
+def test_failed_send_does_not_reuse_nonces_in_flight():
+    sender = Account.create()
+    eth = FakeAsyncEth(reject_nonce=1)
+    gen = generator(eth, sender)
+
+    async def send_all():
+        return await asyncio.gather(*(gen.send(sender, sender.address, "0x", 21_000) for _ in range(6)))
+
+    hashes = asyncio.run(send_all())
+    assert sum(h is None for h in hashes) == 1
+    assert sorted(eth.accepted) == list(range(5))
+    assert gen.nonces[sender.address] == 5
+
+
+def test_split_evenly_keeps_the_remainder():
+    assert split_evenly(10, 3) == [4, 3, 3]
+    assert split_evenly(2, 4) == [1, 1, 0, 0]
+    assert sum(split_evenly(1001, 7)) == 1001
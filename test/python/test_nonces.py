@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from nonces import WORD_BITS, NonceAllocator
+
+PUB_KEY = b"\x01" * 64
+
+
+def fake_telepay(words: dict):
+    """Telepay whose nonceBitmap(owner, index) reads from words, counting reads"""
+    reads = []
+
+    def nonce_bitmap(owner, index):
+        reads.append(index)
+        return SimpleNamespace(call=lambda: words.get((owner, index), 0))
+
+    return SimpleNamespace(functions=SimpleNamespace(nonceBitmap=nonce_bitmap)), reads
+
+
+def test_rolls_over_to_the_next_word():
+    allocator = NonceAllocator()
+    nonces = allocator.allocate_many(PUB_KEY, WORD_BITS + 2)
+    assert nonces == list(range(WORD_BITS + 2))
+    # Each key has its own words
+    assert allocator.allocate(b"\x02" * 64) == 0
+
+
+def test_skips_bits_used_on_chain():
+    owner = NonceAllocator.owner(PUB_KEY)
+    # Word 0 full, word 1 with nonces 256, 257 and 259 used
+    telepay, reads = fake_telepay({(owner, 0): (1 << WORD_BITS) - 1, (owner, 1): 0b1011})
+    allocator = NonceAllocator(telepay)
+    assert allocator.allocate_many(PUB_KEY, 3) == [258, 260, 261]
+    # Words are read once, then tracked locally
+    assert reads == [0, 1]
+
+
+def test_released_nonces_are_reused_first():
+    allocator = NonceAllocator()
+    assert allocator.allocate_many(PUB_KEY, 4) == [0, 1, 2, 3]
+    allocator.release(PUB_KEY, 1)
+    allocator.release(PUB_KEY, 3)
+    assert sorted(allocator.allocate_many(PUB_KEY, 2)) == [1, 3]
+    assert allocator.allocate(PUB_KEY) == 4
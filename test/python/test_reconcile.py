@@ -0,0 +1,43 @@
+import random
+
+from reconcile import NonceRanges
+
+
+def ranges_of(nonces) -> NonceRanges:
+    ranges = NonceRanges()
+    for nonce in nonces:
+        ranges.add(nonce)
+    return ranges
+
+
+def test_out_of_order_inserts():
+    ranges = ranges_of([10, 3, 7, 4, 11, 0])
+    assert list(zip(ranges.starts, ranges.ends)) == [(0, 0), (3, 4), (7, 7), (10, 11)]
+    assert len(ranges) == 6
+    assert 4 in ranges and 11 in ranges and 0 in ranges
+    assert 5 not in ranges and 12 not in ranges and 1 not in ranges
+
+
+def test_duplicates_are_counted_once():
+    ranges = ranges_of([5, 5, 6, 5, 2, 6, 2])
+    assert list(zip(ranges.starts, ranges.ends)) == [(2, 2), (5, 6)]
+    assert len(ranges) == 3
+
+
+def test_nonce_bridging_two_ranges():
+    ranges = ranges_of([1, 2, 4, 5, 8])
+    ranges.add(3)
+    assert list(zip(ranges.starts, ranges.ends)) == [(1, 5), (8, 8)]
+    assert len(ranges) == 6 and 3 in ranges
+
+
+def test_matches_a_set():
+    rng = random.Random(7)
+    nonces = [rng.randrange(2_000) for _ in range(3_000)]
+    ranges = ranges_of(nonces)
+    expected = set(nonces)
+    assert len(ranges) == len(expected)
+    assert [n for n in range(2_100) if n in ranges] == sorted(expected)
+    # Ranges stay sorted, disjoint and never adjacent
+    for i in range(1, len(ranges.starts)):
+        assert ranges.starts[i] > ranges.ends[i - 1] + 1
@@ -0,0 +1,37 @@
+import pytest
+from eth_abi import encode
+from web3 import Web3
+
+import reserves
+from batch import MerkleTree
+
+
+def balance_leaf(pub_key: bytes, balance: int) -> bytes:
+    encoded = encode(["bytes32", "uint256"], [Web3.keccak(pub_key), balance])
+    return bytes(Web3.keccak(Web3.keccak(encoded)))
+
+
+def test_empty_balances_have_zero_root():
+    keys, tree = reserves.build_tree({})
+    assert keys == [] and tree.root == bytes(32)
+    keys, tree = reserves.build_tree({b"\x01" * 64: 0})
+    assert keys == [] and tree.root == bytes(32)
+
+
+def test_matches_merkle_tree():
+    for count in (1, 2, 5, 16):
+        balances = {bytes([i + 1]) * 64: 1_000 * (i + 1) for i in range(count)}
+        keys, tree = reserves.build_tree(balances)
+        expected = MerkleTree([balance_leaf(key, balances[key]) for key in keys])
+        assert tree.root == expected.root
+        for i in range(count):
+            assert MerkleTree.verify(tree.proof(i), tree.root, tree.levels[0][i].tobytes())
+
+
+def test_prove_empty_snapshot(tmp_path):
+    snapshot = tmp_path / "balances.jsonl"
+    keys, tree = reserves.build_tree({})
+    header = {"telepay": "0x", "block": 1, "root": "0x" + tree.root.hex(), "accounts": 0, "total": 0}
+    reserves.save_snapshot(str(snapshot), header, keys, {})
+    with pytest.raises(ValueError, match="No balance"):
+        reserves.prove(str(snapshot), b"\x01" * 64)
@@ -0,0 +1,69 @@
+import pytest
+
+from rpc import PROBE_INTERVAL, EndpointMetrics, MultiEndpointClient, RpcError
+
+STATE_READS = ["eth_blockNumber", "eth_getLogs", "eth_getTransactionCount", "eth_getTransactionReceipt"]
+
+
+class FakeEndpoint:
+    """Answers every read with its own name, or fails when down"""
+
+    def __init__(self, url: str, latency: float):
+        self.url = url
+        self.metrics = EndpointMetrics()
+        self.metrics.record(latency, ok=True)
+        self.down = False
+        self.requests = 0
+
+    def make_request(self, method, params, retries=None):
+        self.requests += 1
+        if self.down:
+            raise RpcError(f"{self.url} is down")
+        return {"jsonrpc": "2.0", "id": 0, "result": self.url}
+
+
+def multi_client(*endpoints) -> MultiEndpointClient:
+    client = MultiEndpointClient([e.url for e in endpoints])
+    client.clients = list(endpoints)
+    return client
+
+
+def test_state_reads_stay_on_one_endpoint():
+    fast, slow = FakeEndpoint("fast", 0.1), FakeEndpoint("slow", 0.5)
+    client = multi_client(fast, slow)
+    answers = {client.call(STATE_READS[i % len(STATE_READS)]) for i in range(2 * PROBE_INTERVAL)}
+    assert answers == {"fast"}
+    # The other endpoint becoming healthier doesn't move the pin
+    for _ in range(10):
+        slow.metrics.record(0.01, ok=True)
+    assert client.ranked()[0] is slow
+    assert client.call("eth_blockNumber") == "fast"
+    assert client.pinned() is fast
+
+
+def test_pin_moves_when_its_endpoint_fails():
+    first, second, third = FakeEndpoint("first", 0.1), FakeEndpoint("second", 0.2), FakeEndpoint("third", 0.3)
+    client = multi_client(first, second, third)
+    assert client.call("eth_blockNumber") == "first"
+    first.down = True
+    assert client.call("eth_getLogs", [{}]) == "second"
+    first.down = False
+    assert client.call("eth_getTransactionCount", ["0x0", "latest"]) == "second"
+
+
+def test_every_endpoint_down():
+    first, second = FakeEndpoint("first", 0.1), FakeEndpoint("second", 0.2)
+    first.down = second.down = True
+    client = multi_client(first, second)
+    with pytest.raises(RpcError, match="All endpoints failed"):
+        client.call("eth_blockNumber")
+
+
+def test_head_independent_reads_are_hedged():
+    first, second = FakeEndpoint("first", 0.1), FakeEndpoint("second", 0.2)
+    first.down = True
+    client = multi_client(first, second)
+    assert client.call("eth_chainId") == "second"
+    # Failing over a hedged read leaves the pin alone
+    first.down = False
+    assert client.call("eth_blockNumber") == "first"
@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulator import mul_div
+
+LIMIT = 2**63 - 1
+BOUNDARY = [0, 1, 2, 2**31, 2**32 - 1, 2**32, 2**32 + 1, 2**62, LIMIT - 1, LIMIT]
+
+
+def expected(a, b, c):
+    return [x * y // z for x, y, z in zip(a, b, c)]
+
+
+def test_matches_python_on_random_inputs():
+    rng = random.Random(7)
+    a, b, c = [], [], []
+    while len(a) < 5000:
+        x, y = rng.getrandbits(rng.randint(1, 63)), rng.getrandbits(rng.randint(1, 63))
+        z = rng.getrandbits(rng.randint(1, 63)) or 1
+        if x * y // z <= LIMIT:
+            a.append(x), b.append(y), c.append(z)
+    assert mul_div(a, b, c).tolist() == expected(a, b, c)
+
+
+def test_matches_python_on_boundaries():
+    a, b, c = [], [], []
+    for x in BOUNDARY:
+        for y in BOUNDARY:
+            for z in BOUNDARY[1:]:
+                if x * y // z <= LIMIT:
+                    a.append(x), b.append(y), c.append(z)
+    # Quotients one below and exactly at the limit
+    a += [LIMIT, LIMIT, 2**62]
+    b += [LIMIT, LIMIT - 1, 2**62 - 1]
+    c += [LIMIT, LIMIT, 2**61]
+    assert mul_div(a, b, c).tolist() == expected(a, b, c)
+
+
+@pytest.mark.parametrize("a, b, c", [(LIMIT, LIMIT, LIMIT - 1), (2**62, 4, 2), (LIMIT, 2**40, 1)])
+def test_raises_when_quotient_does_not_fit(a, b, c):
+    with pytest.raises(OverflowError):
+        mul_div(np.array([a]), np.array([b]), np.array([c]))
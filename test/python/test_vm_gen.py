@@ -0,0 +1,58 @@
+import dataclasses
+import json
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+import vm_gen
+
+FIXTURE = Path(__file__).parent / "fixtures" / "cheatcodes.json"
+
+
+def upstream_output(tmp_path: Path) -> str:
+    """Vm.sol as forge-std's scripts/vm.py writes it, before forge fmt"""
+    out = tmp_path / "Vm.sol"
+    with mock.patch.object(vm_gen.vm, "OUT_PATH", str(out)), mock.patch.object(
+        vm_gen.vm.subprocess, "run", return_value=mock.Mock(returncode=0)
+    ), mock.patch.object(sys, "argv", ["vm.py", "--from", str(FIXTURE)]):
+        vm_gen.vm.main()
+    return out.read_text()
+
+
+def test_matches_upstream(tmp_path):
+    d = json.loads(FIXTURE.read_text())
+    assert vm_gen.generate(vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES)) == upstream_output(tmp_path)
+
+
+def test_keeps_deprecated_and_hides_experimental():
+    d = json.loads(FIXTURE.read_text())
+    ids = [cc.func.id for cc in vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES).cheatcodes]
+    assert "readFile" in ids
+    assert "expt" not in ids and "intl" not in ids
+
+
+def test_fragments_rerender_only_changed_groups(tmp_path):
+    d = json.loads(FIXTURE.read_text())
+    out = tmp_path / "Vm.sol"
+    first = vm_gen.FragmentCache(tmp_path, out, vm_gen.fingerprints(d))
+    vm_gen.generate(vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES), first)
+    first.save()
+
+    d["cheatcodes"][0]["func"]["description"] = "Sets the timestamp."
+    second = vm_gen.FragmentCache(tmp_path, out, vm_gen.fingerprints(d))
+    text = vm_gen.generate(vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES), second)
+    assert second.rendered == 1
+    assert "Vm/evm: changed (~warp)" in second.report()
+    assert text == vm_gen.generate(vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES))
+
+
+def test_models_are_frozen_and_slotted():
+    d = json.loads(FIXTURE.read_text())
+    contract = vm_gen.load_cheatcodes(d, vm_gen.HIDDEN_STATUSES)
+    cc = contract.cheatcodes[0]
+    for model in (contract, cc, cc.func, contract.enums[0], contract.enums[0].variants[0], contract.structs[0]):
+        assert not hasattr(model, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cc.status = "experimental"